@@ -6,7 +6,45 @@ from .config import Config
 from .routes import main_bp
 
 
-def create_app():
+def prepare_database() -> list:
+    """
+    Apply pending schema migrations (see migrations.py), then create the
+    rows and indexes the extensions expect; returns the migrations applied.
+    Run by migrate.py, and by create_app when MIGRATE_ON_STARTUP is on.
+    """
+    from .lawyer_categories import migrate_lawyer_categories
+    from .match_cache import ensure_pool_generation
+    from .migrations import run_migrations
+    from .scoring_plan import ensure_scoring_config
+    from .search import lawyer_search
+
+    ran = run_migrations()
+    try:
+        migrate_lawyer_categories()
+    except Exception as e:
+        print(f"Warning: Could not migrate lawyer categories: {e}")
+    lawyer_search.ensure_index()
+    ensure_scoring_config()
+    ensure_pool_generation()
+    return ran
+
+
+def seed_empty_database(app) -> None:
+    """Seed a production database (DATABASE_URL set) that has no lawyers yet with the sample lawyers."""
+    from .models import LawyerProfile
+
+    if not os.environ.get("DATABASE_URL") or LawyerProfile.query.count():
+        return
+    print("Database is empty. Seeding with sample lawyers...")
+    try:
+        from seed_db import seed_database
+        seed_database(app)
+        print("✓ Database seeded successfully!")
+    except Exception as e:
+        print(f"Warning: Could not seed database: {e}")
+
+
+def create_app(config=None):
     # Get the root directory (parent of app/)
     root_dir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
     
@@ -17,6 +55,7 @@ def create_app():
         static_folder=os.path.join(root_dir, "static"),
     )
     app.config.from_object(Config)
+    app.config.update(config or {})
 
     # Initialize extensions
     db.init_app(app)
@@ -26,29 +65,57 @@ def create_app():
         # Register blueprints
         app.register_blueprint(main_bp)
 
-        # Create database tables if they don't exist
-        db.create_all()
+        # Normalized expertise categories (importing registers the sync events)
+        from . import lawyer_categories
+
+        # Full-text index over lawyer profiles (FTS5 on SQLite, tsvector on Postgres)
+        from .search import lawyer_search
+        lawyer_search.init_app(app)
+
+        # Create or upgrade the schema; off by default, as migrate.py runs once per deploy
+        # and web workers and diagnostic scripts must not write to the database on import
+        migrate_on_startup = app.config["MIGRATE_ON_STARTUP"]
+        if migrate_on_startup:
+            try:
+                prepare_database()
+            except Exception as e:
+                print(f"Warning: Could not migrate database schema: {e}")
+
+        # Scoring weights/parameters, reloaded when the stored config changes
+        from .scoring_plan import scoring_plans
+        scoring_plans.init_app(app)
+
+        # TF-IDF index for the text-relevance factor (loaded on first use)
+        from .text_index import text_index
+        text_index.init_app(app)
+
+        # Match-result cache (also registers the lawyer-pool generation events)
+        from .match_cache import match_cache
+        match_cache.init_app(app)
+
+        # Background match precomputation for newly submitted issues
+        from .match_jobs import match_jobs
+        match_jobs.init_app(app)
+
+        # Per-request query counting against route query budgets
+        from .query_budget import query_budget
+        query_budget.init_app(app)
+
+        # In-process fan-out of new chat messages to open streams
+        from .chat_events import chat_broker
+        chat_broker.init_app(app)
+
+        # Optional matching instrumentation
+        from .match_stats import match_stats
+        match_stats.init_app(app)
         
-        # Auto-migrate or seed database on first deployment (Railway/Render)
-        # Only runs if database is empty
-        try:
-            from .models import LawyerProfile
-            lawyer_count = LawyerProfile.query.count()
-            if lawyer_count == 0:
-                # Database is empty
-                # Only run in production (when DATABASE_URL is set)
-                if os.environ.get("DATABASE_URL"):
-                    # Seed database with sample lawyers
-                    print("Database is empty. Seeding with sample lawyers...")
-                    try:
-                        from seed_db import seed_database
-                        seed_database()
-                        print("✓ Database seeded successfully!")
-                    except Exception as e:
-                        print(f"Warning: Could not seed database: {e}")
-        except Exception as e:
-            # Silently fail - don't break app startup
-            pass
+        # Seed database on first deployment (Railway/Render), with startup migrations
+        if migrate_on_startup:
+            try:
+                seed_empty_database(app)
+            except Exception as e:
+                # Silently fail - don't break app startup
+                pass
 
     return app
 
@@ -0,0 +1,373 @@
+"""
+Global issue -> lawyer assignment under lawyer capacity.
+
+lawyer_matches ranks lawyers for one issue at a time, so the same few
+top-rated lawyers are everybody's first suggestion and get far more
+requests than they have free case slots. This module assigns all open
+issues at once: each lawyer takes at most its free capacity
+(max_cases - current_cases, 0 if unavailable) and the sum of match scores
+is maximised. Issues may stay unassigned when every lawyer worth
+suggesting is full.
+
+The problem is a capacitated (transportation) assignment. It is solved on
+a sparse graph, only the top-K lawyers per issue from the bulk matcher's
+worker pool, with a vectorised auction (Bertsekas): every forward round
+all unassigned issues bid for their best lawyer at once and each lawyer
+keeps its `capacity` highest bids; reverse rounds let lawyers with open
+slots lower their price again. Bids are refined by eps-scaling, and the
+result is within n_issues * eps of the optimal total score over the
+top-K graph.
+"""
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .extensions import db
+from .models import IssueAssignment
+from .bulk_matching import load_issues, load_lawyer_pool, open_issue_ids, rank_issues
+from .match_cache import current_generation
+from .scoring_plan import scoring_plans
+from .text_index import text_index
+
+# Final bid increment; the total score is within eps per issue of optimal
+DEFAULT_EPSILON = 0.01
+
+
+def lawyer_capacities(lawyers: List) -> np.ndarray:
+    """Free case slots of each lawyer (see LawyerProfile.is_available_for_new_case)."""
+    return np.array(
+        [
+            max((lawyer.max_cases or 0) - (lawyer.current_cases or 0), 0) if lawyer.is_available else 0
+            for lawyer in lawyers
+        ],
+        dtype=np.int64,
+    )
+
+
+def edge_arrays(
+    rankings: List[List[Tuple[int, float]]], k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pack per-issue rankings of (lawyer index, score) into padded
+    (n_issues, k) score and lawyer-index arrays; padding is -inf / 0.
+    """
+    scores = np.full((len(rankings), max(k, 2)), -np.inf)
+    lawyers = np.zeros((len(rankings), max(k, 2)), dtype=np.int64)
+    for i, ranked in enumerate(rankings):
+        if ranked:
+            index, score = zip(*ranked[:k])
+            lawyers[i, :len(index)] = index
+            scores[i, :len(score)] = score
+    return scores, lawyers
+
+
+class _Auction:
+    """
+    State of one auction: which issue holds which lawyer, and lawyer prices.
+
+    A lawyer's `capacity` slots are interchangeable, so all of them cost the
+    lawyer's single price (Bertsekas and Castanon's auction for similar
+    objects). While a lawyer has an open slot its price only changes in
+    reverse rounds; once it is full it is the lowest bid it holds.
+    """
+
+    def __init__(self, scores: np.ndarray, lawyers: np.ndarray, capacity: np.ndarray):
+        self.scores = scores
+        self.lawyers = lawyers
+        self.capacity = capacity
+        n_issues, n_lawyers = len(scores), len(capacity)
+        self.rows = np.arange(n_issues)
+        self.has_edges = np.isfinite(scores).any(axis=1)
+        self.choice = np.full(n_issues, -1, dtype=np.int64)
+        self.assigned = np.full(n_issues, -1, dtype=np.int64)
+        self.held_bid = np.zeros(n_issues)
+        self.held_score = np.zeros(n_issues)
+        self.count = np.zeros(n_lawyers, dtype=np.int64)
+        self.price = np.zeros(n_lawyers + 1)  # Last entry is for "unassigned" (-1)
+
+        # Edges grouped by lawyer, for the reverse (price-lowering) rounds
+        edge_issue, edge_col = np.nonzero(np.isfinite(scores))
+        edge_lawyer = lawyers[edge_issue, edge_col]
+        order = np.argsort(edge_lawyer, kind="stable")
+        self.edge_issue = edge_issue[order]
+        self.edge_col = edge_col[order]
+        self.edge_score = scores[self.edge_issue, self.edge_col]
+        self.edge_ptr = np.searchsorted(edge_lawyer[order], np.arange(n_lawyers + 1))
+
+    def reset(self) -> None:
+        """Drop all assignments but keep the prices, for the next eps phase."""
+        self.choice[:] = -1
+        self.assigned[:] = -1
+        self.held_score[:] = 0.0
+        self.count[:] = 0
+
+    def profits(self) -> np.ndarray:
+        """Score minus price of each issue's lawyer; staying unassigned is worth 0."""
+        return self.held_score - self.price[self.assigned]
+
+    def issues_of(self, lawyers: np.ndarray) -> np.ndarray:
+        """Issues with an edge to any of `lawyers`, with repeats."""
+        starts, sizes = self.edge_ptr[lawyers], self.edge_ptr[lawyers + 1] - self.edge_ptr[lawyers]
+        return self.edge_issue[self._ranges(starts, sizes)]
+
+    @staticmethod
+    def _ranges(starts: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+        """Concatenation of range(start, start + size) for each pair."""
+        return np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes) + np.repeat(starts, sizes)
+
+    def forward_round(self, active: np.ndarray, eps: float) -> np.ndarray:
+        """
+        Every issue in `active` bids for its best lawyer; each lawyer keeps
+        its `capacity` highest bids. Returns the issues that are priced out.
+        """
+        price = self.price
+        net = self.scores[active] - price[self.lawyers[active]]
+        top2 = np.argpartition(-net, 1, axis=1)[:, :2]
+        pair = np.take_along_axis(net, top2, axis=1)
+        best_col = np.where(pair[:, 1] > pair[:, 0], top2[:, 1], top2[:, 0])
+        best = pair.max(axis=1)
+        second = np.maximum(pair.min(axis=1), 0.0)
+        # Another open slot of the same lawyer is as good as the first
+        second_slot = self.count[self.lawyers[active, best_col]] + 1 < self.capacity[self.lawyers[active, best_col]]
+        second = np.where(second_slot, best, second)
+
+        # Within eps of staying unassigned counts as happy (eps-complementary
+        # slackness); the tolerance keeps rounding from undoing reverse rounds
+        bidding = best > eps + 1e-9
+        priced_out = active[~bidding]
+        active = active[bidding]
+        best_col = best_col[bidding]
+        bid_lawyer = self.lawyers[active, best_col]
+        bids = price[bid_lawyer] + best[bidding] - second[bidding] + eps
+
+        hit = np.zeros(len(self.capacity) + 1, dtype=bool)
+        hit[bid_lawyer] = True
+        holders = self.rows[hit[self.assigned]]
+        contenders = np.concatenate([holders, active])
+        contender_lawyer = np.concatenate([self.assigned[holders], bid_lawyer])
+        contender_bid = np.concatenate([self.held_bid[holders], bids])
+        contender_col = np.concatenate([self.choice[holders], best_col])
+        order = np.lexsort((-contender_bid, contender_lawyer))
+        sorted_lawyer = contender_lawyer[order]
+        starts = np.searchsorted(sorted_lawyer, sorted_lawyer, side="left")
+        rank = np.arange(len(order)) - starts
+        kept = rank < self.capacity[sorted_lawyer]
+
+        losers = contenders[order[~kept]]
+        self.choice[losers] = -1
+        self.assigned[losers] = -1
+        self.held_score[losers] = 0.0
+        winners = order[kept]
+        kept_issues = contenders[winners]
+        self.choice[kept_issues] = contender_col[winners]
+        self.assigned[kept_issues] = contender_lawyer[winners]
+        self.held_bid[kept_issues] = contender_bid[winners]
+        self.held_score[kept_issues] = self.scores[kept_issues, contender_col[winners]]
+
+        lawyers_hit = np.flatnonzero(hit[:-1])
+        self.count[lawyers_hit] = np.minimum(
+            np.bincount(sorted_lawyer, minlength=len(self.capacity))[lawyers_hit],
+            self.capacity[lawyers_hit],
+        )
+        # A lawyer that is full costs its lowest held bid
+        last = rank == self.capacity[sorted_lawyer] - 1
+        price[sorted_lawyer[last]] = np.maximum(price[sorted_lawyer[last]], contender_bid[order[last]])
+        return priced_out
+
+    def reverse_round(self, eps: float) -> bool:
+        """
+        Lawyers with an open slot still priced above zero lower their price
+        to attract their best issue, or to zero if no issue is worth it.
+        Returns False when no lawyer needed to.
+        """
+        lawyers = np.flatnonzero((self.count < self.capacity) & (self.price[:-1] > 0))
+        if not len(lawyers):
+            return False
+        starts, ends = self.edge_ptr[lawyers], self.edge_ptr[lawyers + 1]
+        sizes = ends - starts
+        self.price[lawyers[sizes == 0]] = 0.0
+        lawyers, starts, sizes = lawyers[sizes > 0], starts[sizes > 0], sizes[sizes > 0]
+        if not len(lawyers):
+            return True
+
+        # Value of each edge to the lawyer: score minus what the issue has now
+        segment = np.repeat(np.arange(len(lawyers)), sizes)
+        edges = self._ranges(starts, sizes)
+        issue = self.edge_issue[edges]
+        value = self.edge_score[edges] - self.profits()[issue]
+        value[self.assigned[issue] == lawyers[segment]] = -np.inf
+
+        # Best and second-best issue per lawyer
+        bounds = np.cumsum(sizes) - sizes
+        best = np.maximum.reduceat(value, bounds)
+        positions = np.arange(len(value))
+        top = np.minimum.reduceat(np.where(value == best[segment], positions, len(value)), bounds)
+        value[top] = -np.inf
+        second = np.maximum.reduceat(value, bounds)
+
+        # No issue gains from this lawyer: its open slots become free
+        worthless = best <= eps + 1e-9
+        self.price[lawyers[worthless]] = 0.0
+        offer = ~worthless
+        if not offer.any():
+            return True
+        lawyers, edge = lawyers[offer], edges[top[offer]]
+        new_price = np.maximum(second[offer] - eps, 0.0)
+        issue, col, score = self.edge_issue[edge], self.edge_col[edge], self.edge_score[edge]
+
+        # An issue with several offers takes the best one
+        pick = np.lexsort((-(score - new_price), issue))
+        accepted = pick[np.r_[True, issue[pick][1:] != issue[pick][:-1]]]
+        lawyers, issue, col, score, new_price = (
+            lawyers[accepted], issue[accepted], col[accepted], score[accepted], new_price[accepted]
+        )
+
+        # The issue's old slot opens up at its lawyer's current price
+        leaving = issue[self.assigned[issue] >= 0]
+        np.subtract.at(self.count, self.assigned[leaving], 1)
+
+        self.choice[issue] = col
+        self.assigned[issue] = lawyers
+        self.held_bid[issue] = new_price
+        self.held_score[issue] = score
+        self.price[lawyers] = new_price
+        self.count[lawyers] += 1
+        return True
+
+    def run_phase(self, eps: float, max_rounds: int) -> int:
+        """Alternate forward and reverse rounds until neither changes anything."""
+        alive = self.has_edges.copy()
+        rounds = 0
+        while rounds < max_rounds:
+            active = self.rows[alive & (self.choice < 0)]
+            if len(active):
+                alive[self.forward_round(active, eps)] = False
+            else:
+                before = self.price.copy()
+                if not self.reverse_round(eps):
+                    break
+                # Issues priced out of a lawyer that got cheaper may be back
+                alive[self.issues_of(np.flatnonzero(self.price[:-1] < before[:-1]))] = True
+            rounds += 1
+        return rounds
+
+
+def auction_assign(
+    scores: np.ndarray,
+    lawyers: np.ndarray,
+    capacity: np.ndarray,
+    eps: float = DEFAULT_EPSILON,
+    max_rounds: int = 20000,
+) -> Tuple[np.ndarray, Dict[str, float]]:
+    """
+    Assign each row of `scores`/`lawyers` (the candidate edges of one issue)
+    to at most one lawyer so that no lawyer j gets more than capacity[j]
+    issues, maximising the total score.
+
+    Bids start coarse and are refined (eps-scaling), each phase keeping the
+    previous phase's prices. The returned stats include the LP dual bound
+    of the final prices, an upper bound on the optimal total score.
+
+    Returns (choice, stats): choice[i] is the column of `lawyers` issue i
+    got, -1 when it is left unassigned.
+    """
+    # Edges to lawyers without free capacity can never be used
+    scores = np.where(capacity[lawyers] > 0, scores, -np.inf)
+    auction = _Auction(scores, lawyers, capacity)
+    rounds = 0
+    for phase_eps in [step for step in (5.0, 1.0, 0.2) if step > eps] + [eps]:
+        auction.reset()
+        rounds += auction.run_phase(phase_eps, max_rounds)
+
+    choice = auction.choice
+    total = float(auction.held_score.sum())
+    price = auction.price[:-1]
+    profit = np.maximum((scores - price[lawyers]).max(axis=1), 0.0) if len(scores) else np.zeros(0)
+    dual = float(profit.sum() + (capacity * price).sum())
+    return choice.copy(), {
+        "rounds": rounds,
+        "eps": eps,
+        "assigned": int((choice >= 0).sum()),
+        "total_score": round(total, 2),
+        "dual_bound": round(dual, 2),
+        "gap": round(dual - total, 2),
+    }
+
+
+def assign_open_issues(
+    issue_ids: Optional[List[int]] = None,
+    k: int = 50,
+    workers: Optional[int] = None,
+    chunk_size: int = 64,
+    eps: float = DEFAULT_EPSILON,
+    dry_run: bool = False,
+    progress: bool = True,
+) -> Dict[str, float]:
+    """
+    Assign `issue_ids` (default: all open issues) to lawyers with free
+    capacity, maximising the total match score over each issue's top `k`
+    lawyers, and replace the issue_assignment table with the result unless
+    `dry_run`. Must be called inside an app context.
+    """
+    generation = current_generation()
+    plan = scoring_plans.refresh(force=True)
+    text_index.sync(generation, wait=True)
+    if issue_ids is None:
+        issue_ids = open_issue_ids()
+    issues = load_issues(issue_ids)
+    lawyers = load_lawyer_pool()
+    capacity = lawyer_capacities(lawyers)
+    workers = workers or os.cpu_count() or 1
+
+    # Only lawyers with a free slot are worth ranking
+    pool = [lawyer for lawyer, free in zip(lawyers, capacity) if free > 0]
+    pool_capacity = capacity[capacity > 0]
+    index = {lawyer.id: i for i, lawyer in enumerate(pool)}
+
+    started = time.perf_counter()
+    ranked = {}
+    for results in rank_issues(issues, pool, k, workers, chunk_size):
+        for result in results:
+            ranked[result["issue_id"]] = [(index[profile_id], score) for profile_id, score in result["matches"]]
+        if progress:
+            print(f"  {len(ranked)}/{len(issues)} issues ranked")
+    ranking_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    scores, edge_lawyers = edge_arrays([ranked.get(issue["id"], []) for issue in issues], k)
+    choice, stats = auction_assign(scores, edge_lawyers, pool_capacity, eps)
+    solve_seconds = time.perf_counter() - started
+
+    rows = [
+        {
+            "issue_id": issue["id"],
+            "lawyer_profile_id": pool[edge_lawyers[i, choice[i]]].id,
+            "score": float(scores[i, choice[i]]),
+            "generation": generation,
+            "plan": plan.fingerprint,
+        }
+        for i, issue in enumerate(issues)
+        if choice[i] >= 0
+    ]
+    if not dry_run:
+        IssueAssignment.query.delete(synchronize_session=False)
+        if rows:
+            db.session.execute(IssueAssignment.__table__.insert(), rows)
+        db.session.commit()
+
+    # What matching every issue independently would have asked of the lawyers
+    first_choice = np.bincount(edge_lawyers[np.isfinite(scores[:, 0]), 0], minlength=len(pool))
+    return dict(
+        stats,
+        issues=len(issues),
+        lawyers=len(lawyers),
+        lawyers_with_capacity=len(pool),
+        free_slots=int(pool_capacity.sum()),
+        top_choice_overloaded_lawyers=int((first_choice > pool_capacity).sum()),
+        top_choice_total_score=round(float(scores[:, 0][np.isfinite(scores[:, 0])].sum()), 2),
+        plan=plan.fingerprint,
+        ranking_seconds=round(ranking_seconds, 2),
+        solve_seconds=round(solve_seconds, 2),
+    )
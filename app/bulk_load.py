@@ -0,0 +1,257 @@
+"""
+Bulk loading of users, lawyers, issues, chats and messages, for seeding
+(seed_db.py) and staging datasets of millions of rows (load_data.py).
+
+BulkLoader writes BATCH_SIZE rows per statement and one transaction per
+batch: COPY on PostgreSQL with psycopg, a single executemany INSERT
+elsewhere. Ids are assigned up front (nextval on PostgreSQL, max(id) + 1
+inside the batch's transaction on SQLite) so that profiles, issues, chats
+and messages can reference the rows of the previous batch without reading
+them back.
+
+Users are matched on email with one IN query per batch; existing accounts
+are skipped and keep their id. Password hashes are deliberately slow, so
+the hashes of a batch are computed across a process pool. Records can
+instead carry a precomputed password_hash, which synthetic accounts share
+(load_data.py --reuse-hash) to skip hashing altogether.
+
+Core inserts bypass the mapper events, so the loader does their work in
+the same transaction: the category_mask and lawyer_category rows of new
+profiles (lawyer_categories.py), the lawyer-pool generation bump
+(match_cache.py) and the message counts on chats (chat_summary.py).
+Bulk-loaded issues get no match job; run bulk_match.py afterwards to
+precompute their rankings.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, select, text
+from werkzeug.security import generate_password_hash
+
+from .categories import parse_expertise
+from .chat_summary import count_message_rows
+from .lawyer_categories import category_rows
+from .models import Chat, Issue, LawyerCategory, LawyerPoolGeneration, LawyerProfile, Message, User
+
+BATCH_SIZE = 5000
+# Below this many passwords per worker process, hashing in-process is faster than the round trips
+MIN_HASHES_PER_PROCESS = 4
+
+
+def batches(records: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    records = iter(records)
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+def hash_passwords(passwords: List[str], pool: Optional[ProcessPoolExecutor] = None, processes: int = 1) -> List[str]:
+    """generate_password_hash of each password, across the pool's `processes` when there are enough of them."""
+    if pool is None or len(passwords) < processes * MIN_HASHES_PER_PROCESS:
+        return [generate_password_hash(password) for password in passwords]
+    return list(pool.map(generate_password_hash, passwords, chunksize=max(1, len(passwords) // (processes * 4))))
+
+
+def _column_defaults(table, row: dict, now: datetime) -> dict:
+    """The row with every column of the table, Python-side defaults filled in (COPY doesn't apply them)."""
+    filled = {}
+    for column in table.columns:
+        if column.key in row:
+            filled[column.key] = row[column.key]
+        elif column.default is None:
+            filled[column.key] = None
+        elif column.default.is_callable:
+            # Only datetime.utcnow is used as a callable default
+            filled[column.key] = now
+        else:
+            filled[column.key] = column.default.arg
+    return filled
+
+
+class BulkLoader:
+    """Batched inserts against an engine; use as a context manager so the hashing pool is shut down."""
+
+    def __init__(
+        self,
+        engine,
+        batch_size: int = BATCH_SIZE,
+        processes: Optional[int] = None,
+        use_copy: Optional[bool] = None,
+    ):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.processes = processes or os.cpu_count() or 1
+        dialect = engine.dialect
+        if use_copy is None:
+            use_copy = dialect.name == "postgresql" and dialect.driver == "psycopg"
+        self.use_copy = use_copy
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.inserted: Dict[str, int] = {}
+        self.skipped = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _hash(self, passwords: List[str]) -> List[str]:
+        if self.processes > 1 and self._pool is None and len(passwords) >= self.processes * MIN_HASHES_PER_PROCESS:
+            self._pool = ProcessPoolExecutor(max_workers=self.processes)
+        return hash_passwords(passwords, self._pool, self.processes)
+
+    def _reserve_ids(self, connection, table, count: int) -> List[int]:
+        """`count` new primary keys for the table, in the caller's transaction."""
+        if connection.dialect.name == "postgresql":
+            return list(connection.execute(
+                text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+                {"table": connection.dialect.identifier_preparer.format_table(table), "count": count},
+            ).scalars())
+        # SQLite serializes writers, so nobody else takes these before the insert commits
+        start = (connection.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+        return list(range(start, start + count))
+
+    def _insert(self, connection, table, rows: List[dict]) -> None:
+        if not rows:
+            return
+        now = datetime.utcnow()
+        rows = [_column_defaults(table, row, now) for row in rows]
+        if self.use_copy:
+            quote = connection.dialect.identifier_preparer
+            columns = list(rows[0])
+            statement = "COPY {} ({}) FROM STDIN".format(
+                quote.format_table(table), ", ".join(quote.quote(column) for column in columns)
+            )
+            with connection.connection.dbapi_connection.cursor() as cursor:
+                with cursor.copy(statement) as copy:
+                    for row in rows:
+                        copy.write_row([row[column] for column in columns])
+        else:
+            connection.execute(table.insert(), rows)
+        self.inserted[table.name] = self.inserted.get(table.name, 0) + len(rows)
+
+    def _insert_with_ids(self, connection, table, rows: List[dict]) -> List[int]:
+        ids = self._reserve_ids(connection, table, len(rows))
+        for row, row_id in zip(rows, ids):
+            row["id"] = row_id
+        self._insert(connection, table, rows)
+        return ids
+
+    def add_users(self, records: Iterable[dict]) -> List[Tuple[int, bool]]:
+        """
+        Insert user records (name, email, password or password_hash,
+        optionally is_lawyer and a "profile" dict of LawyerProfile columns,
+        which makes the user a lawyer); returns (user id, created) per
+        record. Records whose email exists already are skipped.
+        """
+        users = User.__table__
+        results: List[Tuple[int, bool]] = []
+        for batch in batches(records, self.batch_size):
+            with self.engine.begin() as conn:
+                existing = dict(conn.execute(
+                    select(users.c.email, users.c.id).where(users.c.email.in_(sorted({r["email"] for r in batch})))
+                ).all())
+                new: Dict[str, dict] = {}
+                for record in batch:
+                    if record["email"] not in existing:
+                        new.setdefault(record["email"], record)
+                fresh = list(new.values())
+                unhashed = [r for r in fresh if not r.get("password_hash")]
+                hashes = self._hash([r["password"] for r in unhashed])
+                password_hashes = {r["email"]: h for r, h in zip(unhashed, hashes)}
+
+                ids = self._insert_with_ids(conn, users, [
+                    {
+                        "name": r["name"],
+                        "email": r["email"],
+                        "password_hash": r.get("password_hash") or password_hashes[r["email"]],
+                        "is_lawyer": bool(r.get("is_lawyer") or r.get("profile")),
+                    }
+                    for r in fresh
+                ])
+                created = dict(zip(new, ids))
+                self._add_profiles(conn, [(created[r["email"]], r["profile"]) for r in fresh if r.get("profile")])
+
+            for record in batch:
+                email = record["email"]
+                if email in existing:
+                    self.skipped += 1
+                    results.append((existing[email], False))
+                else:
+                    # A repeated email within the batch maps to the account of its first record
+                    results.append((created[email], record is new[email]))
+        return results
+
+    def _add_profiles(self, connection, profiles: List[Tuple[int, dict]]) -> None:
+        if not profiles:
+            return
+        # New lawyers change every ranking: invalidate the match cache and text index
+        generations = LawyerPoolGeneration.__table__
+        bumped = connection.execute(
+            generations.update().where(generations.c.id == 1).values(generation=generations.c.generation + 1)
+        ).rowcount
+        if not bumped:
+            connection.execute(generations.insert().values(id=1, generation=1))
+        generation = connection.execute(
+            select(generations.c.generation).where(generations.c.id == 1)
+        ).scalar()
+
+        rows = []
+        for user_id, columns in profiles:
+            row = dict(columns, user_id=user_id, pool_generation=generation)
+            row["category_mask"] = parse_expertise(row["expertise_categories"])[0]
+            rows.append(row)
+        ids = self._insert_with_ids(connection, LawyerProfile.__table__, rows)
+        self._insert(connection, LawyerCategory.__table__, [
+            category for profile_id, row in zip(ids, rows)
+            for category in category_rows(profile_id, row["expertise_categories"])
+        ])
+
+    def _add_rows(self, table, records: Iterable[dict]) -> List[int]:
+        ids: List[int] = []
+        for batch in batches(records, self.batch_size):
+            with self.engine.begin() as conn:
+                ids.extend(self._insert_with_ids(conn, table, [dict(r) for r in batch]))
+        return ids
+
+    def add_issues(self, records: Iterable[dict]) -> List[int]:
+        """Insert Issue rows (user_id plus Issue columns); returns their ids."""
+        return self._add_rows(Issue.__table__, records)
+
+    def add_chats(self, records: Iterable[dict]) -> List[int]:
+        """Insert Chat rows (user_id, lawyer_id, optionally issue_id and created_at); returns their ids."""
+        def rows():
+            for record in records:
+                row = dict(record)
+                row.setdefault("created_at", datetime.utcnow())
+                row.setdefault("last_activity_at", row["created_at"])
+                yield row
+        return self._add_rows(Chat.__table__, rows())
+
+    def add_messages(self, records: Iterable[dict]) -> int:
+        """
+        Insert Message rows (chat_id, sender_id, sender_role, content,
+        created_at) and add them to their chats' summaries; returns the
+        number inserted.
+        """
+        messages = Message.__table__
+        count = 0
+        for batch in batches(records, self.batch_size):
+            with self.engine.begin() as conn:
+                rows = [dict(r) for r in batch]
+                for row in rows:
+                    row.setdefault("created_at", datetime.utcnow())
+                self._insert_with_ids(conn, messages, rows)
+                count_message_rows(conn, rows)
+            count += len(rows)
+        return count
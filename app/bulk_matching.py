@@ -0,0 +1,265 @@
+"""
+Bulk matcher: re-rank many issues against the full lawyer pool.
+
+The lawyer pool is loaded once (scoring columns only) and handed to a
+process pool; each task scores a chunk of issues, i.e. a slice of the
+issues x lawyers score matrix, and returns only the top-K per issue. The
+parent process streams results to the match_result table or to a JSONL
+file as chunks complete.
+
+Runs are resumable: issues that already have results for the current
+lawyer-pool generation and scoring plan are skipped, so an interrupted
+run picks up where it stopped.
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from types import SimpleNamespace
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from .extensions import db
+from .models import User, LawyerProfile, Issue, Chat, MatchResult
+from .candidates import SCORING_COLUMNS
+from .match_cache import current_generation
+from .scoring_plan import compile_plan, scoring_plans, use_plan
+from .text_index import TextRelevance, text_index
+
+ISSUE_FIELDS = (
+    "id", "category", "budget_min", "budget_max", "urgency", "preferred_pricing", "city", "description",
+)
+
+# Set in each worker process by _init_worker
+_worker_batch = None
+
+
+def _init_worker(
+    lawyers: List[SimpleNamespace], plan_params: str, plan_version: int, relevance: TextRelevance
+) -> None:
+    from .matching import LawyerBatch
+
+    global _worker_batch
+    _worker_batch = LawyerBatch(lawyers)
+    use_plan(compile_plan(json.loads(plan_params), plan_version))
+    # Published text indexes are memory-mapped by each worker, not copied
+    text_index.use(relevance)
+
+
+def _score_chunk(issues: List[dict], k: int) -> List[dict]:
+    """Score one chunk of issues against the worker's pool, keeping the top-K."""
+    from .matching import rank_lawyer_batch
+
+    results = []
+    for fields in issues:
+        issue = SimpleNamespace(**fields)
+        ranked, total = rank_lawyer_batch(issue, _worker_batch, k)
+        results.append({
+            "issue_id": issue.id,
+            "total": total,
+            "matches": [(_worker_batch.profiles[i].id, score) for i, score in ranked],
+        })
+    return results
+
+
+def load_lawyer_pool() -> List[SimpleNamespace]:
+    """Scoring columns of every lawyer, as picklable records."""
+    rows = (
+        db.session.query(*SCORING_COLUMNS)
+        .join(User, LawyerProfile.user_id == User.id)
+        .filter(User.is_lawyer == True)
+        .order_by(LawyerProfile.id)
+        .all()
+    )
+    return [SimpleNamespace(**row._asdict()) for row in rows]
+
+
+def load_issues(issue_ids: List[int]) -> List[dict]:
+    """Scoring fields of the given issues, as picklable dicts."""
+    issues = []
+    columns = [getattr(Issue, field) for field in ISSUE_FIELDS]
+    for chunk in _chunks(issue_ids, 1000):
+        rows = db.session.query(*columns).filter(Issue.id.in_(chunk)).order_by(Issue.id)
+        issues.extend(row._asdict() for row in rows)
+    return issues
+
+
+def open_issue_ids() -> List[int]:
+    """Issues for which no chat with a lawyer has been started yet."""
+    rows = (
+        db.session.query(Issue.id)
+        .outerjoin(Chat, Chat.issue_id == Issue.id)
+        .filter(Chat.id == None)
+        .order_by(Issue.id)
+        .all()
+    )
+    return [row.id for row in rows]
+
+
+class DatabaseSink:
+    """Writes top-K results to match_result, replacing older results per issue."""
+
+    def __init__(self, generation: int, plan: str):
+        self.generation = generation
+        self.plan = plan
+
+    def done_issue_ids(self) -> Set[int]:
+        rows = (
+            db.session.query(MatchResult.issue_id)
+            .filter(MatchResult.generation == self.generation, MatchResult.plan == self.plan)
+            .distinct()
+        )
+        return {row.issue_id for row in rows}
+
+    def write(self, results: List[dict]) -> None:
+        issue_ids = [result["issue_id"] for result in results]
+        MatchResult.query.filter(MatchResult.issue_id.in_(issue_ids)).delete(
+            synchronize_session=False
+        )
+        rows = [
+            {
+                "issue_id": result["issue_id"],
+                "lawyer_profile_id": profile_id,
+                "rank": rank,
+                "score": score,
+                "generation": self.generation,
+                "plan": self.plan,
+            }
+            for result in results
+            for rank, (profile_id, score) in enumerate(result["matches"], start=1)
+        ]
+        if rows:
+            db.session.execute(MatchResult.__table__.insert(), rows)
+        db.session.commit()
+
+    def close(self) -> None:
+        pass
+
+
+class JSONLSink:
+    """Appends one JSON line per issue; a truncated last line is dropped on resume."""
+
+    def __init__(self, path: str, generation: int, plan: str):
+        self.path = path
+        self.generation = generation
+        self.plan = plan
+        self._trim_partial_line()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _trim_partial_line(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def done_issue_ids(self) -> Set[int]:
+        done = set()
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record["generation"] == self.generation and record.get("plan") == self.plan:
+                        done.add(record["issue_id"])
+        return done
+
+    def write(self, results: List[dict]) -> None:
+        for result in results:
+            record = dict(result, generation=self.generation, plan=self.plan)
+            self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def rank_issues(
+    issues: List[dict], lawyers: List[SimpleNamespace], k: int, workers: int, chunk_size: int = 64
+) -> Iterator[List[dict]]:
+    """
+    Rank `issues` against `lawyers` with the active scoring plan in a pool of
+    `workers` processes, yielding the top-`k` results chunk by chunk as
+    they complete. Must be called inside an app context.
+    """
+    plan = scoring_plans.plan
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(lawyers, plan.params, plan.version, text_index.current()),
+    ) as executor:
+        # Keep a bounded number of chunks in flight so memory stays flat
+        pending = set()
+        for chunk in _chunks(issues, chunk_size):
+            if len(pending) >= workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield future.result()
+            pending.add(executor.submit(_score_chunk, chunk, k))
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield future.result()
+
+
+def bulk_match(
+    issue_ids: Optional[List[int]] = None,
+    k: int = 50,
+    workers: Optional[int] = None,
+    chunk_size: int = 64,
+    jsonl_path: Optional[str] = None,
+    resume: bool = True,
+    progress: bool = True,
+) -> Dict[str, float]:
+    """
+    Rank `issue_ids` (default: all open issues) against the full lawyer pool
+    using `workers` processes, writing the top `k` matches per issue to the
+    database or to `jsonl_path`. Must be called inside an app context.
+    """
+    generation = current_generation()
+    plan = scoring_plans.refresh(force=True)
+    text_index.sync(generation, wait=True)
+    if issue_ids is None:
+        issue_ids = open_issue_ids()
+
+    if jsonl_path:
+        sink = JSONLSink(jsonl_path, generation, plan.fingerprint)
+    else:
+        sink = DatabaseSink(generation, plan.fingerprint)
+    skipped = 0
+    if resume:
+        done = sink.done_issue_ids()
+        skipped = sum(1 for issue_id in issue_ids if issue_id in done)
+        issue_ids = [issue_id for issue_id in issue_ids if issue_id not in done]
+
+    issues = load_issues(issue_ids)
+    lawyers = load_lawyer_pool()
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    scored = 0
+
+    try:
+        for results in rank_issues(issues, lawyers, k, workers, chunk_size):
+            sink.write(results)
+            scored += len(results)
+            if progress:
+                print(f"  {scored}/{len(issues)} issues ranked")
+    finally:
+        sink.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "issues_ranked": scored,
+        "issues_skipped": skipped,
+        "lawyers": len(lawyers),
+        "workers": workers,
+        "plan": plan.fingerprint,
+        "seconds": round(elapsed, 2),
+        "pairs_per_second": round(scored * len(lawyers) / elapsed) if elapsed else 0,
+    }
+
+
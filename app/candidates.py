@@ -0,0 +1,249 @@
+"""
+Candidate selection for lawyer matching.
+
+Cheap predicates (category or related-category membership, free capacity
+and pricing-model compatibility) are pushed into a single SQL query that
+returns only the columns the scorer reads, as plain rows. Full
+LawyerProfile/User objects are loaded afterwards for the page of lawyers
+that is actually rendered.
+
+The same predicates are available as a NumPy mask over a LawyerBatch
+(candidate_mask) for callers that already hold the pool in memory, such
+as the per-worker feature store.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, case, or_
+from sqlalchemy.orm import joinedload
+
+from .extensions import db
+from .models import User, LawyerProfile, Issue
+from .categories import CATEGORY_INDEX, parse_expertise
+from .lawyer_categories import in_categories
+
+
+# Columns read by the scoring functions (see LawyerBatch)
+SCORING_COLUMNS = (
+    LawyerProfile.id,
+    LawyerProfile.user_id,
+    LawyerProfile.expertise_categories,
+    LawyerProfile.rating,
+    LawyerProfile.case_success_rate,
+    LawyerProfile.is_available,
+    LawyerProfile.hourly_rate,
+    LawyerProfile.fixed_rate_min,
+    LawyerProfile.fixed_rate_max,
+    LawyerProfile.accepts_contingency,
+    LawyerProfile.max_cases,
+    LawyerProfile.current_cases,
+    LawyerProfile.city,
+)
+
+
+def candidate_conditions(
+    issue: Issue,
+    match_category: bool = True,
+    require_capacity: bool = True,
+    match_pricing: bool = True,
+) -> List:
+    """SQL predicates behind candidate_query for the given filters."""
+    conditions = []
+
+    if match_category:
+        # Exact, partial or related category (case-type score > 0), from lawyer_category
+        conditions.append(in_categories(CATEGORY_INDEX.matching_names(issue.category)))
+
+    if require_capacity:
+        # Lawyers without capacity score 0 for availability
+        conditions.append(LawyerProfile.is_available == True)
+        conditions.append(LawyerProfile.current_cases < LawyerProfile.max_cases)
+
+    if match_pricing:
+        preferred_pricing = issue.preferred_pricing.lower()
+        if preferred_pricing == "hourly":
+            conditions.append(LawyerProfile.hourly_rate > 0)
+        elif preferred_pricing == "fixed":
+            conditions.append(
+                or_(LawyerProfile.fixed_rate_min > 0, LawyerProfile.fixed_rate_max > 0)
+            )
+        elif preferred_pricing == "contingency":
+            conditions.append(LawyerProfile.accepts_contingency == True)
+
+    return conditions
+
+
+def candidate_query(
+    issue: Issue,
+    match_category: bool = True,
+    require_capacity: bool = True,
+    match_pricing: bool = True,
+):
+    """
+    Build the candidate query for an issue, ordered by LawyerProfile.id so
+    ties in the ranking stay stable across requests.
+    """
+    return (
+        db.session.query(*SCORING_COLUMNS)
+        .join(User, LawyerProfile.user_id == User.id)
+        .filter(User.is_lawyer == True)
+        .filter(*candidate_conditions(issue, match_category, require_capacity, match_pricing))
+        .order_by(LawyerProfile.id)
+    )
+
+
+def passes_filters(
+    lawyer,
+    issue: Issue,
+    match_category: bool = True,
+    require_capacity: bool = True,
+    match_pricing: bool = True,
+) -> bool:
+    """Python equivalent of candidate_query's predicates for a single lawyer."""
+    if match_category:
+        exact, partial, related = CATEGORY_INDEX.score_masks(issue.category)
+        mask, unknown = parse_expertise(lawyer.expertise_categories)
+        if not mask & (exact | partial | related):
+            names = CATEGORY_INDEX.matching_names(issue.category)
+            if not any(name in category for category in unknown for name in names):
+                return False
+
+    if require_capacity:
+        if not (lawyer.is_available and lawyer.current_cases < lawyer.max_cases):
+            return False
+
+    if match_pricing:
+        preferred_pricing = issue.preferred_pricing.lower()
+        if preferred_pricing == "hourly":
+            return lawyer.hourly_rate > 0
+        if preferred_pricing == "fixed":
+            return lawyer.fixed_rate_min > 0 or lawyer.fixed_rate_max > 0
+        if preferred_pricing == "contingency":
+            return bool(lawyer.accepts_contingency)
+    return True
+
+
+# Lawyer cards shown per page on lawyer_matches (?k= can override up to the max); a
+# ranking is built with min_candidates = offset + k, so the page asked for is full
+MATCHES_PER_PAGE = 12
+MAX_MATCHES_PER_PAGE = 50
+
+# Filters from strict to loose; each level's candidates include the previous level's.
+# Selection uses the first level with at least min_candidates lawyers.
+RELAXATIONS = [
+    {"match_category": True, "require_capacity": True, "match_pricing": True},
+    {"match_category": True, "require_capacity": True, "match_pricing": False},
+    {"match_category": True, "require_capacity": False, "match_pricing": False},
+]
+
+
+def choose_level(counts: List[int], min_candidates: int) -> int:
+    """First RELAXATIONS level with at least `min_candidates` candidates, else the last."""
+    for level, count in enumerate(counts):
+        if count >= min_candidates:
+            return level
+    return len(RELAXATIONS) - 1
+
+
+def select_candidates(issue: Issue, min_candidates: int = 0) -> Tuple[List, Dict[str, bool], List[int]]:
+    """
+    Return scoring rows for the lawyers worth ranking for `issue`, the
+    candidate_query filters that produced them, and the number of
+    candidates at each RELAXATIONS level (see relaxation_level).
+
+    If the strict filters leave fewer than `min_candidates` lawyers, the
+    pricing and then capacity predicates are dropped so the user still
+    sees a full page of (lower scoring) lawyers. This is a single query
+    over the loosest filters that tags each row with the strictest level
+    it passes (a CASE column); the level is then chosen from the counts.
+    """
+    loosest = len(RELAXATIONS) - 1
+    row_level = case(
+        *[
+            (and_(*candidate_conditions(issue, **filters)), level)
+            for level, filters in enumerate(RELAXATIONS[:loosest])
+        ],
+        else_=loosest,
+    ).label("relaxation_level")
+    rows = candidate_query(issue, **RELAXATIONS[loosest]).add_columns(row_level).all()
+
+    per_level = np.bincount([row.relaxation_level for row in rows], minlength=len(RELAXATIONS))
+    counts = [int(count) for count in np.cumsum(per_level)]
+    level = choose_level(counts, min_candidates)
+    return [row for row in rows if row.relaxation_level <= level], RELAXATIONS[level], counts
+
+
+def relaxation_level(counts: List[int], min_candidates: int, issue, old_lawyer, new_lawyer) -> Optional[int]:
+    """
+    Update the per-level candidate counts of a ranking (from
+    select_candidates) for one changed lawyer, in place, and return the
+    RELAXATIONS level that selection would pick now; None when that
+    depends on a level the ranking never counted. old_lawyer/new_lawyer
+    are scoring snapshots (None for an insert / delete).
+    """
+    for level in range(len(counts)):
+        filters = RELAXATIONS[level]
+        if old_lawyer is not None and passes_filters(old_lawyer, issue, **filters):
+            counts[level] -= 1
+        if new_lawyer is not None and passes_filters(new_lawyer, issue, **filters):
+            counts[level] += 1
+    if len(counts) < len(RELAXATIONS) and all(count < min_candidates for count in counts):
+        # Ranked before every level was counted
+        return None
+    return choose_level(counts, min_candidates)
+
+
+def candidate_mask(
+    batch,
+    issue: Issue,
+    match_category: bool = True,
+    require_capacity: bool = True,
+    match_pricing: bool = True,
+) -> np.ndarray:
+    """Boolean mask of the LawyerBatch rows candidate_query would return."""
+    mask = np.ones(len(batch), dtype=bool)
+
+    if match_category:
+        exact, partial, related = CATEGORY_INDEX.score_masks(issue.category)
+        in_category = (batch.category_mask & (exact | partial | related)) != 0
+        names = CATEGORY_INDEX.matching_names(issue.category)
+        for i, unknown in batch.unknown_categories.items():
+            if any(name in category for category in unknown for name in names):
+                in_category[i] = True
+        mask &= in_category
+
+    if require_capacity:
+        mask &= batch.is_available & (batch.current_cases < batch.max_cases)
+
+    if match_pricing:
+        preferred_pricing = issue.preferred_pricing.lower()
+        if preferred_pricing == "hourly":
+            mask &= batch.hourly_rate > 0
+        elif preferred_pricing == "fixed":
+            mask &= (batch.fixed_rate_min > 0) | (batch.fixed_rate_max > 0)
+        elif preferred_pricing == "contingency":
+            mask &= batch.accepts_contingency
+
+    return mask
+
+
+def select_candidate_mask(
+    batch, issue: Issue, min_candidates: int = 0
+) -> Tuple[np.ndarray, Dict[str, bool], List[int]]:
+    """In-memory equivalent of select_candidates: (row mask, filters used, candidates per level)."""
+    masks = [candidate_mask(batch, issue, **filters) for filters in RELAXATIONS]
+    counts = [int(mask.sum()) for mask in masks]
+    level = choose_level(counts, min_candidates)
+    return masks[level], RELAXATIONS[level], counts
+
+
+def load_profiles(profile_ids: List[int]) -> Dict[int, LawyerProfile]:
+    """Load full LawyerProfile objects (with their User) for the given ids."""
+    if not profile_ids:
+        return {}
+    profiles = (
+        LawyerProfile.query.options(joinedload(LawyerProfile.user))
+        .filter(LawyerProfile.id.in_(profile_ids))
+        .all()
+    )
+    return {profile.id: profile for profile in profiles}
@@ -0,0 +1,143 @@
+"""
+Category ids, lawyer category bitmasks and the case-type affinity matrix.
+
+ISSUE_CATEGORIES and CATEGORY_RELATIONS are compiled once at import into
+integer ids and an affinity matrix (issue category x lawyer category ->
+score). Case-type scoring then only needs a lawyer's category bitmask and
+three precomputed masks per issue category, instead of lowercasing and
+substring-matching category names on every call.
+"""
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from .models import ISSUE_CATEGORIES
+
+
+EXACT_MATCH_SCORE = 100.0
+PARTIAL_MATCH_SCORE = 70.0
+RELATED_MATCH_SCORE = 40.0
+
+# Categories that earn RELATED_MATCH_SCORE for an issue in the key category.
+# Edit this to tune related-category matching; it is not required to be symmetric.
+CATEGORY_RELATIONS: Dict[str, List[str]] = {
+    "Harassment": ["Workplace Discrimination", "Domestic Violence"],
+    "Workplace Discrimination": ["Harassment"],
+    "Domestic Violence": ["Family Disputes", "Harassment"],
+    "Family Disputes": ["Domestic Violence"],
+    "Property Issues": ["Fraud"],
+    "Fraud": ["Property Issues"],
+}
+
+
+class CategoryIndex:
+    """Compiled category ids, affinity matrix and per-category score masks."""
+
+    def __init__(self, categories: List[str], relations: Dict[str, List[str]]):
+        self.names = [c.lower() for c in categories]
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.relations = {
+            issue.lower(): [r.lower() for r in related]
+            for issue, related in relations.items()
+        }
+        for issue, related in self.relations.items():
+            for name in related:
+                if name not in self.ids:
+                    raise ValueError(f"Unknown related category {name!r} for {issue!r}")
+
+        self.affinity = [
+            [self._pair_score(issue, name) for name in self.names]
+            for issue in self.names
+        ]
+        self._tiers = {
+            issue: self._masks_from_row(row)
+            for issue, row in zip(self.names, self.affinity)
+        }
+
+    def _pair_score(self, issue_category: str, lawyer_category: str) -> float:
+        """Score one lawyer category against an issue category (both lowercase)."""
+        if issue_category == lawyer_category:
+            return EXACT_MATCH_SCORE
+        if issue_category in lawyer_category or lawyer_category in issue_category:
+            return PARTIAL_MATCH_SCORE
+        if lawyer_category in self.relations.get(issue_category, []):
+            return RELATED_MATCH_SCORE
+        return 0.0
+
+    @staticmethod
+    def _masks_from_row(row: List[float]) -> Tuple[int, int, int]:
+        exact = partial = related = 0
+        for bit_id, score in enumerate(row):
+            bit = 1 << bit_id
+            if score == EXACT_MATCH_SCORE:
+                exact |= bit
+            elif score == PARTIAL_MATCH_SCORE:
+                partial |= bit
+            elif score == RELATED_MATCH_SCORE:
+                related |= bit
+        return exact, partial, related
+
+    def score_masks(self, issue_category: str) -> Tuple[int, int, int]:
+        """
+        Return (exact, partial, related) lawyer-category masks for an issue category.
+        Categories outside ISSUE_CATEGORIES are compiled on first use.
+        """
+        issue_category = issue_category.lower()
+        tiers = self._tiers.get(issue_category)
+        if tiers is None:
+            row = [self._pair_score(issue_category, name) for name in self.names]
+            tiers = self._tiers[issue_category] = self._masks_from_row(row)
+        return tiers
+
+    def case_type_score(self, issue_category: str, mask: int, unknown: Tuple[str, ...] = ()) -> float:
+        """Case-type score for a lawyer with category bitmask `mask`."""
+        exact, partial, related = self.score_masks(issue_category)
+        if mask & exact:
+            return EXACT_MATCH_SCORE
+        score = 0.0
+        if unknown:
+            issue_category = issue_category.lower()
+            score = max(self._pair_score(issue_category, name) for name in unknown)
+            if score == EXACT_MATCH_SCORE:
+                return score
+        if mask & partial:
+            return max(score, PARTIAL_MATCH_SCORE)
+        if mask & related:
+            return max(score, RELATED_MATCH_SCORE)
+        return score
+
+    def matching_names(self, issue_category: str) -> List[str]:
+        """Issue category plus every known category that scores above zero for it."""
+        exact, partial, related = self.score_masks(issue_category)
+        names = [issue_category.lower()]
+        for bit_id, name in enumerate(self.names):
+            if (exact | partial | related) & (1 << bit_id) and name not in names:
+                names.append(name)
+        return names
+
+    def is_exact(self, issue_category: str, mask: int, unknown: Tuple[str, ...] = ()) -> bool:
+        """True if the lawyer lists the issue category itself."""
+        exact, _, _ = self.score_masks(issue_category)
+        return bool(mask & exact) or issue_category.lower() in unknown
+
+
+CATEGORY_INDEX = CategoryIndex(ISSUE_CATEGORIES, CATEGORY_RELATIONS)
+
+
+@lru_cache(maxsize=4096)
+def parse_expertise(expertise_categories: str) -> Tuple[int, Tuple[str, ...]]:
+    """
+    Convert a comma-joined expertise string into (bitmask, unknown_names).
+    Names outside ISSUE_CATEGORIES are returned lowercased in unknown_names.
+    """
+    mask = 0
+    unknown = []
+    for cat in expertise_categories.split(","):
+        cat = cat.strip().lower()
+        if not cat:
+            continue
+        bit_id = CATEGORY_INDEX.ids.get(cat)
+        if bit_id is None:
+            unknown.append(cat)
+        else:
+            mask |= 1 << bit_id
+    return mask, tuple(unknown)
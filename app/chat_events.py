@@ -0,0 +1,179 @@
+"""
+In-process pub/sub for real-time chat delivery (SSE stream and long-poll).
+
+Each open stream subscribes to its chat and blocks on its own Condition,
+holding no database connection; a message wakes only the subscribers of
+its chat. A message posted through this process is
+published to its local subscribers straight away. Messages committed by
+other processes (other gunicorn workers, the no-JS form post in another
+worker) are picked up by one poller thread per process, which runs only
+while something is subscribed. Every CHAT_POLL_INTERVAL seconds it issues a
+single primary-key range query for all subscribed chats, so idle
+subscribers never query the database themselves.
+
+Subscribers remember the ids they were offered, so a message seen both
+directly and by the poller is delivered once. A stream subscribes before it
+reads its backlog, so nothing committed in between is missed, and marks
+the backlog as seen.
+"""
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import func
+
+from .extensions import db
+from .models import Message, User
+
+
+def message_event(message: Message, sender_name: str = "") -> dict:
+    """JSON-ready form of a message, as sent on the stream and by the chat endpoints."""
+    return {
+        "id": message.id,
+        "chat_id": message.chat_id,
+        "sender_id": message.sender_id,
+        "sender_name": sender_name,
+        "sender_role": message.sender_role,
+        "content": message.content,
+        "created_at": message.created_at.isoformat(),
+    }
+
+
+class Subscription:
+    """One open stream of a chat: each message after last_id, delivered once."""
+
+    # Ids remembered to drop duplicates; older ones are below last_id
+    MAX_SEEN = 512
+
+    def __init__(self, broker, chat_id: int, last_id: int):
+        self.broker = broker
+        self.chat_id = chat_id
+        self.last_id = last_id
+        self.pending: List[dict] = []
+        self._seen: Set[int] = set()
+        self._condition = threading.Condition()
+
+    def wait(self, timeout: float) -> List[dict]:
+        """New messages, waiting up to `timeout` seconds for some to arrive."""
+        with self._condition:
+            if not self.pending:
+                self._condition.wait_for(lambda: self.pending, timeout)
+            messages, self.pending = self.pending, []
+            return messages
+
+    def seen(self, events: List[dict]) -> None:
+        """Mark messages the caller delivered itself (its backlog) so they aren't delivered again."""
+        with self._condition:
+            self._mark(events)
+            ids = {event["id"] for event in events}
+            self.pending = [event for event in self.pending if event["id"] not in ids]
+
+    def _offer(self, events: List[dict]) -> None:
+        # Not just "id > newest delivered": a message committed by another
+        # worker can reach the poller after a newer one posted here
+        with self._condition:
+            fresh = [event for event in events if event["id"] > self.last_id and event["id"] not in self._seen]
+            if fresh:
+                self.pending.extend(fresh)
+                self._mark(fresh)
+                self._condition.notify()
+
+    def _mark(self, events: List[dict]) -> None:
+        self._seen.update(event["id"] for event in events)
+        if len(self._seen) > self.MAX_SEEN:
+            oldest = sorted(self._seen)[:len(self._seen) - self.MAX_SEEN // 2]
+            self._seen.difference_update(oldest)
+            self.last_id = max(self.last_id, oldest[-1])
+
+
+class ChatBroker:
+    """Process-wide chat fan-out. Configure with init_app(); the poller starts with the first subscriber."""
+
+    # Ids below the high-water mark polled again: on PostgreSQL a message can
+    # commit after one with a higher id; subscribers drop the repeats
+    POLL_OVERLAP = 20
+
+    def __init__(self):
+        self.app = None
+        self.poll_interval = 1.0
+        # Guards the subscription map and the poller state, not delivery
+        self._lock = threading.Lock()
+        self.subscriptions: Dict[int, Set[Subscription]] = defaultdict(set)
+        self._high_water: Optional[int] = None
+        self._poller: Optional[threading.Thread] = None
+
+    def init_app(self, app) -> None:
+        self.app = app
+        self.poll_interval = app.config.get("CHAT_POLL_INTERVAL", 1.0)
+
+    def subscribe(self, chat_id: int, last_id: int) -> Subscription:
+        subscription = Subscription(self, chat_id, last_id)
+        with self._lock:
+            self.subscriptions[chat_id].add(subscription)
+            if self._high_water is None:
+                # Everything up to here is the caller's backlog
+                self._high_water = self._max_message_id()
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll, name="chat-poller", daemon=True)
+                self._poller.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self.subscriptions.get(subscription.chat_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscriptions[subscription.chat_id]
+
+    def publish(self, chat_id: int, events: List[dict]) -> None:
+        """Deliver messages (in id order) to this process's subscribers of a chat."""
+        with self._lock:
+            subscribers = list(self.subscriptions.get(chat_id, ()))
+        for subscription in subscribers:
+            subscription._offer(events)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self.subscriptions.values())
+
+    def _max_message_id(self) -> int:
+        with self.app.app_context():
+            return db.session.query(func.max(Message.id)).scalar() or 0
+
+    def _poll(self) -> None:
+        """Fetch messages committed elsewhere for the subscribed chats until nobody is subscribed."""
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                chat_ids = list(self.subscriptions)
+                if not chat_ids:
+                    self._poller = None
+                    self._high_water = None
+                    return
+                high_water = self._high_water
+            try:
+                with self.app.app_context():
+                    rows = (
+                        db.session.query(Message, User.name)
+                        .join(User, Message.sender_id == User.id)
+                        .filter(Message.id > high_water - self.POLL_OVERLAP, Message.chat_id.in_(chat_ids))
+                        .order_by(Message.id)
+                        .all()
+                    )
+                    events = [message_event(message, name) for message, name in rows]
+            except Exception as e:
+                print(f"Warning: Chat poller error: {e}")
+                continue
+            by_chat: Dict[int, List[dict]] = defaultdict(list)
+            for event in events:
+                by_chat[event["chat_id"]].append(event)
+            for chat_id, chat_events in by_chat.items():
+                self.publish(chat_id, chat_events)
+            if events:
+                with self._lock:
+                    self._high_water = max(self._high_water or 0, events[-1]["id"])
+
+
+chat_broker = ChatBroker()
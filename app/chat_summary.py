@@ -0,0 +1,159 @@
+"""
+Denormalized chat summaries for the dashboards.
+
+Each Chat row carries its last_message_at, last_message_preview,
+message_count and one unread counter per participant, plus
+last_activity_at (the last message's time, or the chat's creation time)
+to order dashboards by. The dashboards then list chats from one query on
+the (user_id|lawyer_id, last_activity_at, id) indexes instead of a
+correlated subquery over message per chat.
+
+An after_insert event on Message updates the chat in the same UPDATE and
+transaction as the insert, so the counters are never out of step with the
+messages committed. A message counts as unread for the other participant;
+sending one marks the chat read for the sender, and mark_read resets the
+viewer's counter when they open the chat. Messages delivered live on the
+chat stream stay counted until then.
+
+Messages inserted with Core bypass the event. Bulk loaders pass each
+batch to count_message_rows (see bulk_load.py); otherwise call
+rebuild_chat_summaries for the chats touched.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, case, event, func, or_, select
+
+from .extensions import db
+from .models import Chat, Message, User
+
+PREVIEW_LENGTH = 120
+REBUILD_BATCH_SIZE = 1000
+
+
+def preview(content: str) -> str:
+    content = " ".join(content.split())
+    if len(content) <= PREVIEW_LENGTH:
+        return content
+    return content[:PREVIEW_LENGTH - 1] + "…"
+
+
+def unread_column(chat_columns, user: User):
+    """The chat column counting `user`'s unread messages."""
+    return chat_columns.lawyer_unread if user.is_lawyer else chat_columns.user_unread
+
+
+def unread_count(chat: Chat, user: User) -> int:
+    return (chat.lawyer_unread if user.is_lawyer else chat.user_unread) or 0
+
+
+def mark_read(chat: Chat, user: User) -> None:
+    """Reset the user's unread counter of a chat (no write when already read)."""
+    if not unread_count(chat, user):
+        return
+    chats = Chat.__table__
+    db.session.execute(chats.update().where(chats.c.id == chat.id).values({unread_column(chats.c, user): 0}))
+    db.session.commit()
+
+
+@event.listens_for(Message, "after_insert")
+def _count_message(mapper, connection, target):
+    chats = Chat.__table__
+    created_at = target.created_at or datetime.utcnow()
+    # Messages committed out of order must not move the last message back
+    newer = or_(chats.c.last_message_at.is_(None), chats.c.last_message_at <= created_at)
+    from_lawyer = target.sender_role == "lawyer"
+    connection.execute(
+        chats.update()
+        .where(chats.c.id == target.chat_id)
+        .values(
+            message_count=func.coalesce(chats.c.message_count, 0) + 1,
+            last_message_at=case((newer, created_at), else_=chats.c.last_message_at),
+            last_activity_at=case((newer, created_at), else_=chats.c.last_activity_at),
+            last_message_preview=case((newer, preview(target.content)), else_=chats.c.last_message_preview),
+            # Unread for the other participant; the sender has read the chat
+            user_unread=func.coalesce(chats.c.user_unread, 0) + 1 if from_lawyer else 0,
+            lawyer_unread=0 if from_lawyer else func.coalesce(chats.c.lawyer_unread, 0) + 1,
+        )
+    )
+
+
+def count_message_rows(connection, rows: List[dict]) -> None:
+    """
+    Add a batch of Core-inserted messages (dicts with id, chat_id,
+    created_at and content) to their chats' summaries, in one executemany
+    UPDATE. Unread counters are left alone: bulk-loaded history counts as read.
+    """
+    latest: Dict[int, dict] = {}
+    counts: Dict[int, int] = {}
+    for row in rows:
+        chat_id = row["chat_id"]
+        counts[chat_id] = counts.get(chat_id, 0) + 1
+        last = latest.get(chat_id)
+        if last is None or (row["created_at"], row["id"]) > (last["created_at"], last["id"]):
+            latest[chat_id] = row
+    if not counts:
+        return
+    chats = Chat.__table__
+    created_at = bindparam("b_created_at", type_=chats.c.last_message_at.type)
+    newer = or_(chats.c.last_message_at.is_(None), chats.c.last_message_at <= created_at)
+    connection.execute(
+        chats.update()
+        .where(chats.c.id == bindparam("b_id"))
+        .values(
+            message_count=func.coalesce(chats.c.message_count, 0) + bindparam("b_count"),
+            last_message_at=case((newer, created_at), else_=chats.c.last_message_at),
+            last_activity_at=case((newer, created_at), else_=chats.c.last_activity_at),
+            last_message_preview=case((newer, bindparam("b_preview")), else_=chats.c.last_message_preview),
+        ),
+        [
+            {"b_id": chat_id, "b_count": count, "b_created_at": latest[chat_id]["created_at"],
+             "b_preview": preview(latest[chat_id]["content"])}
+            for chat_id, count in counts.items()
+        ],
+    )
+
+
+def rebuild_chat_summaries(connection, chat_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute the summary columns from the messages of the given chats (all
+    chats by default), in batches; returns the number of chats rebuilt.
+    Unread counters are kept where set, and start at 0 otherwise.
+    """
+    chats = Chat.__table__
+    messages = Message.__table__
+    if chat_ids is None:
+        ids = list(connection.execute(select(chats.c.id).order_by(chats.c.id)).scalars())
+    else:
+        ids = sorted(set(chat_ids))
+    for start in range(0, len(ids), REBUILD_BATCH_SIZE):
+        batch = ids[start:start + REBUILD_BATCH_SIZE]
+        stats = {
+            row.chat_id: row
+            for row in connection.execute(
+                select(messages.c.chat_id, func.count().label("count"), func.max(messages.c.id).label("last_id"))
+                .where(messages.c.chat_id.in_(batch))
+                .group_by(messages.c.chat_id)
+            )
+        }
+        last = {
+            row.chat_id: row
+            for row in connection.execute(
+                select(messages.c.chat_id, messages.c.created_at, messages.c.content)
+                .where(messages.c.id.in_([row.last_id for row in stats.values()]))
+            )
+        }
+        created = dict(connection.execute(select(chats.c.id, chats.c.created_at).where(chats.c.id.in_(batch))).all())
+        for chat_id in batch:
+            message = last.get(chat_id)
+            connection.execute(
+                chats.update().where(chats.c.id == chat_id).values(
+                    message_count=stats[chat_id].count if chat_id in stats else 0,
+                    last_message_at=message.created_at if message else None,
+                    last_message_preview=preview(message.content) if message else None,
+                    last_activity_at=message.created_at if message else created[chat_id],
+                    user_unread=func.coalesce(chats.c.user_unread, 0),
+                    lawyer_unread=func.coalesce(chats.c.lawyer_unread, 0),
+                )
+            )
+    return len(ids)
@@ -33,14 +33,49 @@ class Config:
             SQLALCHEMY_DATABASE_URI = f"sqlite:///{sqlite_path}"
             print(f"Using SQLite database (default): {sqlite_path}")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Apply pending schema migrations (and seed an empty database) in every create_app; off by
+    # default, as migrate.py does this once per deploy (Procfile release, render.yaml build)
+    MIGRATE_ON_STARTUP = os.environ.get("MIGRATE_ON_STARTUP", "").lower() in ("true", "1", "yes")
     # Session configuration for persistent login
     PERMANENT_SESSION_LIFETIME = 86400 * 30  # 30 days
     # Use secure cookies in production (HTTPS)
     SESSION_COOKIE_SECURE = os.environ.get("FLASK_ENV") == "production" or os.environ.get("RENDER") == "true"
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
-
-
-
-
-
+    # Match-result cache: "memory" (per worker) or "sqlite" (shared by all workers)
+    MATCH_CACHE_BACKEND = os.environ.get("MATCH_CACHE_BACKEND", "memory")
+    MATCH_CACHE_PATH = os.environ.get("MATCH_CACHE_PATH", os.path.join(BASE_DIR, "match_cache.db"))
+    MATCH_CACHE_MAX_ENTRIES = int(os.environ.get("MATCH_CACHE_MAX_ENTRIES", 1000))
+    MATCH_CACHE_DEPTH = 120  # Ranks cached per issue (10 pages of lawyer_matches)
+    # Precompute matches in the background when an issue is submitted (match_jobs.py);
+    # enable only where run_match_jobs.py runs as its own process (Procfile "worker")
+    MATCH_JOBS_ENABLED = os.environ.get("MATCH_JOBS_ENABLED", "false").lower() in ("true", "1", "yes")
+    MATCH_JOB_POLL_INTERVAL = float(os.environ.get("MATCH_JOB_POLL_INTERVAL", 1))  # Seconds
+    MATCH_JOB_TIMEOUT = float(os.environ.get("MATCH_JOB_TIMEOUT", 300))  # Running jobs older than this are retried
+    MATCH_JOB_MAX_ATTEMPTS = 3
+    # Rank from the per-worker in-memory lawyer feature store instead of querying candidates
+    FEATURE_STORE_ENABLED = os.environ.get("FEATURE_STORE_ENABLED", "true").lower() in ("true", "1", "yes")
+    # Memory-mapped TF-IDF index of lawyer experience descriptions (build_text_index.py)
+    TEXT_INDEX_DIR = os.environ.get("TEXT_INDEX_DIR", os.path.join(BASE_DIR, "text_index"))
+    # The match-job runner publishes edited descriptions this often (seconds), as a patch of up to
+    # TEXT_INDEX_MAX_OVERLAY profiles on top of the full build, then as a full rebuild
+    TEXT_INDEX_REFRESH_INTERVAL = float(os.environ.get("TEXT_INDEX_REFRESH_INTERVAL", 30))
+    TEXT_INDEX_MAX_OVERLAY = int(os.environ.get("TEXT_INDEX_MAX_OVERLAY", 2000))
+    # Per-factor matching timings, logged per request and served on /debug/match-stats
+    MATCH_STATS_ENABLED = os.environ.get("MATCH_STATS_ENABLED", "").lower() in ("true", "1", "yes")
+    MATCH_STATS_LOG = os.environ.get("MATCH_STATS_LOG", "true").lower() in ("true", "1", "yes")
+    # Per-request SQL query budgets (query_budget.py): warn, or raise when strict, on N+1 loads
+    QUERY_BUDGET_ENABLED = os.environ.get("QUERY_BUDGET_ENABLED", "true").lower() in ("true", "1", "yes")
+    QUERY_BUDGET_STRICT = os.environ.get("QUERY_BUDGET_STRICT", "").lower() in ("true", "1", "yes")
+    QUERY_BUDGET_DEFAULT = int(os.environ.get("QUERY_BUDGET_DEFAULT", 20))  # Routes without @query_budget.limit
+    # Real-time chat (chat_events.py): seconds between checks for messages posted via other workers,
+    # between keepalives on an idle stream, and before a stream closes and the browser reconnects
+    CHAT_POLL_INTERVAL = float(os.environ.get("CHAT_POLL_INTERVAL", 1))
+    CHAT_KEEPALIVE_INTERVAL = float(os.environ.get("CHAT_KEEPALIVE_INTERVAL", 15))
+    CHAT_STREAM_TIMEOUT = float(os.environ.get("CHAT_STREAM_TIMEOUT", 300))
+    # Cold storage (message_archive.py, archive_messages.py): messages of chats idle this many days
+    # move into compressed chunks of this many messages
+    MESSAGE_ARCHIVE_AFTER_DAYS = float(os.environ.get("MESSAGE_ARCHIVE_AFTER_DAYS", 90))
+    MESSAGE_ARCHIVE_CHUNK_SIZE = int(os.environ.get("MESSAGE_ARCHIVE_CHUNK_SIZE", 500))
+    # Seconds between checks of the scoring_config version (hot reload of matching weights)
+    SCORING_PLAN_CHECK_INTERVAL = float(os.environ.get("SCORING_PLAN_CHECK_INTERVAL", 5))
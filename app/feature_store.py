@@ -0,0 +1,168 @@
+"""
+Per-worker in-memory lawyer feature store.
+
+Each worker process keeps the scoring fields of the whole lawyer pool as
+compact __slots__ records plus the NumPy columns of a LawyerBatch, so a
+match request ranks lawyers without hydrating any LawyerProfile/User
+objects. Full ORM objects are loaded only for the page being rendered.
+
+The store is loaded on first use and refreshed incrementally: when the
+lawyer-pool generation changes, only profiles whose pool_generation (set
+in the same transaction that bumps the generation, see match_cache._bump)
+is newer than the generation the store holds are re-read. Generations
+are bumped on a single locked row, so they commit in order and no clock
+is involved. Removed lawyers (deleted profiles, or users who stopped
+being lawyers) are found by comparing id sets and force a full reload.
+
+Rows are also bucketed by city, so nearest_lawyers() walks outwards
+through the city k-d tree (app/locations.py) instead of scanning the pool.
+"""
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .extensions import db
+from .models import User, LawyerProfile, Issue
+from .candidates import SCORING_COLUMNS, select_candidate_mask
+from .categories import CATEGORY_INDEX
+from .locations import CITY_INDEX
+from .match_cache import current_generation
+from .scoring_plan import ScoringPlan
+
+
+class LawyerFeatures:
+    """Scoring fields of one lawyer."""
+    __slots__ = tuple(column.key for column in SCORING_COLUMNS)
+
+    def __init__(self, row):
+        for name in self.__slots__:
+            setattr(self, name, getattr(row, name))
+
+
+class LawyerFeatureStore:
+    """Lawyer pool snapshot shared by all requests of one worker process."""
+
+    def __init__(self):
+        self.batch = None
+        self.index: Dict[int, int] = {}
+        self.city_rows: Dict[int, np.ndarray] = {}
+        self.generation: Optional[int] = None
+        self.full_loads = 0
+        self.incremental_refreshes = 0
+        self._lock = threading.Lock()
+
+    def _query(self):
+        return (
+            db.session.query(*SCORING_COLUMNS)
+            .join(User, LawyerProfile.user_id == User.id)
+            .filter(User.is_lawyer == True)
+            .order_by(LawyerProfile.id)
+        )
+
+    @staticmethod
+    def _rows_by_city(batch) -> Dict[int, np.ndarray]:
+        order = np.argsort(batch.city_id, kind="stable")
+        cities, starts = np.unique(batch.city_id[order], return_index=True)
+        return {int(city): rows for city, rows in zip(cities, np.split(order, starts[1:]))}
+
+    def _load(self, generation: int) -> None:
+        from .matching import LawyerBatch
+
+        records = [LawyerFeatures(row) for row in self._query()]
+        batch = LawyerBatch(records)
+        self.batch, self.city_rows = batch, self._rows_by_city(batch)
+        self.index = {record.id: i for i, record in enumerate(records)}
+        self.generation = generation
+        self.full_loads += 1
+
+    def _refresh_changed(self, generation: int) -> None:
+        changed = [
+            LawyerFeatures(row)
+            for row in self._query().filter(LawyerProfile.pool_generation > self.generation)
+        ]
+        # Swap in a new batch so concurrent readers keep a consistent snapshot
+        index = dict(self.index)
+        batch = self.batch.replace_rows(changed, index)
+        self.batch, self.index, self.city_rows = batch, index, self._rows_by_city(batch)
+        self.generation = generation
+        self.incremental_refreshes += 1
+
+    def refresh(self) -> None:
+        """Bring the store up to date with the current lawyer-pool generation."""
+        generation = current_generation()
+        if generation == self.generation:
+            return
+        with self._lock:
+            if generation == self.generation:
+                return
+            if self.batch is None:
+                self._load(generation)
+                return
+            lawyer_ids = {profile_id for (profile_id,) in self._query().with_entities(LawyerProfile.id)}
+            self._refresh_changed(generation)
+            if lawyer_ids != self.index.keys():
+                # Profiles were deleted (or stopped, or started, being lawyers)
+                self._load(generation)
+
+    def snapshot(self):
+        """Current LawyerBatch of LawyerFeatures records (refreshing first)."""
+        self.refresh()
+        return self.batch
+
+    def rank(
+        self, issue: Issue, depth: int, min_candidates: int = 0, plan: Optional[ScoringPlan] = None
+    ) -> Tuple[List[Tuple[int, float]], int, Dict[str, bool], List[int]]:
+        """
+        Rank the in-memory pool for an issue: returns the top `depth`
+        (profile_id, score) pairs, the number of lawyers scoring above zero,
+        the candidate filters that were applied and the candidates per
+        relaxation level.
+        """
+        from .matching import rank_lawyer_batch
+
+        batch = self.snapshot()
+        mask, filters, counts = select_candidate_mask(batch, issue, min_candidates)
+        ranked, total = rank_lawyer_batch(issue, batch, depth, candidates=mask, plan=plan)
+        return [(batch.profiles[i].id, score) for i, score in ranked], total, filters, counts
+
+    def nearest_lawyers(
+        self, city: str, k: int, issue_category: Optional[str] = None, max_km: Optional[float] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        (profile_id, distance_km) of up to `k` lawyers with free capacity
+        closest to `city`, optionally only those whose case-type score for
+        `issue_category` is above zero. Empty if the city is unknown.
+        """
+        city_id = CITY_INDEX.lookup(city)
+        if city_id is None:
+            return []
+        self.refresh()
+        batch, city_rows = self.batch, self.city_rows
+
+        found = []
+        for km, other in CITY_INDEX.nearest_cities(city_id):
+            if max_km is not None and km > max_km:
+                break
+            for row in city_rows.get(other, ()):
+                if not (batch.is_available[row] and batch.current_cases[row] < batch.max_cases[row]):
+                    continue
+                if issue_category is not None and not CATEGORY_INDEX.case_type_score(
+                    issue_category, int(batch.category_mask[row]), batch.unknown_categories.get(row, ())
+                ):
+                    continue
+                found.append((batch.profiles[row].id, km))
+                if len(found) == k:
+                    return found
+        return found
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "lawyers": len(self.batch) if self.batch is not None else 0,
+            "generation": self.generation,
+            "full_loads": self.full_loads,
+            "incremental_refreshes": self.incremental_refreshes,
+        }
+
+
+feature_store = LawyerFeatureStore()
@@ -0,0 +1,156 @@
+"""
+Normalized lawyer expertise: the lawyer_category association table and the
+LawyerProfile.category_mask bitmask, both derived from the comma-joined
+expertise_categories string (which stays the source of truth).
+
+Each listed category gets one lawyer_category row. category_id is its
+CATEGORY_INDEX bit id, or NULL for names outside ISSUE_CATEGORIES. The
+(category_id, lawyer_profile_id) index turns category filters into index
+lookups and coverage counts into a single GROUP BY, instead of one
+LIKE '%category%' scan per category.
+
+ORM writes keep both in sync through mapper events. Rows inserted
+with Core (bulk loaders) or written before this existed have a NULL
+category_mask and are filled in by backfill_lawyer_categories, which
+create_app runs on startup. Until then the filters fall back to LIKE
+for them.
+"""
+from typing import Dict, List
+
+from sqlalchemy import and_, event, func, inspect, or_, select
+
+from .extensions import db
+from .models import ISSUE_CATEGORIES, LawyerCategory, LawyerProfile
+from .categories import CATEGORY_INDEX, parse_expertise
+
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def category_rows(profile_id: int, expertise_categories: str) -> List[dict]:
+    """lawyer_category rows for one profile."""
+    rows = []
+    seen = set()
+    for name in expertise_categories.split(","):
+        name = name.strip().lower()
+        if not name or name in seen:
+            continue
+        seen.add(name)
+        rows.append({
+            "lawyer_profile_id": profile_id,
+            "category_id": CATEGORY_INDEX.ids.get(name),
+            "name": name[:100],
+        })
+    return rows
+
+
+def _replace_rows(connection, profile_id: int, expertise_categories: str) -> None:
+    table = LawyerCategory.__table__
+    connection.execute(table.delete().where(table.c.lawyer_profile_id == profile_id))
+    rows = category_rows(profile_id, expertise_categories)
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+def backfill_lawyer_categories(connection) -> int:
+    """
+    Fill in category_mask and lawyer_category rows for every profile whose
+    category_mask is NULL; returns the number of profiles migrated.
+    """
+    profiles = LawyerProfile.__table__
+    migrated = 0
+    while True:
+        batch = connection.execute(
+            select(profiles.c.id, profiles.c.expertise_categories)
+            .where(profiles.c.category_mask.is_(None))
+            .order_by(profiles.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not batch:
+            return migrated
+        table = LawyerCategory.__table__
+        ids = [row.id for row in batch]
+        connection.execute(table.delete().where(table.c.lawyer_profile_id.in_(ids)))
+        rows = [r for row in batch for r in category_rows(row.id, row.expertise_categories or "")]
+        if rows:
+            connection.execute(table.insert(), rows)
+        masks: Dict[int, List[int]] = {}
+        for row in batch:
+            masks.setdefault(parse_expertise(row.expertise_categories or "")[0], []).append(row.id)
+        for mask, mask_ids in masks.items():
+            connection.execute(
+                profiles.update().where(profiles.c.id.in_(mask_ids)).values(category_mask=mask)
+            )
+        migrated += len(batch)
+
+
+def migrate_lawyer_categories() -> None:
+    """Backfill the normalized categories of existing profiles (run by create_app)."""
+    with db.engine.begin() as conn:
+        migrated = backfill_lawyer_categories(conn)
+    if migrated:
+        print(f"Migrated expertise categories of {migrated} lawyers")
+
+
+def in_categories(names: List[str]):
+    """
+    Filter on LawyerProfile matching any of the (lowercase) category names:
+    known categories by index lookup, other names by substring as before.
+    """
+    ids = [CATEGORY_INDEX.ids[name] for name in names if name in CATEGORY_INDEX.ids]
+    listed = select(LawyerCategory.lawyer_profile_id).where(or_(
+        LawyerCategory.category_id.in_(ids),
+        and_(
+            LawyerCategory.category_id.is_(None),
+            or_(*[LawyerCategory.name.contains(name, autoescape=True) for name in names]),
+        ),
+    ))
+    return or_(
+        LawyerProfile.id.in_(listed),
+        # Not migrated yet (see backfill_lawyer_categories)
+        and_(
+            LawyerProfile.category_mask.is_(None),
+            or_(*[LawyerProfile.expertise_categories.ilike(f"%{name}%") for name in names]),
+        ),
+    )
+
+
+def in_category(category: str):
+    """Filter on LawyerProfile listing `category` itself."""
+    return in_categories([category.lower()])
+
+
+def category_coverage() -> Dict[str, int]:
+    """Number of lawyers listing each of ISSUE_CATEGORIES, in one GROUP BY."""
+    counts = dict(
+        db.session.query(LawyerCategory.category_id, func.count(LawyerCategory.lawyer_profile_id))
+        .filter(LawyerCategory.category_id.isnot(None))
+        .group_by(LawyerCategory.category_id)
+        .all()
+    )
+    return {category: counts.get(bit_id, 0) for bit_id, category in enumerate(ISSUE_CATEGORIES)}
+
+
+@event.listens_for(LawyerProfile, "before_insert")
+@event.listens_for(LawyerProfile, "before_update")
+def _set_category_mask(mapper, connection, target):
+    target.category_mask = parse_expertise(target.expertise_categories or "")[0]
+
+
+@event.listens_for(LawyerProfile, "after_insert")
+def _insert_categories(mapper, connection, target):
+    _replace_rows(connection, target.id, target.expertise_categories or "")
+
+
+@event.listens_for(LawyerProfile, "after_update")
+def _update_categories(mapper, connection, target):
+    attrs = inspect(target).attrs
+    # Also when an unmigrated profile (NULL category_mask) is first written
+    if attrs.expertise_categories.history.has_changes() or None in attrs.category_mask.history.deleted:
+        _replace_rows(connection, target.id, target.expertise_categories or "")
+
+
+@event.listens_for(LawyerProfile, "before_delete")
+def _delete_categories(mapper, connection, target):
+    table = LawyerCategory.__table__
+    connection.execute(table.delete().where(table.c.lawyer_profile_id == target.id))
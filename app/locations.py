@@ -0,0 +1,186 @@
+"""
+Offline city coordinates and a k-d tree spatial index for proximity matching.
+
+City names typed by lawyers and clients ("New York, NY", "Lahore",
+"London, UK") are resolved against app/data/cities.csv, which ships with
+the app; no geocoding service is called. Cities are indexed in a k-d tree
+over their 3-D unit vectors, so radius and nearest-city queries are
+sublinear and free of longitude wrap-around.
+
+Proximity scores for one client city are computed once (a radius query)
+and cached, giving a per-city lookup table the scorers index by city id.
+"""
+import csv
+import heapq
+import math
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+CITIES_PATH = os.path.join(os.path.dirname(__file__), "data", "cities.csv")
+
+# Proximity falls linearly from 100 (same city) to 0 at this distance
+PROXIMITY_RADIUS_KM = 500.0
+
+
+def _unit_vector(lat: float, lon: float) -> Tuple[float, float, float]:
+    lat, lon = math.radians(lat), math.radians(lon)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def _chord_to_km(chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(chord / 2, 1.0))
+
+
+def _km_to_chord(km: float) -> float:
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def normalize_city(name: Optional[str]) -> str:
+    """Lowercase, drop periods and collapse whitespace ("St. Louis,  MO" -> "st louis, mo")."""
+    name = (name or "").lower().replace(".", "")
+    return re.sub(r"\s+", " ", name).strip()
+
+
+class KDTree:
+    """Static k-d tree over 3-D points; nodes are (point index, axis, left, right)."""
+
+    def __init__(self, points: List[Tuple[float, float, float]]):
+        self.points = points
+        self.root = self._build(list(range(len(points))), 0)
+
+    def _build(self, indices: List[int], depth: int):
+        if not indices:
+            return None
+        axis = depth % 3
+        indices.sort(key=lambda i: self.points[i][axis])
+        mid = len(indices) // 2
+        return (
+            indices[mid],
+            axis,
+            self._build(indices[:mid], depth + 1),
+            self._build(indices[mid + 1:], depth + 1),
+        )
+
+    def _distance(self, i: int, point) -> float:
+        return math.dist(self.points[i], point)
+
+    def within(self, point, radius: float) -> List[Tuple[float, int]]:
+        """(distance, index) of every point within `radius` of `point`."""
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            i, axis, left, right = node
+            distance = self._distance(i, point)
+            if distance <= radius:
+                found.append((distance, i))
+            diff = point[axis] - self.points[i][axis]
+            stack.append(left if diff < 0 else right)
+            if abs(diff) <= radius:
+                stack.append(right if diff < 0 else left)
+        return found
+
+    def nearest(self, point, k: int) -> List[Tuple[float, int]]:
+        """The k nearest (distance, index) pairs, closest first."""
+        best = []  # max-heap of (-distance, index)
+
+        def visit(node):
+            if node is None:
+                return
+            i, axis, left, right = node
+            distance = self._distance(i, point)
+            if len(best) < k:
+                heapq.heappush(best, (-distance, i))
+            elif distance < -best[0][0]:
+                heapq.heapreplace(best, (-distance, i))
+            diff = point[axis] - self.points[i][axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            if len(best) < k or abs(diff) < -best[0][0]:
+                visit(far)
+
+        visit(self.root)
+        return sorted((-d, i) for d, i in best)
+
+
+class CityIndex:
+    """City name lookup, coordinates and proximity tables."""
+
+    def __init__(self, path: str = CITIES_PATH):
+        self.names: List[str] = []
+        self.coordinates: List[Tuple[float, float]] = []
+        self.ids: Dict[str, int] = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                city_id = len(self.names)
+                self.names.append(f"{row['name']}, {row['region']}")
+                self.coordinates.append((float(row["lat"]), float(row["lon"])))
+                name = normalize_city(row["name"])
+                # First city wins for a bare name
+                self.ids.setdefault(name, city_id)
+                for qualifier in (row["region"], row["country_code"], row["country"]):
+                    self.ids[f"{name}, {normalize_city(qualifier)}"] = city_id
+        self.tree = KDTree([_unit_vector(lat, lon) for lat, lon in self.coordinates])
+
+    def __len__(self):
+        return len(self.names)
+
+    @lru_cache(maxsize=8192)
+    def lookup(self, city: Optional[str]) -> Optional[int]:
+        """City id for a free-form "City" / "City, Region" string, or None if unknown."""
+        name = normalize_city(city)
+        if not name:
+            return None
+        city_id = self.ids.get(name)
+        if city_id is None and "," in name:
+            city_id = self.ids.get(name.split(",", 1)[0].strip())
+        return city_id
+
+    def distance_km(self, a: int, b: int) -> float:
+        return _chord_to_km(math.dist(self.tree.points[a], self.tree.points[b]))
+
+    def within_km(self, city_id: int, km: float) -> List[Tuple[float, int]]:
+        """(distance_km, city_id) of every city within `km` of `city_id`."""
+        point = self.tree.points[city_id]
+        return [(_chord_to_km(chord), i) for chord, i in self.tree.within(point, _km_to_chord(km))]
+
+    def nearest_cities(self, city_id: int) -> Iterator[Tuple[float, int]]:
+        """(distance_km, city_id) of all cities, closest first, fetched lazily."""
+        point = self.tree.points[city_id]
+        k, seen = 8, 0
+        while seen < len(self.names):
+            found = self.tree.nearest(point, min(k, len(self.names)))
+            for chord, i in found[seen:]:
+                yield _chord_to_km(chord), i
+            seen = len(found)
+            k *= 4
+
+    @lru_cache(maxsize=None)
+    def proximity_table(self, city_id: Optional[int]) -> np.ndarray:
+        """
+        Proximity (0-100) of every city to `city_id`, indexed by city id.
+        The extra last entry (index -1) is for lawyers without a known city.
+        """
+        table = np.zeros(len(self.names) + 1, dtype=np.float64)
+        if city_id is not None:
+            for distance, i in self.within_km(city_id, PROXIMITY_RADIUS_KM):
+                table[i] = 100.0 if i == city_id else max(0.0, 100.0 * (1 - distance / PROXIMITY_RADIUS_KM))
+        table.flags.writeable = False
+        return table
+
+    def proximity(self, client_city: Optional[str], lawyer_city: Optional[str]) -> float:
+        """Proximity (0-100) between two free-form city names; 0 if either is unknown."""
+        lawyer_id = self.lookup(lawyer_city)
+        if lawyer_id is None:
+            return 0.0
+        return float(self.proximity_table(self.lookup(client_city))[lawyer_id])
+
+
+CITY_INDEX = CityIndex()
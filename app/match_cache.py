@@ -0,0 +1,428 @@
+"""
+Match-result cache keyed by issue id, lawyer-pool generation and scoring
+plan fingerprint (see scoring_plan.py).
+
+The lawyer-pool generation is a single database row bumped (in the same
+transaction) whenever a LawyerProfile is inserted, updated or deleted, so
+every gunicorn worker sees the same generation and a cached ranking can
+never outlive the pool it was computed from.
+
+When lawyers change, cached rankings from the previous generation are not
+simply dropped: after the commit each one is carried forward to the new
+generation by rescoring only the changed lawyers (matching.rerank_lawyer).
+A ranking is dropped instead when the change would make a fresh ranking
+use other candidate filters (candidates.relaxation_level) or leave its
+first page short; check_match_cache.py checks the two agree.
+
+Two LRU backends are available:
+- "memory": an in-process OrderedDict (default)
+- "sqlite": a shared on-disk store, so all workers reuse each other's results
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+
+from .extensions import db
+from .models import Issue, LawyerProfile, LawyerPoolGeneration
+from .scoring_plan import current_plan
+
+
+class MemoryBackend:
+    """In-process LRU store."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict) -> int:
+        """Store `value` and return the number of evicted entries."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def items_with_suffix(self, suffix: str) -> Iterator[Tuple[str, dict]]:
+        with self._lock:
+            items = [(k, v) for k, v in self._entries.items() if k.endswith(suffix)]
+        return iter(items)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    """LRU store in a SQLite file shared by every worker process."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS match_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_match_cache_accessed_at "
+                "ON match_cache (accessed_at)"
+            )
+
+    def _connect(self):
+        # A short-lived connection per call is safe across gunicorn's fork
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM match_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE match_cache SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict) -> int:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO match_cache (key, value, accessed_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()),
+            )
+            (count,) = conn.execute("SELECT COUNT(*) FROM match_cache").fetchone()
+            evicted = max(count - self.max_entries, 0)
+            if evicted:
+                conn.execute(
+                    "DELETE FROM match_cache WHERE key IN ("
+                    "SELECT key FROM match_cache ORDER BY accessed_at LIMIT ?)",
+                    (evicted,),
+                )
+        return evicted
+
+    def delete(self, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM match_cache WHERE key = ?", (key,))
+
+    def items_with_suffix(self, suffix: str) -> Iterator[Tuple[str, dict]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT key, value FROM match_cache WHERE key LIKE ?", (f"%{suffix}",)
+            ).fetchall()
+        return ((key, json.loads(value)) for key, value in rows)
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM match_cache")
+
+
+class MatchCache:
+    """
+    Caches ranked (profile_id, score) lists per issue and pool generation.
+    Configure with init_app(); hit/miss counters are per process.
+    """
+
+    def __init__(self):
+        self.backend = MemoryBackend(max_entries=1000)
+        self.depth = 120
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def init_app(self, app) -> None:
+        max_entries = app.config.get("MATCH_CACHE_MAX_ENTRIES", 1000)
+        if app.config.get("MATCH_CACHE_BACKEND", "memory") == "sqlite":
+            self.backend = SQLiteBackend(app.config["MATCH_CACHE_PATH"], max_entries)
+        else:
+            self.backend = MemoryBackend(max_entries)
+        self.depth = app.config.get("MATCH_CACHE_DEPTH", 120)
+
+    @staticmethod
+    def key(issue_id: int, generation: int, plan: str) -> str:
+        return f"{issue_id}:{generation}:{plan}"
+
+    def get(
+        self, issue_id: int, generation: int, plan: str, depth: int, min_candidates: int = 0
+    ) -> Optional[dict]:
+        """Return a cached ranking that covers `depth` and `min_candidates` (see covers), if any."""
+        entry = self.backend.get(self.key(issue_id, generation, plan))
+        if entry is not None and covers(entry, depth, min_candidates):
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def peek(self, issue_id: int, generation: int, plan: str) -> Optional[dict]:
+        """The cached ranking, if any, without counting a hit or miss."""
+        return self.backend.get(self.key(issue_id, generation, plan))
+
+    def set(self, issue_id: int, generation: int, plan: str, entry: dict) -> None:
+        self.evictions += self.backend.set(self.key(issue_id, generation, plan), entry)
+
+    def carry_forward(self, old_generation: int, new_generation: int, lawyers: Dict[int, tuple]) -> int:
+        """
+        Move every ranking cached for old_generation to new_generation,
+        re-ranking only the changed lawyers ({profile_id: (old, new)}).
+        Only rankings of the active scoring plan are carried; others can no
+        longer be hit and age out of the LRU. A ranking whose candidate
+        filters a fresh rank_issue would now relax or tighten is dropped
+        and recomputed on its next request.
+        Returns the number of rankings carried forward.
+        """
+        from .candidates import RELAXATIONS, relaxation_level
+        from .matching import rerank_lawyer
+
+        plan = current_plan().fingerprint
+        carried = 0
+        for key, entry in self.backend.items_with_suffix(f":{old_generation}:{plan}"):
+            self.backend.delete(key)
+            if "relaxation_counts" not in entry:
+                continue
+            issue = SimpleNamespace(**entry["issue"])
+            entry["ranking"] = [tuple(pair) for pair in entry["ranking"]]
+            total = entry["total"]
+            for profile_id, (old, new) in lawyers.items():
+                level = relaxation_level(entry["relaxation_counts"], entry["min_candidates"], issue, old, new)
+                if level is None or RELAXATIONS[level] != entry["filters"]:
+                    break
+                rerank_lawyer(entry, issue, profile_id, old, new, entry["filters"])
+                if entry["total"] < entry["min_candidates"] <= total:
+                    # The first page is no longer full: recompute rather than serve it short
+                    break
+            else:
+                self.set(issue.id, new_generation, plan, entry)
+                carried += 1
+        return carried
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+match_cache = MatchCache()
+
+
+def covers(entry: dict, depth: int, min_candidates: int = 0) -> bool:
+    """
+    Whether a match-cache entry holds the first `depth` ranks, selected with
+    filters that leave at least `min_candidates` candidates. An entry
+    relaxed for a deeper page also serves the earlier ones, so the pages
+    of one listing come from the same ranking.
+    """
+    from .candidates import RELAXATIONS
+
+    if entry["depth"] < depth and entry["total"] > entry["depth"]:
+        return False
+    level = RELAXATIONS.index(entry["filters"])
+    # Entries ranked before every level was counted end at their own level
+    counts = entry["relaxation_counts"]
+    return level == len(RELAXATIONS) - 1 or counts[min(level, len(counts) - 1)] >= min_candidates
+
+
+def ensure_pool_generation() -> None:
+    """Create the generation row if it doesn't exist yet."""
+    try:
+        if db.session.get(LawyerPoolGeneration, 1) is None:
+            db.session.add(LawyerPoolGeneration(id=1, generation=0))
+            db.session.commit()
+    except Exception as e:
+        print(f"Warning: Could not initialise lawyer pool generation: {e}")
+        db.session.rollback()
+
+
+def current_generation() -> int:
+    generation = (
+        db.session.query(LawyerPoolGeneration.generation)
+        .filter(LawyerPoolGeneration.id == 1)
+        .scalar()
+    )
+    return generation or 0
+
+
+def _scoring_snapshot(target, before_change: bool) -> SimpleNamespace:
+    """Scoring columns of a LawyerProfile before or after the pending flush."""
+    from .candidates import SCORING_COLUMNS
+
+    state = inspect(target)
+    values = {}
+    for column in SCORING_COLUMNS:
+        history = state.attrs[column.key].history
+        if before_change and history.deleted:
+            values[column.key] = history.deleted[0]
+        else:
+            values[column.key] = getattr(target, column.key)
+    return SimpleNamespace(**values)
+
+
+def _bump(connection, target, old, new) -> None:
+    table = LawyerPoolGeneration.__table__
+    connection.execute(
+        table.update()
+        .where(table.c.id == 1)
+        .values(generation=table.c.generation + 1)
+    )
+    generation = connection.execute(
+        select(table.c.generation).where(table.c.id == 1)
+    ).scalar()
+    if new is not None and generation is not None:
+        # Change marker read by the feature store (LawyerFeatureStore.refresh)
+        profiles = LawyerProfile.__table__
+        connection.execute(
+            profiles.update().where(profiles.c.id == target.id).values(pool_generation=generation)
+        )
+
+    # Remember the change so cached rankings can be carried forward on commit
+    session = object_session(target)
+    if session is None or generation is None:
+        return
+    changes = session.info.setdefault(
+        "lawyer_pool_changes", {"from": generation - 1, "lawyers": {}}
+    )
+    changes["to"] = generation
+    if _text_changed(target):
+        # Text relevance catches up only once the match-job runner publishes
+        # the description (text_index.publish_changes), so rankings are recomputed
+        changes["text_changed"] = True
+    if target.id in changes["lawyers"]:
+        old = changes["lawyers"][target.id][0]
+    changes["lawyers"][target.id] = (old, new)
+
+
+def _text_changed(target) -> bool:
+    state = inspect(target)
+    if state.deleted or state.was_deleted:
+        return False
+    history = state.attrs.experience_description.history
+    return history.has_changes() and bool(target.experience_description)
+
+
+@event.listens_for(LawyerProfile, "after_insert")
+def _bump_on_insert(mapper, connection, target):
+    _bump(connection, target, None, _scoring_snapshot(target, before_change=False))
+
+
+@event.listens_for(LawyerProfile, "after_delete")
+def _bump_on_delete(mapper, connection, target):
+    _bump(connection, target, _scoring_snapshot(target, before_change=True), None)
+
+
+@event.listens_for(LawyerProfile, "after_update")
+def _bump_on_update(mapper, connection, target):
+    # after_update also fires for objects without net column changes
+    state = inspect(target)
+    if any(state.attrs[attr.key].history.has_changes() for attr in mapper.column_attrs):
+        _bump(
+            connection,
+            target,
+            _scoring_snapshot(target, before_change=True),
+            _scoring_snapshot(target, before_change=False),
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _carry_forward_rankings(session):
+    changes = session.info.pop("lawyer_pool_changes", None)
+    if not changes or changes.get("text_changed"):
+        return
+    try:
+        match_cache.carry_forward(changes["from"], changes["to"], changes["lawyers"])
+    except Exception as e:
+        # The rankings will simply be recomputed on the next request
+        print(f"Warning: Could not carry forward cached rankings: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pool_changes(session):
+    session.info.pop("lawyer_pool_changes", None)
+
+
+def get_ranking(issue: Issue, depth: int, min_candidates: int = 0) -> Tuple[List[Tuple[int, float]], int]:
+    """
+    Return the top `depth` (profile_id, score) pairs for an issue and the
+    number of lawyers with a score above zero, from the cache if possible.
+    Rankings are cached per lawyer-pool generation and scoring plan.
+    """
+    from .text_index import text_index
+
+    generation = current_generation()
+    plan = current_plan()
+    # Switch to a newly published text index build before anything is scored
+    text_index.sync(generation)
+    entry = match_cache.get(issue.id, generation, plan.fingerprint, depth, min_candidates)
+    if entry is None:
+        entry = rank_issue(issue, max(depth, match_cache.depth), min_candidates, plan)
+        match_cache.set(issue.id, generation, plan.fingerprint, entry)
+    return [tuple(pair) for pair in entry["ranking"]], entry["total"]
+
+
+def rank_issue(issue: Issue, depth: int, min_candidates: int, plan) -> dict:
+    """
+    Score the lawyer pool for an issue and return a match-cache entry with
+    its top `depth` ranks. The text index must already be synced.
+    """
+    from .candidates import select_candidates
+    from .feature_store import feature_store
+    from .matching import LawyerBatch, rank_lawyer_batch
+
+    if current_app.config.get("FEATURE_STORE_ENABLED", True):
+        # Rank the worker's in-memory pool
+        ranking, total, filters, counts = feature_store.rank(issue, depth, min_candidates, plan)
+    else:
+        # Rank candidate rows selected in SQL
+        candidates, filters, counts = select_candidates(issue, min_candidates=min_candidates)
+        ranked, total = rank_lawyer_batch(issue, LawyerBatch(candidates), depth, plan=plan)
+        ranking = [(candidates[i].id, score) for i, score in ranked]
+    return {
+        "depth": depth,
+        "total": total,
+        "ranking": ranking,
+        # Kept so the ranking can be updated incrementally (carry_forward)
+        "issue": {
+            "id": issue.id,
+            "category": issue.category,
+            "budget_min": issue.budget_min,
+            "budget_max": issue.budget_max,
+            "urgency": issue.urgency,
+            "preferred_pricing": issue.preferred_pricing,
+            "city": issue.city,
+            "description": issue.description,
+        },
+        "filters": filters,
+        # Candidates per relaxation level, to tell when a change would
+        # make select_candidates pick other filters (relaxation_level)
+        "relaxation_counts": counts,
+        "min_candidates": min_candidates,
+    }
@@ -0,0 +1,176 @@
+"""
+Background precomputation of lawyer matches.
+
+submit_issue enqueues a job for the new issue. A separate worker process
+(run_match_jobs.py, the Procfile "worker" entry) ranks it and stores the
+match-cache entry on the job row, so lawyer_matches serves stored results
+instead of scoring the pool while the client waits, and shows a short
+"finding lawyers" page that refreshes itself until then. Web processes
+only enqueue jobs and look them up; they run no job threads.
+Results made stale by a lawyer-pool or plan change, deeper pages and
+failed jobs fall back to the synchronous get_ranking path.
+
+The queue is the match_job table, one row per issue, so there is no
+broker and it works across processes on SQLite and PostgreSQL alike: a
+worker claims a job by flipping it from "queued" to "running" with a
+conditional UPDATE. Jobs left "running" by a worker that died are claimed
+again after MATCH_JOB_TIMEOUT seconds. Results are keyed by lawyer-pool
+generation and scoring plan like the match cache; a stale result is
+simply computed again.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+
+from .candidates import MATCHES_PER_PAGE
+from .extensions import db
+from .models import Issue, MatchJob
+from .match_cache import current_generation, match_cache, rank_issue
+from .scoring_plan import current_plan
+
+
+class MatchJobQueue:
+    """
+    Database-backed queue of match precomputation jobs.
+    Configure with init_app(); run_match_jobs.py runs the jobs.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.poll_interval = 1.0
+        self.timeout = 300.0
+        self.max_attempts = 3
+
+    def init_app(self, app) -> None:
+        self.app = app
+        self.poll_interval = app.config.get("MATCH_JOB_POLL_INTERVAL", 1.0)
+        self.timeout = app.config.get("MATCH_JOB_TIMEOUT", 300.0)
+        self.max_attempts = app.config.get("MATCH_JOB_MAX_ATTEMPTS", 3)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.app and self.app.config.get("MATCH_JOBS_ENABLED", True))
+
+    def lookup(self, issue: Issue) -> Tuple[Optional[dict], bool]:
+        """
+        (entry, pending) for an issue without scoring anything: the current
+        match-cache entry from this process's cache or a finished job, and
+        whether the issue's first ranking is still queued or running.
+
+        A job older than MATCH_JOB_TIMEOUT no longer counts as pending, so
+        the page falls back to ranking synchronously when no worker is
+        picking jobs up. Polling this does not count towards the match
+        cache's hit rate.
+        """
+        generation = current_generation()
+        plan = current_plan().fingerprint
+        entry = match_cache.peek(issue.id, generation, plan)
+        if entry is not None:
+            return entry, False
+        job = MatchJob.query.filter_by(issue_id=issue.id).first()
+        if job is None:
+            return None, False
+        if job.status == "done" and job.generation == generation and job.plan == plan:
+            entry = json.loads(job.result)
+            match_cache.set(issue.id, generation, plan, entry)
+            return entry, False
+        pending = (
+            job.status in ("queued", "running")
+            and job.result is None
+            and job.created_at > datetime.utcnow() - timedelta(seconds=self.timeout)
+        )
+        return None, pending
+
+    def enqueue(self, issue_id: int) -> str:
+        """
+        Queue a ranking of the issue unless a current one is queued, running
+        or has failed; returns the job status.
+        """
+        generation = current_generation()
+        plan = current_plan().fingerprint
+        job = MatchJob.query.filter_by(issue_id=issue_id).first()
+        if job is None:
+            db.session.add(MatchJob(issue_id=issue_id, status="queued"))
+        elif job.status in ("queued", "running"):
+            return job.status
+        elif job.generation == generation and job.plan == plan:
+            return job.status  # Done, or failed for this pool and plan
+        else:
+            job.status = "queued"
+            job.attempts = 0
+            job.error = None
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Queued concurrently by another request
+            db.session.rollback()
+        return "queued"
+
+    def _claim(self) -> Optional[int]:
+        """Mark the oldest runnable job as running and return its id."""
+        while True:
+            now = datetime.utcnow()
+            runnable = or_(
+                MatchJob.status == "queued",
+                and_(MatchJob.status == "running", MatchJob.started_at < now - timedelta(seconds=self.timeout)),
+            )
+            row = db.session.query(MatchJob.id).filter(runnable).order_by(MatchJob.id).first()
+            if row is None:
+                return None
+            claimed = (
+                MatchJob.query.filter(MatchJob.id == row.id, runnable)
+                .update(
+                    {"status": "running", "started_at": now, "attempts": MatchJob.attempts + 1},
+                    synchronize_session=False,
+                )
+            )
+            db.session.commit()
+            if claimed:
+                return row.id
+            # Another worker got there first; try the next job
+
+    def _run(self, job_id: int) -> None:
+        from .text_index import text_index
+
+        job = db.session.get(MatchJob, job_id)
+        issue = db.session.get(Issue, job.issue_id)
+        if issue is None:
+            db.session.delete(job)
+            db.session.commit()
+            return
+        generation = current_generation()
+        plan = current_plan()
+        job.generation = generation
+        job.plan = plan.fingerprint
+        try:
+            text_index.sync(generation)
+            entry = rank_issue(issue, match_cache.depth, MATCHES_PER_PAGE, plan)
+            match_cache.set(issue.id, generation, plan.fingerprint, entry)
+            job.result = json.dumps(entry)
+            job.status = "done"
+            job.error = None
+        except Exception as e:
+            print(f"Warning: Match job for issue {job.issue_id} failed: {e}")
+            db.session.rollback()
+            job = db.session.get(MatchJob, job_id)
+            job.status = "queued" if job.attempts < self.max_attempts else "failed"
+            job.error = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+    def run_pending(self, limit: Optional[int] = None) -> int:
+        """Run queued jobs until there are none (or `limit` ran); returns the number run."""
+        ran = 0
+        while limit is None or ran < limit:
+            job_id = self._claim()
+            if job_id is None:
+                break
+            self._run(job_id)
+            ran += 1
+        return ran
+
+
+match_jobs = MatchJobQueue()
@@ -0,0 +1,166 @@
+"""
+Optional per-factor timing and counters for lawyer matching.
+
+With MATCH_STATS_ENABLED set, calculate_match_score and score_lawyer_batch
+in app.matching time each factor they compute with a Stopwatch, recording
+call counts, cumulative time and a latency histogram per factor. Each
+request also records the pool size, the number of candidates scored and
+the number of SQL statements it ran (which exposes lazy `lawyer.user`
+loads).
+
+Totals are served as JSON on /debug/match-stats (local requests only) and
+every request that ran the matcher logs one summary line at its end.
+When disabled the scorers only test for a missing stopwatch.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Optional
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Histogram bucket upper bounds in microseconds; the last bucket is open-ended
+BUCKETS_US = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 50000, 100000, 500000)
+
+class FactorStats:
+    """Call count, cumulative time and latency histogram of one factor."""
+    __slots__ = ("calls", "seconds", "histogram")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.histogram = [0] * (len(BUCKETS_US) + 1)
+
+    def add(self, seconds: float) -> None:
+        self.calls += 1
+        self.seconds += seconds
+        self.histogram[bisect_left(BUCKETS_US, seconds * 1e6)] += 1
+
+    def as_dict(self) -> Dict:
+        labels = [f"<={bound}us" for bound in BUCKETS_US] + [f">{BUCKETS_US[-1]}us"]
+        return {
+            "calls": self.calls,
+            "total_ms": round(self.seconds * 1000, 3),
+            "mean_us": round(self.seconds * 1e6 / self.calls, 3) if self.calls else 0.0,
+            "histogram": {label: n for label, n in zip(labels, self.histogram) if n},
+        }
+
+
+class Stopwatch:
+    """Times the factors of one scoring call; each lap is the time since the previous one."""
+    __slots__ = ("stats", "prefix", "started", "last")
+
+    def __init__(self, stats: "MatchStats", prefix: str):
+        self.stats = stats
+        self.prefix = prefix
+        self.started = self.last = time.perf_counter()
+
+    def lap(self, factor: str) -> None:
+        now = time.perf_counter()
+        self.stats.record(self.prefix + factor, now - self.last)
+        self.last = now
+
+    def stop(self, factor: str) -> None:
+        """Record the whole call under `factor`."""
+        self.stats.record(self.prefix + factor, time.perf_counter() - self.started)
+
+
+class MatchStats:
+    """Process-wide matching counters. Configure with init_app()."""
+
+    def __init__(self):
+        self.enabled = False
+        self.log_requests = True
+        self.factors: Dict[str, FactorStats] = {}
+        self.requests = 0
+        self.pool_size = 0
+        self.candidates_scored = 0
+        self._lock = threading.Lock()
+        self._installed = False
+
+    def init_app(self, app) -> None:
+        self.enabled = app.config.get("MATCH_STATS_ENABLED", False)
+        self.log_requests = app.config.get("MATCH_STATS_LOG", True)
+        if not self.enabled:
+            return
+        if not self._installed:
+            event.listen(Engine, "before_cursor_execute", self._count_query)
+            self._installed = True
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        print("Match stats enabled (see /debug/match-stats)")
+
+    def stopwatch(self, prefix: str = "") -> Optional[Stopwatch]:
+        """A Stopwatch for one scoring call, or None when stats are disabled."""
+        return Stopwatch(self, prefix) if self.enabled else None
+
+    def _request_stats(self) -> Optional[dict]:
+        if has_request_context():
+            return g.get("match_stats")
+        return None
+
+    def record(self, factor: str, seconds: float) -> None:
+        with self._lock:
+            stats = self.factors.get(factor)
+            if stats is None:
+                stats = self.factors[factor] = FactorStats()
+            stats.add(seconds)
+        current = self._request_stats()
+        if current is not None:
+            calls, total = current["factors"].get(factor, (0, 0.0))
+            current["factors"][factor] = (calls + 1, total + seconds)
+
+    def record_pool(self, pool_size: int, candidates_scored: int) -> None:
+        """Called by the matcher with the pool it ranked for one issue."""
+        with self._lock:
+            self.pool_size += pool_size
+            self.candidates_scored += candidates_scored
+        current = self._request_stats()
+        if current is not None:
+            current["pool_size"] += pool_size
+            current["candidates_scored"] += candidates_scored
+
+    def _count_query(self, conn, cursor, statement, parameters, context, executemany):
+        current = self._request_stats()
+        if current is not None:
+            current["queries"] += 1
+
+    def _start_request(self) -> None:
+        g.match_stats = {"factors": {}, "pool_size": 0, "candidates_scored": 0, "queries": 0}
+
+    def _finish_request(self, response):
+        current = g.pop("match_stats", None)
+        if current is None or not current["factors"]:
+            return response
+        with self._lock:
+            self.requests += 1
+        if self.log_requests:
+            factors = " ".join(
+                f"{factor}={calls}/{seconds * 1000:.2f}ms"
+                for factor, (calls, seconds) in sorted(current["factors"].items())
+            )
+            print(
+                f"match stats {request.method} {request.path}: pool={current['pool_size']} "
+                f"candidates={current['candidates_scored']} queries={current['queries']} {factors}"
+            )
+        return response
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "requests": self.requests,
+                "pool_size": self.pool_size,
+                "candidates_scored": self.candidates_scored,
+                "factors": {name: stats.as_dict() for name, stats in sorted(self.factors.items())},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.factors.clear()
+            self.requests = self.pool_size = self.candidates_scored = 0
+
+
+match_stats = MatchStats()
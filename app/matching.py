@@ -6,82 +6,101 @@ Advanced lawyer matching algorithm that considers multiple factors:
 - Lawyer success rate
 - Availability
 - Pricing compatibility
+- Text relevance (issue description vs. lawyer experience, TF-IDF)
+
+Two scoring paths are provided: the scalar functions below score one
+lawyer at a time, and LawyerBatch/score_lawyer_batch score a whole pool
+at once over NumPy columns. Both return identical results.
 """
-from typing import List, Tuple, Dict
+import heapq
+from bisect import bisect_left
+from typing import List, Tuple, Dict, Optional
+
+import numpy as np
+
 from .models import LawyerProfile, Issue
+from .categories import CATEGORY_INDEX, parse_expertise
+from .locations import CITY_INDEX
+from .candidates import passes_filters
+from .match_stats import match_stats
+from .scoring_plan import FACTORS, ScoringPlan, current_plan
+from .text_index import text_similarities
 
 
-def calculate_match_score(lawyer: LawyerProfile, issue: Issue) -> Tuple[float, Dict[str, float]]:
+def calculate_match_score(
+    lawyer: LawyerProfile, issue: Issue, plan: Optional[ScoringPlan] = None
+) -> Tuple[float, Dict[str, float]]:
     """
-    Calculate a match score (0-100) for a lawyer-issue pair.
+    Calculate a match score (0-100) for a lawyer-issue pair using `plan`
+    (default: the active scoring plan, see app/scoring_plan.py).
     Returns: (total_score, breakdown_dict)
     """
+    watch = match_stats.stopwatch()
+    plan = plan or current_plan()
+    weights = plan.weights
     breakdown = {}
     total_score = 0.0
     
-    # 1. Case Type Match (30% weight) - Most important
+    # 1. Case Type Match (25% default weight) - Most important
     case_type_score = calculate_case_type_match(lawyer, issue)
     breakdown['case_type'] = case_type_score
-    total_score += case_type_score * 0.30
+    total_score += case_type_score * weights['case_type']
+    if watch:
+        watch.lap('case_type')
     
-    # 2. Lawyer Specialization (20% weight)
+    # 2. Lawyer Specialization (15% default weight)
     specialization_score = calculate_specialization_score(lawyer, issue)
     breakdown['specialization'] = specialization_score
-    total_score += specialization_score * 0.20
+    total_score += specialization_score * weights['specialization']
+    if watch:
+        watch.lap('specialization')
     
-    # 3. Success Rate (15% weight)
+    # 3. Success Rate (15% default weight)
     success_rate_score = lawyer.case_success_rate * 100  # Convert 0-1 to 0-100
     breakdown['success_rate'] = success_rate_score
-    total_score += success_rate_score * 0.15
+    total_score += success_rate_score * weights['success_rate']
+    if watch:
+        watch.lap('success_rate')
     
-    # 4. Availability (15% weight)
-    availability_score = calculate_availability_score(lawyer)
+    # 4. Availability (15% default weight)
+    availability_score = calculate_availability_score(lawyer, plan)
     breakdown['availability'] = availability_score
-    total_score += availability_score * 0.15
+    total_score += availability_score * weights['availability']
+    if watch:
+        watch.lap('availability')
     
-    # 5. Pricing Compatibility (15% weight)
-    pricing_score = calculate_pricing_compatibility(lawyer, issue)
+    # 5. Pricing Compatibility (15% default weight)
+    pricing_score = calculate_pricing_compatibility(lawyer, issue, plan)
     breakdown['pricing'] = pricing_score
-    total_score += pricing_score * 0.15
+    total_score += pricing_score * weights['pricing']
+    if watch:
+        watch.lap('pricing')
     
-    # 6. Client Profile Match (5% weight) - Additional factors
-    profile_score = calculate_client_profile_match(lawyer, issue)
+    # 6. Client Profile Match (5% default weight) - Additional factors
+    profile_score = calculate_client_profile_match(lawyer, issue, plan)
     breakdown['client_profile'] = profile_score
-    total_score += profile_score * 0.05
+    total_score += profile_score * weights['client_profile']
+    if watch:
+        watch.lap('client_profile')
+    
+    # 7. Text Relevance (10% default weight) - Issue description vs. experience
+    text_score = calculate_text_relevance(lawyer, issue, plan)
+    breakdown['text_relevance'] = text_score
+    total_score += text_score * weights['text_relevance']
+    if watch:
+        watch.lap('text_relevance')
     
+    if watch:
+        watch.stop('match_score')
     return round(total_score, 2), breakdown
 
 
 def calculate_case_type_match(lawyer: LawyerProfile, issue: Issue) -> float:
     """Score based on how well lawyer's expertise matches the case category."""
-    lawyer_categories = [c.strip().lower() for c in lawyer.categories_list()]
-    issue_category = issue.category.lower()
-    
-    # Exact match = 100 points
-    if issue_category in lawyer_categories:
-        return 100.0
-    
-    # Partial match (category contains issue or vice versa) = 70 points
-    for cat in lawyer_categories:
-        if issue_category in cat or cat in issue_category:
-            return 70.0
-    
-    # Related categories = 40 points (you can expand this logic)
-    related_categories = {
-        'harassment': ['workplace discrimination', 'domestic violence'],
-        'workplace discrimination': ['harassment'],
-        'domestic violence': ['family disputes', 'harassment'],
-        'family disputes': ['domestic violence'],
-        'property issues': ['fraud'],
-        'fraud': ['property issues'],
-    }
-    
-    if issue_category in related_categories:
-        for related in related_categories[issue_category]:
-            if related in lawyer_categories:
-                return 40.0
-    
-    return 0.0
+    # Exact match = 100, partial (substring) match = 70, related category = 40;
+    # see app/categories.py for the compiled affinity matrix.
+    mask, unknown = parse_expertise(lawyer.expertise_categories)
+    return CATEGORY_INDEX.case_type_score(issue.category, mask, unknown)
 
 
 def calculate_specialization_score(lawyer: LawyerProfile, issue: Issue) -> float:
@@ -89,11 +108,9 @@ def calculate_specialization_score(lawyer: LawyerProfile, issue: Issue) -> float
     # Base score from rating (0-5 scale converted to 0-100)
     rating_score = (lawyer.rating / 5.0) * 100
     
-    # Bonus for having multiple relevant categories
-    lawyer_categories = [c.strip().lower() for c in lawyer.categories_list()]
-    issue_category = issue.category.lower()
+    mask, unknown = parse_expertise(lawyer.expertise_categories)
     
-    if issue_category in lawyer_categories:
+    if CATEGORY_INDEX.is_exact(issue.category, mask, unknown):
         # If lawyer specializes in this exact category, give full rating score
         return min(rating_score, 100.0)
     else:
@@ -101,7 +118,7 @@ def calculate_specialization_score(lawyer: LawyerProfile, issue: Issue) -> float
         return rating_score * 0.7
 
 
-def calculate_availability_score(lawyer: LawyerProfile) -> float:
+def calculate_availability_score(lawyer: LawyerProfile, plan: Optional[ScoringPlan] = None) -> float:
     """Score based on lawyer's availability."""
     if not lawyer.is_available_for_new_case():
         return 0.0
@@ -111,18 +128,19 @@ def calculate_availability_score(lawyer: LawyerProfile) -> float:
         return 100.0  # No limit
     
     capacity_used = lawyer.current_cases / lawyer.max_cases
-    availability_pct = (1.0 - capacity_used) * 100
     
-    # Prefer lawyers with more capacity (but don't penalize too much)
-    if capacity_used < 0.5:
-        return 100.0  # Less than 50% capacity = full score
-    elif capacity_used < 0.8:
-        return 80.0  # 50-80% capacity = good score
-    else:
-        return 60.0  # 80-100% capacity = lower but still available
+    # Prefer lawyers with more capacity (but don't penalize too much);
+    # by default <50% used = 100, 50-80% = 80, 80-100% = 60
+    plan = plan or current_plan()
+    for below, score in plan.capacity_tiers:
+        if capacity_used < below:
+            return score
+    return plan.capacity_full_score
 
 
-def calculate_pricing_compatibility(lawyer: LawyerProfile, issue: Issue) -> float:
+def calculate_pricing_compatibility(
+    lawyer: LawyerProfile, issue: Issue, plan: Optional[ScoringPlan] = None
+) -> float:
     """Score based on pricing compatibility between lawyer and client budget."""
     client_budget_min = issue.budget_min
     client_budget_max = issue.budget_max
@@ -133,9 +151,10 @@ def calculate_pricing_compatibility(lawyer: LawyerProfile, issue: Issue) -> floa
     # Check if pricing models match
     if preferred_pricing == "hourly":
         if lawyer.hourly_rate > 0:
-            # Estimate: assume 10-40 hours for typical case
-            estimated_min = lawyer.hourly_rate * 10
-            estimated_max = lawyer.hourly_rate * 40
+            # Estimate: assume 10-40 hours for typical case (plan.hourly_estimate_hours)
+            hours_min, hours_max = (plan or current_plan()).hourly_estimate_hours
+            estimated_min = lawyer.hourly_rate * hours_min
+            estimated_max = lawyer.hourly_rate * hours_max
             
             if estimated_min <= client_budget_max and estimated_max >= client_budget_min:
                 # Budget overlaps
@@ -176,7 +195,9 @@ def calculate_pricing_compatibility(lawyer: LawyerProfile, issue: Issue) -> floa
     return min(score, 100.0)
 
 
-def calculate_client_profile_match(lawyer: LawyerProfile, issue: Issue) -> float:
+def calculate_client_profile_match(
+    lawyer: LawyerProfile, issue: Issue, plan: Optional[ScoringPlan] = None
+) -> float:
     """Score based on client profile factors (urgency, location, etc.)."""
     score = 50.0  # Base score
     
@@ -187,27 +208,453 @@ def calculate_client_profile_match(lawyer: LawyerProfile, issue: Issue) -> float
         elif lawyer.case_success_rate >= 0.75:
             score += 15.0
     
-    # Location matching (if same city, bonus)
-    # This is a placeholder - you can add user location to Issue model if needed
-    # if lawyer.city and issue.user.city and lawyer.city == issue.user.city:
-    #     score += 20.0
+    # Location matching: full bonus in the client's city, less with distance
+    # (see app/locations.py); no bonus if either city is unknown
+    client_city = CITY_INDEX.lookup(getattr(issue, "city", None))
+    if client_city is not None:
+        proximity = CITY_INDEX.proximity(issue.city, lawyer.city)
+        score += (plan or current_plan()).location_bonus * proximity / 100.0
     
     return min(score, 100.0)
 
 
-def match_lawyers_to_issue(issue: Issue, all_lawyers: List[LawyerProfile]) -> List[Tuple[LawyerProfile, float, Dict[str, float]]]:
+def calculate_text_relevance(
+    lawyer: LawyerProfile, issue: Issue, plan: Optional[ScoringPlan] = None
+) -> float:
+    """Score based on TF-IDF similarity of the issue description to the lawyer's experience."""
+    # Similarities come from the lawyer text index (app/text_index.py), computed
+    # once per issue description; lawyers not in the index score 0
+    relevance, similarities = text_similarities(getattr(issue, "description", ""))
+    similarity = float(similarities[relevance.row_of(lawyer.id)])
+    return min(similarity * 100.0 / (plan or current_plan()).text_full_similarity, 100.0)
+
+
+# ---------------------------------------------------------------------------
+# Vectorized (batch) scoring
+# ---------------------------------------------------------------------------
+
+class LawyerBatch:
+    """
+    Columnar snapshot of a lawyer pool for batch scoring.
+
+    `profiles` may be LawyerProfile objects or lightweight rows carrying the
+    same scoring attributes (see app/candidates.py).
+
+    Each scoring field is packed into a NumPy array aligned with `profiles`.
+    Expertise is packed into `category_mask`, one bit per ISSUE_CATEGORIES
+    entry; lawyers with categories outside that list are flagged in
+    `has_unknown_category` and their free-form names are kept in
+    `unknown_categories` for the substring rules.
+    """
+
+    COLUMNS = {
+        'profile_id': np.int64,  # -1 for unsaved profiles
+        'rating': np.float64,
+        'case_success_rate': np.float64,
+        'hourly_rate': np.float64,
+        'fixed_rate_min': np.float64,
+        'fixed_rate_max': np.float64,
+        'accepts_contingency': bool,
+        'is_available': bool,
+        'max_cases': np.int64,
+        'current_cases': np.int64,
+        'category_mask': np.int64,
+        'has_unknown_category': bool,
+        'city_id': np.int64,  # CITY_INDEX id, -1 if unknown
+    }
+
+    def __init__(self, profiles: List[LawyerProfile]):
+        self.profiles = list(profiles)
+        n = len(self.profiles)
+
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, np.zeros(n, dtype=dtype))
+        self.unknown_categories = {}
+
+        for i, lawyer in enumerate(self.profiles):
+            self._set_row(i, lawyer)
+
+    def _set_row(self, i: int, lawyer) -> None:
+        self.profile_id[i] = -1 if lawyer.id is None else lawyer.id
+        self.rating[i] = lawyer.rating
+        self.case_success_rate[i] = lawyer.case_success_rate
+        self.hourly_rate[i] = lawyer.hourly_rate
+        self.fixed_rate_min[i] = lawyer.fixed_rate_min
+        self.fixed_rate_max[i] = lawyer.fixed_rate_max
+        self.accepts_contingency[i] = lawyer.accepts_contingency
+        self.is_available[i] = lawyer.is_available
+        self.max_cases[i] = lawyer.max_cases
+        self.current_cases[i] = lawyer.current_cases
+
+        city_id = CITY_INDEX.lookup(lawyer.city)
+        self.city_id[i] = -1 if city_id is None else city_id
+
+        mask, unknown = parse_expertise(lawyer.expertise_categories)
+        self.category_mask[i] = mask
+        self.has_unknown_category[i] = bool(unknown)
+        if unknown:
+            self.unknown_categories[i] = unknown
+        else:
+            self.unknown_categories.pop(i, None)
+
+    def replace_rows(self, lawyers: List, index: Dict[int, int]) -> "LawyerBatch":
+        """
+        Return a copy of this batch with rows replaced, or appended for new
+        ids. `index` maps every id in the batch to its row and is extended
+        with the appended rows. The original batch is left untouched.
+        """
+        appended = [lawyer for lawyer in lawyers if lawyer.id not in index]
+        for lawyer in appended:
+            index[lawyer.id] = len(index)
+        size = len(self.profiles) + len(appended)
+
+        batch = object.__new__(LawyerBatch)
+        batch.profiles = self.profiles + [None] * len(appended)
+        for name, dtype in self.COLUMNS.items():
+            column = np.zeros(size, dtype=dtype)
+            column[:len(self.profiles)] = getattr(self, name)
+            setattr(batch, name, column)
+        batch.unknown_categories = dict(self.unknown_categories)
+
+        for lawyer in lawyers:
+            i = index[lawyer.id]
+            batch.profiles[i] = lawyer
+            batch._set_row(i, lawyer)
+        return batch
+
+    def __len__(self):
+        return len(self.profiles)
+
+
+def _batch_case_type(batch: LawyerBatch, issue_category: str) -> np.ndarray:
+    exact, partial, related = CATEGORY_INDEX.score_masks(issue_category)
+    mask = batch.category_mask
+    score = np.where(
+        (mask & exact) != 0, 100.0,
+        np.where(
+            (mask & partial) != 0, 70.0,
+            np.where((mask & related) != 0, 40.0, 0.0),
+        ),
+    )
+    # Free-form categories need the substring rules
+    for i, unknown in batch.unknown_categories.items():
+        score[i] = CATEGORY_INDEX.case_type_score(issue_category, int(mask[i]), unknown)
+    return score
+
+
+def _batch_specialization(batch: LawyerBatch, issue_category: str) -> np.ndarray:
+    exact, _, _ = CATEGORY_INDEX.score_masks(issue_category)
+    is_exact = (batch.category_mask & exact) != 0
+    for i, unknown in batch.unknown_categories.items():
+        is_exact[i] = CATEGORY_INDEX.is_exact(issue_category, int(batch.category_mask[i]), unknown)
+    rating_score = (batch.rating / 5.0) * 100
+    return np.where(is_exact, np.minimum(rating_score, 100.0), rating_score * 0.7)
+
+
+def _batch_availability(batch: LawyerBatch, plan: ScoringPlan) -> np.ndarray:
+    available = batch.is_available & (batch.current_cases < batch.max_cases)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        capacity_used = batch.current_cases / batch.max_cases
+    score = np.full(len(batch), plan.capacity_full_score)
+    for below, tier_score in reversed(plan.capacity_tiers):
+        score = np.where(capacity_used < below, tier_score, score)
+    score = np.where(batch.max_cases == 0, 100.0, score)
+    return np.where(available, score, 0.0)
+
+
+def _overlap_score(lo: np.ndarray, hi: np.ndarray, budget_min: float, budget_max: float) -> np.ndarray:
+    """(overlap / total_range) * 100 for price ranges that overlap the budget."""
+    overlap = np.minimum(hi, budget_max) - np.maximum(lo, budget_min)
+    total_range = np.maximum(hi, budget_max) - np.minimum(lo, budget_min)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(total_range > 0, (overlap / total_range) * 100, 50.0)
+
+
+def _batch_pricing(batch: LawyerBatch, issue: Issue, plan: ScoringPlan) -> np.ndarray:
+    budget_min = issue.budget_min
+    budget_max = issue.budget_max
+    preferred_pricing = issue.preferred_pricing.lower()
+    score = np.zeros(len(batch), dtype=np.float64)
+
+    if preferred_pricing == "hourly":
+        hours_min, hours_max = plan.hourly_estimate_hours
+        estimated_min = batch.hourly_rate * hours_min
+        estimated_max = batch.hourly_rate * hours_max
+        overlaps = (estimated_min <= budget_max) & (estimated_max >= budget_min)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if budget_max > 0:
+                above = np.maximum(0, 50 - ((estimated_min - budget_max) / budget_max) * 50)
+            else:
+                above = np.zeros(len(batch))
+            if budget_min > 0:
+                below = np.maximum(0, 50 - ((budget_min - estimated_max) / budget_min) * 50)
+            else:
+                below = np.zeros(len(batch))
+
+        score = np.where(
+            overlaps,
+            _overlap_score(estimated_min, estimated_max, budget_min, budget_max),
+            np.where(estimated_min > budget_max, above, below),
+        )
+        score = np.where(batch.hourly_rate > 0, score, 0.0)
+
+    elif preferred_pricing == "fixed":
+        has_fixed = (batch.fixed_rate_min > 0) | (batch.fixed_rate_max > 0)
+        lawyer_min = np.where(batch.fixed_rate_min > 0, batch.fixed_rate_min, batch.fixed_rate_max * 0.5)
+        lawyer_max = np.where(batch.fixed_rate_max > 0, batch.fixed_rate_max, batch.fixed_rate_min * 2)
+        overlaps = (lawyer_min <= budget_max) & (lawyer_max >= budget_min)
+        score = np.where(
+            overlaps, _overlap_score(lawyer_min, lawyer_max, budget_min, budget_max), 30.0
+        )
+        score = np.where(has_fixed, score, 0.0)
+
+    elif preferred_pricing == "contingency":
+        score = np.where(batch.accepts_contingency, 100.0, 20.0)
+
+    # Neutral score when the lawyer doesn't offer the preferred model
+    score = np.where(score == 0.0, 50.0, score)
+    return np.minimum(score, 100.0)
+
+
+def _batch_client_profile(batch: LawyerBatch, issue: Issue, plan: ScoringPlan) -> np.ndarray:
+    score = np.full(len(batch), 50.0)
+    if issue.urgency in ["high", "urgent"]:
+        rate = batch.case_success_rate
+        score = score + np.where(rate >= 0.85, 30.0, np.where(rate >= 0.75, 15.0, 0.0))
+    client_city = CITY_INDEX.lookup(getattr(issue, "city", None))
+    if client_city is not None:
+        # Row -1 of the proximity table covers lawyers without a known city
+        proximity = CITY_INDEX.proximity_table(client_city)[batch.city_id]
+        score = score + plan.location_bonus * proximity / 100.0
+    return np.minimum(score, 100.0)
+
+
+def _batch_text_relevance(batch: LawyerBatch, issue: Issue, plan: ScoringPlan) -> np.ndarray:
+    relevance, similarities = text_similarities(getattr(issue, "description", ""))
+    # Row -1 (not indexed) is the trailing 0 of the similarities
+    similarity = similarities[relevance.rows_for_batch(batch)]
+    return np.minimum(similarity * 100.0 / plan.text_full_similarity, 100.0)
+
+
+def score_lawyer_batch(
+    batch: LawyerBatch, issue: Issue, plan: Optional[ScoringPlan] = None
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Score every lawyer in `batch` against `issue` in one pass.
+    Returns: (unrounded total scores, breakdown dict of per-factor arrays)
+    """
+    watch = match_stats.stopwatch('batch.')
+    plan = plan or current_plan()
+    weights = plan.weights
+    issue_category = issue.category.lower()
+
+    factors = {
+        'case_type': lambda: _batch_case_type(batch, issue_category),
+        'specialization': lambda: _batch_specialization(batch, issue_category),
+        'success_rate': lambda: batch.case_success_rate * 100,
+        'availability': lambda: _batch_availability(batch, plan),
+        'pricing': lambda: _batch_pricing(batch, issue, plan),
+        'client_profile': lambda: _batch_client_profile(batch, issue, plan),
+        'text_relevance': lambda: _batch_text_relevance(batch, issue, plan),
+    }
+    breakdown = {}
+    for factor, score in factors.items():
+        breakdown[factor] = score()
+        if watch:
+            watch.lap(factor)
+
+    # Same accumulation order as calculate_match_score so totals match exactly
+    total = np.zeros(len(batch), dtype=np.float64)
+    for factor in FACTORS:
+        total += breakdown[factor] * weights[factor]
+
+    if watch:
+        watch.stop('match_score')
+    return total, breakdown
+
+
+def match_lawyers_batch(issue: Issue, batch: LawyerBatch) -> List[Tuple[LawyerProfile, float, Dict[str, float]]]:
+    """Batch equivalent of the scalar loop in match_lawyers_to_issue."""
+    total, breakdown = score_lawyer_batch(batch, issue)
+    columns = {name: values.tolist() for name, values in breakdown.items()}
+    totals = total.tolist()
+
+    matches = []
+    for i, lawyer in enumerate(batch.profiles):
+        lawyer_breakdown = {name: values[i] for name, values in columns.items()}
+        matches.append((lawyer, round(totals[i], 2), lawyer_breakdown))
+    return matches
+
+
+def _select_top(scores: List[float], limit: int) -> Tuple[List[int], int]:
+    """
+    Heap-select the indices of the `limit` best scores above zero, ties
+    broken by index. Returns (ranked indices, number of scores above zero).
+    """
+    candidates = [i for i, score in enumerate(scores) if score > 0]
+    ranked = heapq.nsmallest(limit, candidates, key=lambda i: (-scores[i], i))
+    return ranked, len(candidates)
+
+
+def _select_top_totals(total: np.ndarray, limit: int) -> Tuple[List[Tuple[int, float]], int]:
+    """
+    _select_top over unrounded totals without rounding the whole pool:
+    returns the same (index, rounded score) pairs and count of scores above zero.
+    """
+    positive = total > 0
+    # Only totals below 0.01 can round down to a zero score
+    small = positive & (total < 0.01)
+    count = int(np.count_nonzero(positive & ~small))
+    count += sum(1 for t in total[small].tolist() if round(t, 2) > 0)
+
+    rows = np.flatnonzero(positive)
+    if len(rows) > limit > 0:
+        # Rounding moves a total by at most 0.005, so nothing further than
+        # 0.01 below the limit-th best total can reach the top `limit`
+        kth = np.partition(total[rows], len(rows) - limit)[len(rows) - limit]
+        rows = rows[total[rows] >= kth - 0.01]
+    scores = {i: round(t, 2) for i, t in zip(rows.tolist(), total[rows].tolist())}
+    candidates = [i for i, score in scores.items() if score > 0]
+    ranked = heapq.nsmallest(limit, candidates, key=lambda i: (-scores[i], i))
+    return [(i, scores[i]) for i in ranked], count
+
+
+def rank_lawyer_batch(
+    issue: Issue,
+    batch: LawyerBatch,
+    limit: int,
+    candidates: Optional[np.ndarray] = None,
+    plan: Optional[ScoringPlan] = None,
+) -> Tuple[List[Tuple[int, float]], int]:
+    """
+    Return the top `limit` (batch index, score) pairs and the number of
+    lawyers with a score above zero, without building any breakdowns.
+    If given, `candidates` is a boolean mask of the rows eligible to rank.
+    """
+    total, _ = score_lawyer_batch(batch, issue, plan)
+    if candidates is not None:
+        total = np.where(candidates, total, 0.0)
+    if match_stats.enabled:
+        scored = int(candidates.sum()) if candidates is not None else len(batch)
+        match_stats.record_pool(len(batch), scored)
+    return _select_top_totals(total, limit)
+
+
+def top_k_matches(
+    issue: Issue,
+    batch: LawyerBatch,
+    k: int,
+    offset: int = 0,
+) -> Tuple[List[Tuple[LawyerProfile, float, Dict[str, float]]], int]:
+    """
+    Return one page of matches (ranks offset..offset+k) and the number of
+    lawyers with a score above zero.
+
+    Ranks are selected with a heap instead of sorting the whole pool, and
+    breakdown dicts are built only for the returned lawyers. Ties are broken
+    by pool order, so pages line up with match_lawyers_to_issue's full sort.
+    """
+    total, breakdown = score_lawyer_batch(batch, issue)
+    if match_stats.enabled:
+        match_stats.record_pool(len(batch), len(batch))
+    scores = [round(t, 2) for t in total.tolist()]
+    ranked, count = _select_top(scores, offset + k)
+
+    matches = []
+    for i in ranked[offset:]:
+        lawyer_breakdown = {name: float(values[i]) for name, values in breakdown.items()}
+        matches.append((batch.profiles[i], scores[i], lawyer_breakdown))
+    return matches, count
+
+
+# ---------------------------------------------------------------------------
+# Incremental re-ranking
+# ---------------------------------------------------------------------------
+
+def score_lawyer(lawyer, issue: Issue) -> float:
+    """Rounded match score for one lawyer (profile or scoring row)."""
+    total, _ = score_lawyer_batch(LawyerBatch([lawyer]), issue)
+    return round(total.tolist()[0], 2)
+
+
+def _rank_key(pair) -> Tuple[float, int]:
+    # Rankings are ordered by score (highest first), then profile id
+    return (-pair[1], pair[0])
+
+
+def splice_ranking(entry: dict, profile_id: int, old_score: Optional[float], new_score: Optional[float]) -> None:
+    """
+    Move one lawyer within a cached ranking entry ({"ranking", "total",
+    "depth"}) from old_score to new_score, in place. None means the lawyer
+    was / is not a ranked candidate. Both positions are found by bisection;
+    the delete, insert and truncation shift list items, which is O(depth)
+    but bounded by MATCH_CACHE_DEPTH (120 ranks), no more than carry_forward
+    already spends copying the ranking out of the cache backend.
+    """
+    ranking = entry["ranking"]
+    complete = entry["total"] <= len(ranking)
+
+    if old_score is not None and old_score > 0:
+        entry["total"] -= 1
+        i = bisect_left(ranking, _rank_key((profile_id, old_score)), key=_rank_key)
+        if i < len(ranking) and ranking[i][0] == profile_id:
+            del ranking[i]
+
+    if new_score is not None and new_score > 0:
+        entry["total"] += 1
+        i = bisect_left(ranking, _rank_key((profile_id, new_score)), key=_rank_key)
+        # Past the end of a truncated ranking the lawyer's true rank is unknown
+        if i < len(ranking) or complete:
+            ranking.insert(i, (profile_id, new_score))
+
+    del ranking[entry["depth"]:]
+    if entry["total"] > len(ranking):
+        # Only the cached prefix is known to be exact
+        entry["depth"] = len(ranking)
+
+
+def rerank_lawyer(entry: dict, issue: Issue, profile_id: int, old_lawyer, new_lawyer, filters: Dict[str, bool]) -> None:
+    """
+    Rescore one changed lawyer against a cached ranking for `issue` and
+    splice it into or out of the ranking. old_lawyer/new_lawyer are scoring
+    snapshots before and after the change (None for an insert / delete).
+    """
+    old_score = new_score = None
+    if old_lawyer is not None and passes_filters(old_lawyer, issue, **filters):
+        old_score = score_lawyer(old_lawyer, issue)
+    if new_lawyer is not None and passes_filters(new_lawyer, issue, **filters):
+        new_score = score_lawyer(new_lawyer, issue)
+    if old_score != new_score:
+        splice_ranking(entry, profile_id, old_score, new_score)
+
+
+def match_lawyers_to_issue(
+    issue: Issue,
+    all_lawyers: List[LawyerProfile],
+    vectorized: bool = False,
+) -> List[Tuple[LawyerProfile, float, Dict[str, float]]]:
     """
     Match lawyers to an issue and return sorted list of (lawyer, score, breakdown).
     Returns top matches sorted by score (highest first).
+
+    With vectorized=True the pool is packed into a LawyerBatch and scored
+    with NumPy; the result is identical to the scalar path.
     """
-    matches = []
-    
-    for lawyer in all_lawyers:
-        if not lawyer.user or not lawyer.user.is_lawyer:
-            continue
-        
-        score, breakdown = calculate_match_score(lawyer, issue)
-        matches.append((lawyer, score, breakdown))
+    lawyers = [
+        lawyer for lawyer in all_lawyers
+        if lawyer.user and lawyer.user.is_lawyer
+    ]
+    if match_stats.enabled:
+        match_stats.record_pool(len(all_lawyers), len(lawyers))
+
+    if vectorized:
+        matches = match_lawyers_batch(issue, LawyerBatch(lawyers))
+    else:
+        matches = []
+        for lawyer in lawyers:
+            score, breakdown = calculate_match_score(lawyer, issue)
+            matches.append((lawyer, score, breakdown))
     
     # Sort by score (highest first)
     matches.sort(key=lambda x: x[1], reverse=True)
@@ -0,0 +1,266 @@
+"""
+Cold storage for the messages of inactive chats.
+
+Messages of chats with no activity for MESSAGE_ARCHIVE_AFTER_DAYS move out
+of the message table into message_archive_chunk rows: up to
+MESSAGE_ARCHIVE_CHUNK_SIZE consecutive messages of one chat per row, as
+zlib-compressed JSON. The message table and its indexes then only hold
+recent conversations, and the archived text takes a fraction of the space.
+
+compact (run by archive_messages.py) moves one chunk per transaction, a
+single insert plus a delete by primary key, so writers are never blocked
+for long. A chat that becomes active again keeps its archived chunks, and
+its new messages stay in the message table until it goes quiet again.
+Archived messages are always older than the chat's remaining hot ones.
+
+history_page serves chat history from both tiers. It pages through the
+message table first and decompresses chunks only when a page reaches past
+the hot messages. Archived messages come back as ArchivedMessage objects
+with the same attributes the chat templates and JSON use.
+"""
+import json
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, exists, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import defer
+
+from .extensions import db
+from .models import Chat, Message, MessageArchiveChunk
+from .pagination import encode_cursor, keyset_query
+
+CODEC = "zlib"
+# Decoded chunks kept per process; chunks never change once written
+DECODED_CACHE_SIZE = 64
+
+
+class ArchivedMessage:
+    """A message read back from an archive chunk (same attributes as Message, plus sender from the chat)."""
+
+    __slots__ = ("id", "chat", "chat_id", "sender_id", "sender_role", "content", "created_at")
+
+    def __init__(self, chat: Chat, row: list):
+        self.id, self.sender_id, self.sender_role, self.content, created_at = row
+        self.chat = chat
+        self.chat_id = chat.id
+        self.created_at = datetime.fromisoformat(created_at)
+
+    @property
+    def sender(self):
+        # Messages are only ever sent by the chat's two participants
+        return self.chat.user if self.sender_id == self.chat.user_id else self.chat.lawyer
+
+
+def encode_chunk(rows: List[list]) -> Tuple[bytes, int]:
+    """(compressed data, uncompressed size) of [id, sender_id, sender_role, content, created_at] rows."""
+    raw = json.dumps(rows, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return zlib.compress(raw, 6), len(raw)
+
+
+_decoded: "OrderedDict[int, List[list]]" = OrderedDict()
+_decoded_lock = Lock()
+
+
+def decode_chunk(codec: str, data: bytes) -> List[list]:
+    """The message rows of a chunk's data, oldest first."""
+    if codec != CODEC:
+        raise ValueError(f"Unknown archive codec {codec!r}")
+    return json.loads(zlib.decompress(data))
+
+
+def _decoded_rows(chunks: List[MessageArchiveChunk]) -> dict:
+    """{chunk id: rows}, decoding in one query the chunks this process hasn't cached."""
+    rows = {}
+    with _decoded_lock:
+        for chunk in chunks:
+            if chunk.id in _decoded:
+                _decoded.move_to_end(chunk.id)
+                rows[chunk.id] = _decoded[chunk.id]
+    missing = [chunk.id for chunk in chunks if chunk.id not in rows]
+    if missing:
+        loaded = (
+            db.session.query(MessageArchiveChunk.id, MessageArchiveChunk.codec, MessageArchiveChunk.data)
+            .filter(MessageArchiveChunk.id.in_(missing))
+            .all()
+        )
+        decoded = {chunk_id: decode_chunk(codec, data) for chunk_id, codec, data in loaded}
+        rows.update(decoded)
+        with _decoded_lock:
+            _decoded.update(decoded)
+            while len(_decoded) > DECODED_CACHE_SIZE:
+                _decoded.popitem(last=False)
+    return rows
+
+
+def archive_chunk(connection, chat_id: int, chunk_size: int) -> int:
+    """
+    Move the oldest `chunk_size` hot messages of a chat into one archive
+    chunk, in the caller's transaction; returns the number moved.
+    """
+    messages = Message.__table__
+    rows = connection.execute(
+        select(messages.c.id, messages.c.sender_id, messages.c.sender_role,
+               messages.c.content, messages.c.created_at)
+        .where(
+            messages.c.chat_id == chat_id,
+            # SQLite hands out max(id) + 1 to new rows, so deleting the newest
+            # message of the table would let its id be reused
+            messages.c.id < select(func.max(messages.c.id)).scalar_subquery(),
+        )
+        .order_by(messages.c.id)
+        .limit(chunk_size)
+    ).all()
+    if not rows:
+        return 0
+    data, raw_size = encode_chunk([
+        [row.id, row.sender_id, row.sender_role, row.content, row.created_at.isoformat()] for row in rows
+    ])
+    connection.execute(MessageArchiveChunk.__table__.insert().values(
+        chat_id=chat_id,
+        first_message_id=rows[0].id,
+        last_message_id=rows[-1].id,
+        first_created_at=rows[0].created_at,
+        last_created_at=rows[-1].created_at,
+        message_count=len(rows),
+        codec=CODEC,
+        data=data,
+        raw_size=raw_size,
+        created_at=datetime.utcnow(),
+    ))
+    connection.execute(messages.delete().where(messages.c.id.in_([row.id for row in rows])))
+    return len(rows)
+
+
+def inactive_chats(connection, cutoff: datetime, limit: int, after_id: int = 0) -> List[int]:
+    """Ids (above after_id) of chats idle since before `cutoff` that still have hot messages."""
+    chats = Chat.__table__
+    messages = Message.__table__
+    return list(connection.execute(
+        select(chats.c.id)
+        .where(
+            chats.c.id > after_id,
+            chats.c.last_activity_at < cutoff,
+            exists().where(messages.c.chat_id == chats.c.id),
+        )
+        .order_by(chats.c.id)
+        .limit(limit)
+    ).scalars())
+
+
+def compact(
+    engine=None,
+    older_than_days: float = 90,
+    chunk_size: int = 500,
+    max_chats: Optional[int] = None,
+    batch_size: int = 100,
+    pause: float = 0.0,
+) -> Tuple[int, int]:
+    """
+    Archive the hot messages of inactive chats, one chunk per transaction,
+    sleeping `pause` seconds between chunks to leave room for other
+    writers; returns (chats archived, messages moved).
+    """
+    engine = engine or db.engine
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    archived_chats = moved = 0
+    after_id = 0
+    while max_chats is None or archived_chats < max_chats:
+        with engine.connect() as conn:
+            chat_ids = inactive_chats(conn, cutoff, batch_size, after_id)
+        if not chat_ids:
+            break
+        for chat_id in chat_ids:
+            if max_chats is not None and archived_chats >= max_chats:
+                break
+            while True:
+                try:
+                    with engine.begin() as conn:
+                        count = archive_chunk(conn, chat_id, chunk_size)
+                except IntegrityError:
+                    # Archived concurrently by another compaction run
+                    break
+                moved += count
+                if count < chunk_size:
+                    break
+                if pause:
+                    time.sleep(pause)
+            archived_chats += 1
+        after_id = chat_ids[-1]
+    return archived_chats, moved
+
+
+def _archived_before(chat: Chat, limit: int, before: Optional[Tuple[datetime, int]]) -> List[ArchivedMessage]:
+    """Up to `limit` archived messages of a chat older than `before`, newest first."""
+    chunks = MessageArchiveChunk.query.filter(MessageArchiveChunk.chat_id == chat.id)
+    if before is not None:
+        created_at, row_id = before
+        chunks = chunks.filter(or_(
+            MessageArchiveChunk.first_created_at < created_at,
+            and_(MessageArchiveChunk.first_created_at == created_at,
+                 MessageArchiveChunk.first_message_id < row_id),
+        ))
+    # Each chunk holds at least one message, so `limit` chunks are enough
+    chunks = chunks.options(defer(MessageArchiveChunk.data)).order_by(
+        MessageArchiveChunk.last_created_at.desc(), MessageArchiveChunk.last_message_id.desc()
+    ).limit(limit).all()
+    found: List[ArchivedMessage] = []
+    while chunks and len(found) < limit:
+        # Decode just the chunks the page needs going by their message counts
+        # (usually one; more only if the first one straddles `before`)
+        group, count = [], 0
+        while chunks and count < limit - len(found):
+            group.append(chunks.pop(0))
+            count += group[-1].message_count
+        decoded = _decoded_rows(group)
+        for chunk in group:
+            for row in reversed(decoded[chunk.id]):
+                message = ArchivedMessage(chat, row)
+                if before is None or (message.created_at, message.id) < before:
+                    found.append(message)
+    return found[:limit]
+
+
+def history_page(chat: Chat, limit: int, before: Optional[Tuple[datetime, int]] = None):
+    """
+    keyset_page over a chat's messages in both tiers: the `limit` newest
+    messages older than `before`, newest first, and the cursor for the
+    next (older) page or None on the last page.
+    """
+    rows = keyset_query(chat.messages.order_by(None), Message, limit, before).all()
+    if len(rows) <= limit:
+        # Past the hot messages: continue in the archive
+        bound = (rows[-1].created_at, rows[-1].id) if rows else before
+        rows = rows + _archived_before(chat, limit + 1 - len(rows), bound)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
+def archive_stats(connection) -> dict:
+    """Counts and sizes of the hot and archived tiers."""
+    messages = Message.__table__
+    chunks = MessageArchiveChunk.__table__
+    hot = connection.execute(
+        select(func.count(), func.coalesce(func.sum(func.length(messages.c.content)), 0))
+        .select_from(messages)
+    ).one()
+    cold = connection.execute(
+        select(func.count(), func.coalesce(func.sum(chunks.c.message_count), 0),
+               func.coalesce(func.sum(chunks.c.raw_size), 0),
+               func.coalesce(func.sum(func.length(chunks.c.data)), 0))
+        .select_from(chunks)
+    ).one()
+    return {
+        "hot_messages": hot[0],
+        "hot_content_bytes": hot[1],
+        "chunks": cold[0],
+        "archived_messages": cold[1],
+        "archived_raw_bytes": cold[2],
+        "archived_compressed_bytes": cold[3],
+    }
@@ -0,0 +1,316 @@
+"""
+Versioned schema migrations for SQLite and PostgreSQL.
+
+Each migration is a function registered with @migration(version, name)
+that receives a SQLAlchemy connection inside a transaction. run_migrations
+(called by migrate.py, and by create_app when MIGRATE_ON_STARTUP is on)
+applies the ones missing from the schema_migration table in version
+order, each in its own transaction, so a failing migration leaves nothing
+half-applied on PostgreSQL.
+
+The version row is inserted before the migration runs. That takes the
+write lock on SQLite and blocks concurrent inserts of the same version on
+PostgreSQL, so when several processes migrate at once (gunicorn workers
+with MIGRATE_ON_STARTUP) only one of them applies each migration and the
+others skip it.
+
+Migration 1 is the schema the app had before migrations were versioned,
+spelled out as its own frozen tables (BASELINE) so it never changes with
+the models; databases created back then already have it and only get the
+tables that are missing. Every later change is its own numbered
+migration, on SQLite and PostgreSQL alike.
+
+To change the schema, change the model and append a migration, using
+the model's own Table/Index objects with checkfirst=True (add_column and
+create_index below do that). For example:
+
+    @migration(17, "issue status")
+    def _issue_status(conn):
+        add_column(conn, Issue.__table__.c.status)
+"""
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import (
+    Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table, Text,
+    inspect, select, text,
+)
+from sqlalchemy.exc import DBAPIError, IntegrityError
+
+from .extensions import db
+from .models import (
+    Chat, Issue, IssueAssignment, LawyerCategory, LawyerPoolGeneration, LawyerProfile, MatchJob,
+    MatchResult, Message, MessageArchiveChunk, SchemaMigration, ScoringConfig,
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    upgrade: Callable
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str):
+    """Register a migration; versions must be appended in increasing order."""
+    def register(upgrade):
+        if MIGRATIONS and version <= MIGRATIONS[-1].version:
+            raise ValueError(f"Migration {version} must come after {MIGRATIONS[-1].version}")
+        MIGRATIONS.append(Migration(version, name, upgrade))
+        return upgrade
+    return register
+
+
+def add_column(connection, column: Column) -> None:
+    """Add a (nullable) model column to its existing table if it is missing."""
+    existing = {c["name"] for c in inspect(connection).get_columns(column.table.name)}
+    if column.name in existing:
+        return
+    column_type = column.type.compile(dialect=connection.dialect)
+    connection.execute(text(
+        f'ALTER TABLE "{column.table.name}" ADD COLUMN "{column.name}" {column_type}'
+    ))
+    print(f"Added column {column.table.name}.{column.name}")
+
+
+def create_index(connection, table, name: str) -> None:
+    """Create one of a model table's indexes if it is missing."""
+    index = next(index for index in table.indexes if index.name == name)
+    index.create(bind=connection, checkfirst=True)
+
+
+# The schema before versioned migrations (migration 1); never edit these
+BASELINE = MetaData()
+
+Table(
+    "user", BASELINE,
+    Column("id", Integer, primary_key=True),
+    Column("name", String(120), nullable=False),
+    Column("email", String(120), nullable=False),
+    Column("password_hash", String(255), nullable=False),
+    Column("is_lawyer", Boolean, nullable=False),
+    Index("ix_user_email", "email", unique=True),
+)
+
+Table(
+    "lawyer_profile", BASELINE,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+    Column("expertise_categories", String(255), nullable=False),
+    Column("experience_description", Text, nullable=False),
+    Column("rating", Float, nullable=False),
+    Column("profile_picture", String(255), nullable=False),
+    Column("education", String(255), nullable=False),
+    Column("age", Integer, nullable=False),
+    Column("city", String(120), nullable=False),
+    Column("case_success_rate", Float, nullable=False),
+    Column("is_available", Boolean, nullable=False),
+    Column("hourly_rate", Float, nullable=False),
+    Column("fixed_rate_min", Float, nullable=False),
+    Column("fixed_rate_max", Float, nullable=False),
+    Column("accepts_contingency", Boolean, nullable=False),
+    Column("contingency_percentage", Float, nullable=False),
+    Column("max_cases", Integer, nullable=False),
+    Column("current_cases", Integer, nullable=False),
+)
+
+Table(
+    "issue", BASELINE,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+    Column("title", String(200), nullable=False),
+    Column("description", Text, nullable=False),
+    Column("category", String(100), nullable=False),
+    Column("budget_min", Float, nullable=False),
+    Column("budget_max", Float, nullable=False),
+    Column("urgency", String(20), nullable=False),
+    Column("preferred_pricing", String(20), nullable=False),
+    Column("created_at", DateTime),
+)
+
+Table(
+    "chat", BASELINE,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+    Column("lawyer_id", Integer, ForeignKey("user.id"), nullable=False),
+    Column("issue_id", Integer, ForeignKey("issue.id")),
+    Column("jitsi_link", String(255)),
+    Column("created_at", DateTime),
+)
+
+Table(
+    "message", BASELINE,
+    Column("id", Integer, primary_key=True),
+    Column("chat_id", Integer, ForeignKey("chat.id"), nullable=False),
+    Column("sender_id", Integer, ForeignKey("user.id"), nullable=False),
+    Column("sender_role", String(20), nullable=False),
+    Column("content", Text, nullable=False),
+    Column("created_at", DateTime),
+)
+
+
+def _create_migration_table(engine) -> None:
+    table = SchemaMigration.__table__
+    try:
+        table.create(engine, checkfirst=True)
+    except DBAPIError:
+        if not inspect(engine).has_table(table.name):
+            raise
+        # Created concurrently by another process
+
+
+def applied_versions(engine=None) -> dict:
+    """{version: applied_at} of the migrations applied to the database (read-only)."""
+    engine = engine or db.engine
+    table = SchemaMigration.__table__
+    if not inspect(engine).has_table(table.name):
+        return {}
+    with engine.connect() as conn:
+        return dict(conn.execute(select(table.c.version, table.c.applied_at)).all())
+
+
+def run_migrations(engine=None) -> List[Migration]:
+    """Apply pending migrations; returns the ones applied by this call."""
+    engine = engine or db.engine
+    table = SchemaMigration.__table__
+    _create_migration_table(engine)
+    applied = applied_versions(engine)
+    ran = []
+    for step in MIGRATIONS:
+        if step.version in applied:
+            continue
+        try:
+            with engine.begin() as conn:
+                conn.execute(table.insert().values(
+                    version=step.version, name=step.name, applied_at=datetime.utcnow()
+                ))
+                step.upgrade(conn)
+        except IntegrityError:
+            if step.version in applied_versions(engine):
+                continue  # Applied concurrently by another process
+            raise
+        print(f"Applied migration {step.version:04d} {step.name}")
+        ran.append(step)
+    return ran
+
+
+@migration(1, "initial schema")
+def _initial_schema(conn):
+    BASELINE.create_all(conn, checkfirst=True)
+
+
+@migration(2, "lawyer pool generation")
+def _lawyer_pool_generation(conn):
+    # Bumped on every LawyerProfile write; keys the match cache (match_cache.py)
+    LawyerPoolGeneration.__table__.create(conn, checkfirst=True)
+
+
+@migration(3, "match results")
+def _match_results(conn):
+    MatchResult.__table__.create(conn, checkfirst=True)
+
+
+@migration(4, "lawyer profile change marker")
+def _lawyer_updated_at(conn):
+    # The feature store reloads the profiles changed since its last refresh
+    add_column(conn, LawyerProfile.__table__.c.updated_at)
+    create_index(conn, LawyerProfile.__table__, "ix_lawyer_profile_updated_at")
+
+
+@migration(5, "scoring config")
+def _scoring_config(conn):
+    ScoringConfig.__table__.create(conn, checkfirst=True)
+
+
+@migration(6, "issue city")
+def _issue_city(conn):
+    add_column(conn, Issue.__table__.c.city)
+
+
+@migration(7, "issue assignments")
+def _issue_assignments(conn):
+    IssueAssignment.__table__.create(conn, checkfirst=True)
+
+
+@migration(8, "match jobs")
+def _match_jobs(conn):
+    MatchJob.__table__.create(conn, checkfirst=True)
+
+
+@migration(9, "lawyer categories")
+def _lawyer_categories(conn):
+    # Filled in by prepare_database (lawyer_categories.migrate_lawyer_categories)
+    add_column(conn, LawyerProfile.__table__.c.category_mask)
+    LawyerCategory.__table__.create(conn, checkfirst=True)
+
+
+@migration(10, "hot path indexes")
+def _hot_path_indexes(conn):
+    # Superseded by ix_chat_user_activity and ix_chat_lawyer_activity (migration 13)
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_chat_user_created ON chat (user_id, created_at)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_chat_lawyer_created ON chat (lawyer_id, created_at)"))
+    # Superseded by ix_message_chat_created_id (migration 11)
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_message_chat_created ON message (chat_id, created_at)"))
+    # Superseded by ix_issue_user_created_id (migration 14)
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_issue_user_created ON issue (user_id, created_at)"))
+    create_index(conn, LawyerProfile.__table__, "ix_lawyer_profile_user_id")
+
+
+@migration(11, "message keyset index")
+def _message_keyset_index(conn):
+    # Keyset pages of chat history seek on (created_at, id) within a chat
+    create_index(conn, Message.__table__, "ix_message_chat_created_id")
+    conn.execute(text("DROP INDEX IF EXISTS ix_message_chat_created"))
+
+
+@migration(12, "message since-id index")
+def _message_since_id_index(conn):
+    # Chat streams and long-polls fetch a chat's messages after a given id
+    create_index(conn, Message.__table__, "ix_message_chat_id")
+
+
+@migration(13, "chat summaries")
+def _chat_summaries(conn):
+    from .chat_summary import rebuild_chat_summaries
+
+    for name in ("last_activity_at", "last_message_at", "last_message_preview",
+                 "message_count", "user_unread", "lawyer_unread"):
+        add_column(conn, Chat.__table__.c[name])
+    rebuild_chat_summaries(conn)
+    # Dashboards order chats by activity now
+    create_index(conn, Chat.__table__, "ix_chat_user_activity")
+    create_index(conn, Chat.__table__, "ix_chat_lawyer_activity")
+    conn.execute(text("DROP INDEX IF EXISTS ix_chat_user_created"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_chat_lawyer_created"))
+
+
+@migration(14, "issue keyset index")
+def _issue_keyset_index(conn):
+    # Keyset pages of the user dashboard's issues seek on (created_at, id)
+    create_index(conn, Issue.__table__, "ix_issue_user_created_id")
+    conn.execute(text("DROP INDEX IF EXISTS ix_issue_user_created"))
+
+
+@migration(15, "message archive")
+def _message_archive(conn):
+    MessageArchiveChunk.__table__.create(conn, checkfirst=True)
+
+
+@migration(16, "lawyer text change marker")
+def _lawyer_text_updated_at(conn):
+    # The text index overlay re-vectorises profiles whose description changed
+    # since its build; updated_at also moves on capacity and pricing edits
+    add_column(conn, LawyerProfile.__table__.c.text_updated_at)
+    conn.execute(text("UPDATE lawyer_profile SET text_updated_at = updated_at WHERE text_updated_at IS NULL"))
+    create_index(conn, LawyerProfile.__table__, "ix_lawyer_profile_text_updated_at")
+
+
+@migration(17, "lawyer pool generation marker")
+def _lawyer_pool_generation_marker(conn):
+    # The feature store re-reads profiles written after the generation it
+    # holds; rows from before this migration are covered by its full load
+    add_column(conn, LawyerProfile.__table__.c.pool_generation)
+    conn.execute(text("UPDATE lawyer_profile SET pool_generation = 0 WHERE pool_generation IS NULL"))
+    create_index(conn, LawyerProfile.__table__, "ix_lawyer_profile_pool_generation")
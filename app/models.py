@@ -1,4 +1,5 @@
 from datetime import datetime
+from functools import lru_cache
 
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -49,8 +50,10 @@ def load_user(user_id):
 
 class LawyerProfile(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
     expertise_categories = db.Column(db.String(255), nullable=False)
+    # Bitmask of ISSUE_CATEGORIES ids, kept in sync with expertise_categories (see lawyer_categories.py)
+    category_mask = db.Column(db.Integer)
     experience_description = db.Column(db.Text, nullable=False)
     rating = db.Column(db.Float, default=0.0, nullable=False)
     profile_picture = db.Column(db.String(255), default="default-avatar.png", nullable=False)
@@ -67,18 +70,41 @@ class LawyerProfile(db.Model):
     contingency_percentage = db.Column(db.Float, default=0.0, nullable=False)  # Contingency % if applicable
     max_cases = db.Column(db.Integer, default=10, nullable=False)  # Maximum concurrent cases
     current_cases = db.Column(db.Integer, default=0, nullable=False)  # Current active cases
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Lawyer-pool generation of the last write: the per-worker feature store's change marker
+    pool_generation = db.Column(db.Integer, default=0, nullable=False, index=True)
+    # Moves only when experience_description changes: the text index overlay's marker (see text_index.py)
+    text_updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     user = db.relationship("User", back_populates="lawyer_profile")
 
     def categories_list(self):
-        return [c.strip() for c in self.expertise_categories.split(",") if c.strip()]
+        return list(_split_categories(self.expertise_categories))
     
     def is_available_for_new_case(self):
         """Check if lawyer can take on a new case."""
         return self.is_available and self.current_cases < self.max_cases
 
 
+@lru_cache(maxsize=4096)
+def _split_categories(expertise_categories: str) -> tuple:
+    return tuple(c.strip() for c in expertise_categories.split(",") if c.strip())
+
+
+class LawyerCategory(db.Model):
+    """One row per category a lawyer lists (see lawyer_categories.py)."""
+    __table_args__ = (db.Index("ix_lawyer_category_category_profile", "category_id", "lawyer_profile_id"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    lawyer_profile_id = db.Column(db.Integer, db.ForeignKey("lawyer_profile.id"), nullable=False, index=True)
+    category_id = db.Column(db.Integer)  # Bit id in ISSUE_CATEGORIES, NULL for other names
+    name = db.Column(db.String(100), nullable=False)  # Lowercased category name
+
+
 class Issue(db.Model):
+    # User dashboard: a user's issues in (created_at, id) order, for keyset pages (see pagination.py)
+    __table_args__ = (db.Index("ix_issue_user_created_id", "user_id", "created_at", "id"),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     title = db.Column(db.String(200), nullable=False)
@@ -89,6 +115,7 @@ class Issue(db.Model):
     budget_max = db.Column(db.Float, default=10000.0, nullable=False)  # Maximum budget in PKR
     urgency = db.Column(db.String(20), default="normal", nullable=False)  # low, normal, high, urgent
     preferred_pricing = db.Column(db.String(20), default="hourly", nullable=False)  # hourly, fixed, contingency
+    city = db.Column(db.String(120), default="")  # Client location, for proximity matching
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     user = db.relationship("User", back_populates="issues")
@@ -96,12 +123,25 @@ class Issue(db.Model):
 
 
 class Chat(db.Model):
+    # Dashboards: a user's or a lawyer's chats, most recently active first
+    __table_args__ = (
+        db.Index("ix_chat_user_activity", "user_id", "last_activity_at", "id"),
+        db.Index("ix_chat_lawyer_activity", "lawyer_id", "last_activity_at", "id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     lawyer_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     issue_id = db.Column(db.Integer, db.ForeignKey("issue.id"))
     jitsi_link = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Summary of the messages, maintained on insert (see chat_summary.py)
+    last_activity_at = db.Column(db.DateTime, default=datetime.utcnow)  # Last message, or creation
+    last_message_at = db.Column(db.DateTime)
+    last_message_preview = db.Column(db.String(120))
+    message_count = db.Column(db.Integer, default=0)
+    user_unread = db.Column(db.Integer, default=0)  # Messages from the lawyer the user hasn't opened
+    lawyer_unread = db.Column(db.Integer, default=0)
 
     user = db.relationship("User", foreign_keys=[user_id], back_populates="sent_chats")
     lawyer = db.relationship(
@@ -114,6 +154,13 @@ class Chat(db.Model):
 
 
 class Message(db.Model):
+    # Chat view: a chat's messages in (created_at, id) order, for keyset pages (see pagination.py);
+    # chat stream and long-poll: messages after a client's last seen id (see chat_events.py)
+    __table_args__ = (
+        db.Index("ix_message_chat_created_id", "chat_id", "created_at", "id"),
+        db.Index("ix_message_chat_id", "chat_id", "id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     chat_id = db.Column(db.Integer, db.ForeignKey("chat.id"), nullable=False)
     sender_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
@@ -125,4 +172,85 @@ class Message(db.Model):
     sender = db.relationship("User")
 
 
+class MessageArchiveChunk(db.Model):
+    """Up to MESSAGE_ARCHIVE_CHUNK_SIZE archived messages of a chat, compressed (see message_archive.py)."""
+    __table_args__ = (
+        # Unique: two compaction runs can't archive the same messages twice
+        db.UniqueConstraint("chat_id", "first_message_id", name="uq_message_archive_chunk_chat_first"),
+        db.Index("ix_message_archive_chunk_chat_last", "chat_id", "last_created_at", "last_message_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    chat_id = db.Column(db.Integer, db.ForeignKey("chat.id"), nullable=False)
+    first_message_id = db.Column(db.Integer, nullable=False)
+    last_message_id = db.Column(db.Integer, nullable=False)
+    first_created_at = db.Column(db.DateTime, nullable=False)
+    last_created_at = db.Column(db.DateTime, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False)
+    codec = db.Column(db.String(16), nullable=False, default="zlib")
+    data = db.Column(db.LargeBinary, nullable=False)  # Compressed JSON list of message rows
+    raw_size = db.Column(db.Integer, nullable=False)  # Bytes of the uncompressed JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class LawyerPoolGeneration(db.Model):
+    """Single-row counter bumped whenever a LawyerProfile is written (see match_cache.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    generation = db.Column(db.Integer, default=0, nullable=False)
 
+
+class MatchResult(db.Model):
+    """Precomputed top-K lawyer matches for an issue (see bulk_matching.py)."""
+    __table_args__ = (db.Index("ix_match_result_issue_rank", "issue_id", "rank"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    issue_id = db.Column(db.Integer, db.ForeignKey("issue.id"), nullable=False)
+    lawyer_profile_id = db.Column(db.Integer, db.ForeignKey("lawyer_profile.id"), nullable=False)
+    rank = db.Column(db.Integer, nullable=False)  # 1 = best match
+    score = db.Column(db.Float, nullable=False)
+    generation = db.Column(db.Integer, nullable=False)  # Lawyer-pool generation scored against
+    plan = db.Column(db.String(16))  # Fingerprint of the scoring plan used (see scoring_plan.py)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class MatchJob(db.Model):
+    """Background precomputation of an issue's lawyer ranking, one row per issue (see match_jobs.py)."""
+    __table_args__ = (db.Index("ix_match_job_status_id", "status", "id"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    issue_id = db.Column(db.Integer, db.ForeignKey("issue.id"), nullable=False, unique=True)
+    status = db.Column(db.String(16), nullable=False, default="queued")  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    generation = db.Column(db.Integer)  # Lawyer-pool generation of the last run
+    plan = db.Column(db.String(16))  # Scoring plan fingerprint of the last run
+    result = db.Column(db.Text)  # JSON match-cache entry (see match_cache.get_ranking)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+
+class IssueAssignment(db.Model):
+    """Suggested lawyer per open issue from the capacity-aware global assignment (see assignment.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    issue_id = db.Column(db.Integer, db.ForeignKey("issue.id"), nullable=False, unique=True)
+    lawyer_profile_id = db.Column(db.Integer, db.ForeignKey("lawyer_profile.id"), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+    generation = db.Column(db.Integer, nullable=False)  # Lawyer-pool generation scored against
+    plan = db.Column(db.String(16))  # Fingerprint of the scoring plan used (see scoring_plan.py)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ScoringConfig(db.Model):
+    """Single-row matching weights/parameters as JSON (see scoring_plan.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, default=1, nullable=False)  # Bumped on every change
+    params = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class SchemaMigration(db.Model):
+    """Applied schema migrations (see migrations.py)."""
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(120), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,70 @@
+"""
+Keyset (seek) pagination over (created_at, id), newest first.
+
+Instead of OFFSET, each page is fetched with WHERE (created_at, id) <
+(cursor) ORDER BY created_at DESC, id DESC LIMIT n, so it reads only the
+rows it returns from a (…, created_at, id) index however deep the page
+is. The cursor of the last row on a page is handed to the client as an
+opaque "before" string. Another timestamp column (a chat's
+last_activity_at) can stand in for created_at.
+
+Totals are counted up to a cap (capped_count), which reads at most that
+many index entries where COUNT(*) would read them all.
+"""
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    return f"{created_at.isoformat()}_{row_id}"
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """(created_at, id) from encode_cursor, or None for a missing or malformed cursor."""
+    if not cursor:
+        return None
+    created_at, _, row_id = cursor.rpartition("_")
+    try:
+        return datetime.fromisoformat(created_at), int(row_id)
+    except ValueError:
+        return None
+
+
+def keyset_query(query, model, limit: int, before: Optional[Tuple[datetime, int]] = None, column=None):
+    """
+    `query` narrowed to one page (plus one row, to tell if there are more)
+    older than `before`, by `column` (default model.created_at) then id.
+    """
+    column = model.created_at if column is None else column
+    if before is not None:
+        created_at, row_id = before
+        # The redundant "<=" gives the planner an index range to seek into
+        query = query.filter(and_(
+            column <= created_at,
+            or_(column < created_at, model.id < row_id),
+        ))
+    return query.order_by(column.desc(), model.id.desc()).limit(limit + 1)
+
+
+def keyset_page(
+    query, model, limit: int, before: Optional[Tuple[datetime, int]] = None, column=None
+) -> Tuple[List, Optional[str]]:
+    """
+    The `limit` newest rows of `query` older than `before`, newest first,
+    and the cursor for the next (older) page, or None on the last page.
+    """
+    column = model.created_at if column is None else column
+    rows = keyset_query(query, model, limit, before, column).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(getattr(rows[-1], column.key), rows[-1].id)
+
+
+def capped_count(query, model, cap: int) -> Tuple[int, bool]:
+    """(count, exact): the number of rows of `query`, counting no further than `cap`."""
+    ids = query.with_entities(model.id).order_by(None).limit(cap + 1).subquery()
+    count = query.session.query(func.count()).select_from(ids).scalar()
+    return min(count, cap), count <= cap
@@ -0,0 +1,90 @@
+"""
+Per-request SQL query counter with route query budgets.
+
+Every statement a request executes is counted. Routes declare how many
+they may run with @query_budget.limit(n), a number that must not grow
+with the rows on the page (chats, messages, matched lawyers): those are
+loaded with joinedload/selectinload, so a lazy load per row (N+1) pushes
+the request over its budget. Other routes get QUERY_BUDGET_DEFAULT.
+
+A request over budget logs a warning. With QUERY_BUDGET_STRICT
+(check_query_budget.py) it raises QueryBudgetExceeded with the statements
+it ran instead, so N+1 regressions fail the check, and every response
+reports its count in an X-Query-Count header.
+"""
+from functools import wraps
+from typing import Optional
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(Exception):
+    """A request ran more SQL statements than its route's budget."""
+
+
+class QueryBudget:
+    """Counts the statements of each request. Configure with init_app()."""
+
+    def __init__(self):
+        self.enabled = True
+        self.strict = False
+        self.default = 20
+        self._installed = False
+
+    def init_app(self, app) -> None:
+        self.enabled = app.config.get("QUERY_BUDGET_ENABLED", True)
+        self.strict = app.config.get("QUERY_BUDGET_STRICT", False)
+        self.default = app.config.get("QUERY_BUDGET_DEFAULT", 20)
+        if not self.enabled:
+            return
+        if not self._installed:
+            event.listen(Engine, "before_cursor_execute", self._count_query)
+            self._installed = True
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def limit(self, budget: int):
+        """Route decorator: the view (including its template) may run at most `budget` statements."""
+        def decorator(view):
+            @wraps(view)
+            def limited(*args, **kwargs):
+                if has_request_context():
+                    g.query_budget = budget
+                return view(*args, **kwargs)
+            return limited
+        return decorator
+
+    def count(self) -> Optional[int]:
+        """Statements run so far by the current request."""
+        if has_request_context():
+            statements = g.get("query_statements")
+            return None if statements is None else len(statements)
+        return None
+
+    def _count_query(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            statements = g.get("query_statements")
+            if statements is not None:
+                statements.append(statement)
+
+    def _start_request(self) -> None:
+        g.query_statements = []
+
+    def _finish_request(self, response):
+        statements = g.pop("query_statements", None)
+        if statements is None:
+            return response
+        budget = g.get("query_budget", self.default)
+        if self.strict:
+            response.headers["X-Query-Count"] = str(len(statements))
+        if len(statements) > budget:
+            message = f"{request.method} {request.path} ran {len(statements)} queries (budget {budget})"
+            if self.strict:
+                raise QueryBudgetExceeded(message + ":\n  " + "\n  ".join(statements))
+            print(f"Warning: {message}")
+        return response
+
+
+query_budget = QueryBudget()
@@ -1,20 +1,42 @@
+import json
 import secrets
+import time
 
 from flask import (
     Blueprint,
+    Response,
+    current_app,
     render_template,
     redirect,
     url_for,
     request,
     flash,
+    abort,
+    jsonify,
 )
 from flask_login import login_user, logout_user, login_required, current_user
+from sqlalchemy.orm import joinedload
 
+from .candidates import MATCHES_PER_PAGE, MAX_MATCHES_PER_PAGE
+from .chat_events import chat_broker, message_event
+from .chat_summary import mark_read
 from .extensions import db
+from .message_archive import history_page
 from .models import User, LawyerProfile, Issue, Chat, Message, ISSUE_CATEGORIES
+from .pagination import capped_count, decode_cursor, keyset_page
+from .query_budget import query_budget
 
 main_bp = Blueprint("main", __name__)
 
+# Chat messages shown per page (keyset pages, newest first; see pagination.py)
+MESSAGES_PER_PAGE = 50
+MAX_MESSAGES_PER_PAGE = 200
+# Dashboard issues and chats per page, and the count above which totals show as "1000+"
+DASHBOARD_PAGE_SIZE = 20
+DASHBOARD_COUNT_CAP = 1000
+# Longest ?wait= a chat_messages long-poll may block for, in seconds
+MAX_LONG_POLL_WAIT = 30
+
 
 @main_bp.route("/")
 def index():
@@ -160,30 +182,60 @@ def logout():
 
 @main_bp.route("/dashboard/user")
 @login_required
+@query_budget.limit(5)
 def user_dashboard():
     if current_user.is_lawyer:
         return redirect(url_for("main.lawyer_dashboard"))
 
-    issues = Issue.query.filter_by(user_id=current_user.id).order_by(
-        Issue.created_at.desc()
+    # One keyset page each of issues and chats (?issues_before=, ?chats_before=)
+    issues_before = request.args.get("issues_before")
+    issue_query = Issue.query.filter_by(user_id=current_user.id)
+    issues, older_issues = keyset_page(
+        issue_query, Issue, DASHBOARD_PAGE_SIZE, decode_cursor(issues_before)
+    )
+    chats_before = request.args.get("chats_before")
+    chat_query = Chat.query.filter_by(user_id=current_user.id)
+    # The template shows each chat's lawyer and issue, and its summary columns (chat_summary.py)
+    chats, older_chats = keyset_page(
+        chat_query.options(joinedload(Chat.lawyer), joinedload(Chat.issue)),
+        Chat, DASHBOARD_PAGE_SIZE, decode_cursor(chats_before), Chat.last_activity_at,
     )
-    chats = Chat.query.filter_by(user_id=current_user.id).order_by(
-        Chat.created_at.desc()
+    return render_template(
+        "user_dashboard.html",
+        issues=issues,
+        chats=chats,
+        issue_total=capped_count(issue_query, Issue, DASHBOARD_COUNT_CAP),
+        chat_total=capped_count(chat_query, Chat, DASHBOARD_COUNT_CAP),
+        issues_before=issues_before,
+        chats_before=chats_before,
+        older_issues=older_issues,
+        older_chats=older_chats,
     )
-    return render_template("user_dashboard.html", issues=issues, chats=chats)
 
 
 @main_bp.route("/dashboard/lawyer")
 @login_required
+@query_budget.limit(5)
 def lawyer_dashboard():
     if not current_user.is_lawyer:
         return redirect(url_for("main.user_dashboard"))
 
     profile = current_user.lawyer_profile
-    chats = Chat.query.filter_by(lawyer_id=current_user.id).order_by(
-        Chat.created_at.desc()
+    chats_before = request.args.get("chats_before")
+    chat_query = Chat.query.filter_by(lawyer_id=current_user.id)
+    # The template shows each chat's user and issue, and its summary columns (chat_summary.py)
+    chats, older_chats = keyset_page(
+        chat_query.options(joinedload(Chat.user), joinedload(Chat.issue)),
+        Chat, DASHBOARD_PAGE_SIZE, decode_cursor(chats_before), Chat.last_activity_at,
+    )
+    return render_template(
+        "lawyer_dashboard.html",
+        profile=profile,
+        chats=chats,
+        chat_total=capped_count(chat_query, Chat, DASHBOARD_COUNT_CAP),
+        chats_before=chats_before,
+        older_chats=older_chats,
     )
-    return render_template("lawyer_dashboard.html", profile=profile, chats=chats)
 
 
 @main_bp.route("/issue/new", methods=["GET", "POST"])
@@ -208,6 +260,7 @@ def submit_issue():
         
         urgency = request.form.get("urgency", "normal")
         preferred_pricing = request.form.get("preferred_pricing", "hourly")
+        city = request.form.get("city", "").strip()
 
         if category not in ISSUE_CATEGORIES:
             flash("Invalid category.", "error")
@@ -228,6 +281,7 @@ def submit_issue():
                 budget_max=budget_max,
                 urgency=urgency,
                 preferred_pricing=preferred_pricing,
+                city=city,
             )
         except Exception as e:
             # Fallback for databases without new columns
@@ -241,68 +295,106 @@ def submit_issue():
         db.session.add(issue)
         db.session.commit()
 
+        # Rank lawyers in the background; lawyer_matches waits for the result
+        try:
+            from .match_jobs import match_jobs
+            if match_jobs.enabled:
+                match_jobs.enqueue(issue.id)
+        except Exception as e:
+            print(f"Warning: Could not queue match job: {e}")
+            db.session.rollback()
+
         flash("Issue submitted.", "success")
         return redirect(url_for("main.lawyer_matches", issue_id=issue.id))
 
-    return render_template("submit_issue.html", categories=ISSUE_CATEGORIES)
+    from .locations import CITY_INDEX
+    return render_template("submit_issue.html", categories=ISSUE_CATEGORIES, cities=CITY_INDEX.names)
 
 
 @main_bp.route("/issue/<int:issue_id>/lawyers")
 @login_required
+@query_budget.limit(15)
 def lawyer_matches(issue_id):
     issue = Issue.query.get_or_404(issue_id)
     if issue.user_id != current_user.id:
         flash("You do not have access to this issue.", "error")
         return redirect(url_for("main.user_dashboard"))
 
+    # Pagination: ?page= (1-based) and ?k= (lawyers per page)
+    page = max(request.args.get("page", 1, type=int), 1)
+    k = min(max(request.args.get("k", MATCHES_PER_PAGE, type=int), 1), MAX_MATCHES_PER_PAGE)
+    offset = (page - 1) * k
+    nearby_lawyers = []
+
     # Use advanced matching algorithm (with fallback for old database schema)
     try:
-        from .matching import match_lawyers_to_issue
+        from .matching import calculate_match_score
+        from .candidates import load_profiles
+        from .match_cache import covers, get_ranking, match_cache
+        from .match_jobs import match_jobs
         
         # Check if issue has new fields (for backward compatibility)
         has_new_fields = hasattr(issue, 'budget_min') and hasattr(issue, 'urgency')
         
         if has_new_fields:
-            # Get all available lawyers
-            all_lawyers = (
-                LawyerProfile.query.join(User, LawyerProfile.user_id == User.id)
-                .filter(User.is_lawyer == True)
-                .all()
-            )
-            
-            # Fallback if join fails
-            if not all_lawyers:
-                all_lawyers = [
-                    lp for lp in LawyerProfile.query.all()
-                    if lp.user and lp.user.is_lawyer
-                ]
+            # Ranking precomputed by the background job queued at submission
+            entry, pending = match_jobs.lookup(issue) if match_jobs.enabled else (None, False)
+            if entry is not None and covers(entry, offset + k, offset + k):
+                ranking = [tuple(pair) for pair in entry["ranking"]]
+                total_matches = entry["total"]
+            elif pending:
+                # Still being ranked: show a page that refreshes itself until it is done
+                return render_template("lawyer_matches.html", issue=issue, computing=True)
+            else:
+                # Ranked (profile_id, score) pairs, cached per issue and lawyer-pool generation
+                ranking, total_matches = get_ranking(issue, offset + k, min_candidates=offset + k)
             
-            # Get matched lawyers with scores
-            matched_lawyers = match_lawyers_to_issue(issue, all_lawyers)
+            # Load full profiles and breakdowns only for the lawyers being rendered
+            page_ranking = ranking[offset:offset + k]
+            profiles = load_profiles([profile_id for profile_id, _ in page_ranking])
+            matched_lawyers = []
+            for profile_id, score in page_ranking:
+                profile = profiles.get(profile_id)
+                if profile is not None:
+                    _, breakdown = calculate_match_score(profile, issue)
+                    matched_lawyers.append((profile, score, breakdown))
             
-            # Filter to only show lawyers with score > 0
-            matched_lawyers = [(lawyer, score, breakdown) for lawyer, score, breakdown in matched_lawyers if score > 0]
+            # Closest available lawyers for this category, from the city index
+            if page == 1 and issue.city and current_app.config.get("FEATURE_STORE_ENABLED", True):
+                from .feature_store import feature_store
+                from .locations import PROXIMITY_RADIUS_KM
+                nearest = feature_store.nearest_lawyers(
+                    issue.city, 3, issue_category=issue.category, max_km=PROXIMITY_RADIUS_KM
+                )
+                nearby_profiles = load_profiles([profile_id for profile_id, _ in nearest])
+                nearby_lawyers = [
+                    (nearby_profiles[profile_id], km)
+                    for profile_id, km in nearest if profile_id in nearby_profiles
+                ]
             
-            print(f"Found {len(matched_lawyers)} matched lawyers for issue: {issue.title}")
+            print(f"Found {total_matches} matched lawyers for issue: {issue.title} (cache: {match_cache.stats()})")
         else:
             # Fallback to simple matching for old database schema
             print("Using simple matching (database not migrated yet)")
+            from .lawyer_categories import in_category
             matching_lawyers = (
                 LawyerProfile.query.join(User, LawyerProfile.user_id == User.id)
                 .filter(
                     User.is_lawyer == True,
-                    LawyerProfile.expertise_categories.like(f"%{issue.category}%")
+                    in_category(issue.category)
                 )
+                .order_by(LawyerProfile.id)
                 .all()
             )
+            total_matches = len(matching_lawyers)
             # Convert to new format with dummy scores
-            matched_lawyers = [(lp, 75.0, {'case_type': 100, 'specialization': 75, 'success_rate': lp.case_success_rate * 100, 'availability': 100, 'pricing': 50, 'client_profile': 50}) for lp in matching_lawyers]
+            matched_lawyers = [(lp, 75.0, {'case_type': 100, 'specialization': 75, 'success_rate': lp.case_success_rate * 100, 'availability': 100, 'pricing': 50, 'client_profile': 50}) for lp in matching_lawyers[offset:offset + k]]
         
     except Exception as e:
         print(f"Error in lawyer_matches: {e}")
         import traceback
         traceback.print_exc()
-        # Fallback to simple query
+        # Fallback to simple query (LIKE, in case the category tables are the problem)
         try:
             matching_lawyers = (
                 LawyerProfile.query.join(User, LawyerProfile.user_id == User.id)
@@ -310,16 +402,73 @@ def lawyer_matches(issue_id):
                     User.is_lawyer == True,
                     LawyerProfile.expertise_categories.like(f"%{issue.category}%")
                 )
+                .order_by(LawyerProfile.id)
                 .all()
             )
-            matched_lawyers = [(lp, 75.0, {}) for lp in matching_lawyers]
+            total_matches = len(matching_lawyers)
+            matched_lawyers = [(lp, 75.0, {}) for lp in matching_lawyers[offset:offset + k]]
         except:
             matched_lawyers = []
+            total_matches = 0
+    
+    # Lawyer suggested by the last global assignment run (assign_issues.py)
+    suggested_profile_id = None
+    try:
+        from .models import IssueAssignment
+        assignment = IssueAssignment.query.filter_by(issue_id=issue.id).first()
+        if assignment:
+            suggested_profile_id = assignment.lawyer_profile_id
+    except Exception as e:
+        print(f"Warning: could not load issue assignment: {e}")
+        db.session.rollback()
     
     return render_template(
         "lawyer_matches.html", 
         issue=issue, 
-        matched_lawyers=matched_lawyers  # Pass tuples of (lawyer, score, breakdown)
+        matched_lawyers=matched_lawyers,  # Pass tuples of (lawyer, score, breakdown)
+        page=page,
+        k=k,
+        offset=offset,
+        total_matches=total_matches,
+        has_next=offset + k < total_matches,
+        nearby_lawyers=nearby_lawyers,  # (lawyer, distance_km) closest to the client's city
+        suggested_profile_id=suggested_profile_id,
+    )
+
+
+@main_bp.route("/lawyers/search")
+@login_required
+def search_lawyers():
+    """Keyword search over lawyer expertise, experience and city."""
+    query = request.args.get("q", "").strip()
+    page = max(request.args.get("page", 1, type=int), 1)
+    offset = (page - 1) * MATCHES_PER_PAGE
+    lawyers = []
+    has_next = False
+
+    if query:
+        from .search import lawyer_search
+        from .candidates import load_profiles
+
+        try:
+            # One extra row tells us whether there is a next page
+            results = lawyer_search.search(query, MATCHES_PER_PAGE + 1, offset)
+        except Exception as e:
+            print(f"Error in search_lawyers: {e}")
+            db.session.rollback()
+            results = []
+        has_next = len(results) > MATCHES_PER_PAGE
+        results = results[:MATCHES_PER_PAGE]
+        profiles = load_profiles([profile_id for profile_id, _ in results])
+        lawyers = [profiles[profile_id] for profile_id, _ in results if profile_id in profiles]
+
+    return render_template(
+        "search_lawyers.html",
+        query=query,
+        lawyers=lawyers,
+        page=page,
+        offset=offset,
+        has_next=has_next,
     )
 
 
@@ -384,10 +533,43 @@ def _user_can_access_chat(chat: Chat, user: User) -> bool:
     return user.id in {chat.user_id, chat.lawyer_id}
 
 
+def _post_message(chat: Chat, content: str) -> dict:
+    """Store a message from the current user and push it to the chat's open streams."""
+    role = "lawyer" if current_user.is_lawyer else "user"
+    msg = Message(
+        chat_id=chat.id,
+        sender_id=current_user.id,
+        sender_role=role,
+        content=content,
+    )
+    db.session.add(msg)
+    db.session.flush()
+    event = message_event(msg, current_user.name)  # Before commit expires msg and current_user
+    db.session.commit()
+    chat_broker.publish(chat.id, [event])
+    return event
+
+
+def _messages_since(chat: Chat, since: int, limit: int):
+    """The first `limit` messages of a chat after id `since`, oldest first, with sender names."""
+    rows = (
+        db.session.query(Message, User.name)
+        .join(User, Message.sender_id == User.id)
+        .filter(Message.chat_id == chat.id, Message.id > since)
+        .order_by(Message.id)
+        .limit(limit)
+        .all()
+    )
+    return [message_event(m, name) for m, name in rows]
+
+
 @main_bp.route("/chat/<int:chat_id>", methods=["GET", "POST"])
 @login_required
+@query_budget.limit(8)
 def chat_view(chat_id):
-    chat = Chat.query.get_or_404(chat_id)
+    chat = Chat.query.options(
+        joinedload(Chat.user), joinedload(Chat.lawyer), joinedload(Chat.issue)
+    ).filter_by(id=chat_id).first_or_404()
     if not _user_can_access_chat(chat, current_user):
         flash("You do not have access to this chat.", "error")
         return redirect(url_for("main.index"))
@@ -395,23 +577,157 @@ def chat_view(chat_id):
     if request.method == "POST":
         content = request.form.get("content", "").strip()
         if content:
-            role = "lawyer" if current_user.is_lawyer else "user"
-            msg = Message(
-                chat_id=chat.id,
-                sender_id=current_user.id,
-                sender_role=role,
-                content=content,
-            )
-            db.session.add(msg)
-            db.session.commit()
+            _post_message(chat, content)
             return redirect(url_for("main.chat_view", chat_id=chat.id))
 
-    messages = chat.messages.all()
-    return render_template(
+    # Latest page of history, or the page before ?before= ("Load older")
+    before = decode_cursor(request.args.get("before"))
+    # Older pages may reach into the chat's archived messages (message_archive.py)
+    messages, older_cursor = history_page(chat, MESSAGES_PER_PAGE, before)
+    # Senders are the chat's two participants, loaded above, so m.sender
+    # resolves from the session's identity map without a query per message
+    page = render_template(
         "chat.html",
         chat=chat,
-        messages=messages,
+        messages=messages[::-1],  # Oldest first
+        older_cursor=older_cursor,
+        is_latest=before is None,
     )
+    # After rendering: the commit expires everything loaded above
+    mark_read(chat, current_user)
+    return page
+
+
+@main_bp.route("/chat/<int:chat_id>/messages")
+@login_required
+@query_budget.limit(6)
+def chat_messages(chat_id):
+    """
+    A page of chat history as JSON, newest first: ?before=<cursor> for
+    older messages, ?limit= up to MAX_MESSAGES_PER_PAGE.
+
+    With ?since=<message id> it is the long-poll fallback of chat_stream:
+    the messages after that id, oldest first, waiting up to ?wait= seconds
+    for one to arrive if there are none yet.
+    """
+    chat = Chat.query.get_or_404(chat_id)
+    if not _user_can_access_chat(chat, current_user):
+        abort(403)
+    limit = min(max(request.args.get("limit", MESSAGES_PER_PAGE, type=int), 1), MAX_MESSAGES_PER_PAGE)
+    if "since" in request.args:
+        since = request.args.get("since", type=int)
+        if since is None:
+            abort(400)
+        wait = min(max(request.args.get("wait", 0, type=float), 0), MAX_LONG_POLL_WAIT)
+        # Subscribe before reading, so a message committed in between is not missed
+        subscription = chat_broker.subscribe(chat.id, since) if wait else None
+        try:
+            messages = _messages_since(chat, since, limit)
+            if not messages and subscription is not None:
+                db.session.close()  # Don't hold a connection while waiting
+                messages = subscription.wait(wait)[:limit]
+        finally:
+            if subscription is not None:
+                chat_broker.unsubscribe(subscription)
+        return jsonify({"messages": messages})
+
+    before = request.args.get("before")
+    cursor = decode_cursor(before)
+    if before and cursor is None:
+        abort(400)
+    messages, older_cursor = history_page(chat, limit, cursor)
+    return jsonify({
+        "messages": [
+            {
+                "id": m.id,
+                "sender_id": m.sender_id,
+                "sender_role": m.sender_role,
+                "content": m.content,
+                "created_at": m.created_at.isoformat(),
+            }
+            for m in messages
+        ],
+        "before": older_cursor,  # Cursor for the next (older) page, null on the last one
+    })
+
+
+@main_bp.route("/chat/<int:chat_id>/messages", methods=["POST"])
+@login_required
+@query_budget.limit(5)
+def post_chat_message(chat_id):
+    """Send a message (JSON {"content": ...} or form data); returns it as JSON."""
+    chat = Chat.query.get_or_404(chat_id)
+    if not _user_can_access_chat(chat, current_user):
+        abort(403)
+    data = request.get_json(silent=True) or request.form
+    content = str(data.get("content") or "").strip()
+    if not content:
+        return jsonify({"error": "Message content is required."}), 400
+    return jsonify(_post_message(chat, content)), 201
+
+
+def _sse_event(event: dict) -> str:
+    return f"id: {event['id']}\nevent: message\ndata: {json.dumps(event)}\n\n"
+
+
+@main_bp.route("/chat/<int:chat_id>/stream")
+@login_required
+@query_budget.limit(4)
+def chat_stream(chat_id):
+    """
+    Server-Sent Events stream of the messages after ?since=<message id>
+    (or the Last-Event-ID header on reconnect). The stream ends after
+    CHAT_STREAM_TIMEOUT seconds and the browser reconnects from the last
+    id it received, so no request holds a worker thread indefinitely.
+
+    The backlog is read one page (MAX_MESSAGES_PER_PAGE) at a time: after
+    a full page the stream sends a "more" event and ends, and the client
+    opens the next stream from the last id it received.
+    """
+    chat = Chat.query.get_or_404(chat_id)
+    if not _user_can_access_chat(chat, current_user):
+        abort(403)
+    since = request.headers.get("Last-Event-ID") or request.args.get("since", "0")
+    if not since.isdigit():
+        abort(400)
+    since = int(since)
+
+    subscription = chat_broker.subscribe(chat.id, since)
+    try:
+        backlog = _messages_since(chat, since, MAX_MESSAGES_PER_PAGE)
+        subscription.seen(backlog)
+    except Exception:
+        chat_broker.unsubscribe(subscription)
+        raise
+    # The generator outlives the request's session; it only reads the broker
+    db.session.close()
+    keepalive = current_app.config.get("CHAT_KEEPALIVE_INTERVAL", 15)
+    deadline = time.monotonic() + current_app.config.get("CHAT_STREAM_TIMEOUT", 300)
+    # Messages after a full backlog page are older than anything the broker will offer
+    more = len(backlog) == MAX_MESSAGES_PER_PAGE
+
+    def events():
+        try:
+            yield "retry: 3000\n\n"
+            for event in backlog:
+                yield _sse_event(event)
+            if more:
+                yield f"event: more\ndata: {json.dumps({'since': backlog[-1]['id']})}\n\n"
+                return
+            while time.monotonic() < deadline:
+                received = subscription.wait(keepalive)
+                for event in received:
+                    yield _sse_event(event)
+                if not received:
+                    # Also how a closed connection is noticed
+                    yield ": keepalive\n\n"
+        finally:
+            chat_broker.unsubscribe(subscription)
+
+    return Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # Don't let a proxy buffer the stream
+    })
 
 
 @main_bp.route("/chat/<int:chat_id>/generate_link", methods=["POST"])
@@ -433,3 +749,13 @@ def generate_jitsi_link(chat_id):
 
 
 
+
+
+@main_bp.route("/debug/match-stats")
+def match_stats_view():
+    """Matching counters of this worker process (local requests only)."""
+    from .match_stats import match_stats
+
+    if not match_stats.enabled or request.remote_addr not in ("127.0.0.1", "::1"):
+        abort(404)
+    return jsonify(match_stats.snapshot())
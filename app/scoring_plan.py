@@ -0,0 +1,196 @@
+"""
+Scoring weights and parameters compiled into an immutable scoring plan.
+
+The parameters live in the single-row scoring_config table as JSON with a
+version number. They are validated and compiled once into a ScoringPlan
+that every scoring call reuses; workers re-check the version at most every
+SCORING_PLAN_CHECK_INTERVAL seconds and recompile only when it changed.
+
+Each plan has a short fingerprint of its parameters. Cached rankings and
+stored match results record the fingerprint they were scored with, so a
+plan change invalidates exactly the results of the old plan.
+"""
+import hashlib
+import json
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import inspect
+
+from .extensions import db
+from .models import ScoringConfig
+
+FACTORS = (
+    "case_type", "specialization", "success_rate", "availability", "pricing", "client_profile", "text_relevance",
+)
+
+DEFAULT_PARAMS = {
+    "weights": {
+        "case_type": 0.30,
+        "specialization": 0.20,
+        "success_rate": 0.15,
+        "availability": 0.15,
+        "pricing": 0.15,
+        "client_profile": 0.05,
+        # Off until an operator opts in, taking weight from the other factors, e.g.
+        # scoring_config.py --set weights.case_type=0.25 weights.specialization=0.15 weights.text_relevance=0.10
+        "text_relevance": 0.0,
+    },
+    # Hours of work assumed for a typical case when pricing an hourly lawyer
+    "hourly_estimate_hours": [10, 40],
+    # Availability score by share of max_cases in use: [below, score] tiers, then the rest
+    "capacity_tiers": [[0.5, 100.0], [0.8, 80.0]],
+    "capacity_full_score": 60.0,
+    # Client-profile bonus for a lawyer in the client's city, scaled down with distance
+    "location_bonus": 20.0,
+    # TF-IDF cosine similarity (issue description vs. experience) that scores 100
+    "text_full_similarity": 0.5,
+}
+
+
+class ScoringPlan(NamedTuple):
+    """Compiled, immutable scoring parameters."""
+    version: int
+    fingerprint: str
+    params: str  # Canonical JSON the plan was compiled from
+    weights: MappingProxyType
+    hourly_estimate_hours: Tuple[float, float]
+    capacity_tiers: Tuple[Tuple[float, float], ...]
+    capacity_full_score: float
+    location_bonus: float
+    text_full_similarity: float
+
+
+def _canonical(params: Dict) -> str:
+    return json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+
+def compile_plan(params: Dict, version: int = 0) -> ScoringPlan:
+    """Validate `params` (DEFAULT_PARAMS layout) and build a ScoringPlan."""
+    # Configs stored before the text factor existed leave it out: the default
+    # weight of 0, filled in before fingerprinting so the plan is the same
+    weights = {"text_relevance": 0.0, **params.get("weights", DEFAULT_PARAMS["weights"])}
+    params = {**DEFAULT_PARAMS, **params, "weights": weights}
+    if set(weights) != set(FACTORS):
+        raise ValueError(f"weights must define exactly {', '.join(FACTORS)}")
+    if any(weight < 0 for weight in weights.values()):
+        raise ValueError("weights must not be negative")
+    if abs(sum(weights.values()) - 1.0) > 1e-6:
+        raise ValueError(f"weights must sum to 1.0 (got {sum(weights.values()):.4f})")
+
+    low, high = params["hourly_estimate_hours"]
+    if not 0 < low <= high:
+        raise ValueError("hourly_estimate_hours must be [low, high] with 0 < low <= high")
+
+    tiers = tuple((float(below), float(score)) for below, score in params["capacity_tiers"])
+    bounds = [below for below, _ in tiers]
+    if bounds != sorted(bounds) or any(not 0 < below <= 1 for below in bounds):
+        raise ValueError("capacity_tiers bounds must be ascending within (0, 1]")
+    if not params["text_full_similarity"] > 0:
+        raise ValueError("text_full_similarity must be positive")
+
+    canonical = _canonical(params)
+    return ScoringPlan(
+        version=version,
+        fingerprint=hashlib.sha1(canonical.encode()).hexdigest()[:12],
+        params=canonical,
+        weights=MappingProxyType({factor: float(weights[factor]) for factor in FACTORS}),
+        hourly_estimate_hours=(float(low), float(high)),
+        capacity_tiers=tiers,
+        capacity_full_score=float(params["capacity_full_score"]),
+        location_bonus=float(params["location_bonus"]),
+        text_full_similarity=float(params["text_full_similarity"]),
+    )
+
+
+DEFAULT_PLAN = compile_plan(DEFAULT_PARAMS)
+
+
+def ensure_scoring_config() -> None:
+    """Create the config row with the default parameters if it doesn't exist yet."""
+    try:
+        if db.session.get(ScoringConfig, 1) is None:
+            db.session.add(ScoringConfig(id=1, version=1, params=json.dumps(DEFAULT_PARAMS)))
+            db.session.commit()
+    except Exception as e:
+        print(f"Warning: Could not initialise scoring config: {e}")
+        db.session.rollback()
+
+
+class ScoringPlanStore:
+    """Holds the active plan of this worker and reloads it when the config version changes."""
+
+    def __init__(self):
+        self.plan = DEFAULT_PLAN
+        self.check_interval = 5.0
+        self._checked_at = 0.0
+        self._rejected_version = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        self.check_interval = app.config.get("SCORING_PLAN_CHECK_INTERVAL", 5.0)
+        # Read-only; a database migrate.py hasn't reached yet keeps the defaults
+        # until the first request that finds the config
+        if inspect(db.engine).has_table(ScoringConfig.__tablename__):
+            try:
+                self.refresh(force=True)
+            except Exception as e:
+                print(f"Warning: Could not load scoring config, using defaults: {e}")
+                db.session.rollback()
+
+        app.before_request(self._refresh_before_request)
+
+    def _refresh_before_request(self) -> None:
+        # before_request handlers must return None to let the request through
+        self.refresh()
+
+    def refresh(self, force: bool = False) -> ScoringPlan:
+        """Recompile the plan if the stored config version changed."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return self.plan
+        self._checked_at = now
+
+        version = db.session.query(ScoringConfig.version).filter(ScoringConfig.id == 1).scalar()
+        if version is None or version in (self.plan.version, self._rejected_version):
+            return self.plan
+        with self._lock:
+            if version != self.plan.version:
+                config = db.session.get(ScoringConfig, 1)
+                try:
+                    self.plan = compile_plan(json.loads(config.params), config.version)
+                    print(f"Loaded scoring plan v{config.version} ({self.plan.fingerprint})")
+                except (ValueError, KeyError, TypeError) as e:
+                    # Keep scoring with the last good plan
+                    self._rejected_version = config.version
+                    print(f"Warning: Invalid scoring config v{config.version}: {e}")
+        return self.plan
+
+    def save(self, params: Dict) -> ScoringPlan:
+        """Validate and store new parameters, bumping the config version."""
+        config = db.session.get(ScoringConfig, 1)
+        version = (config.version if config else 0) + 1
+        plan = compile_plan(params, version)
+        if config is None:
+            config = ScoringConfig(id=1)
+            db.session.add(config)
+        config.version = version
+        config.params = json.dumps(params, sort_keys=True)
+        db.session.commit()
+        self.plan = plan
+        return plan
+
+
+scoring_plans = ScoringPlanStore()
+
+
+def current_plan() -> ScoringPlan:
+    """The active plan of this process (no database access)."""
+    return scoring_plans.plan
+
+
+def use_plan(plan: Optional[ScoringPlan]) -> None:
+    """Install `plan` as the active plan, e.g. in a bulk-matching worker process."""
+    scoring_plans.plan = plan or DEFAULT_PLAN
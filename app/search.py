@@ -0,0 +1,164 @@
+"""
+Keyword search over lawyer profiles backed by the database's full-text index.
+
+- SQLite: an FTS5 external-content table (lawyer_search) over
+  lawyer_profile, kept in sync by AFTER INSERT/UPDATE/DELETE triggers.
+- PostgreSQL: a stored generated tsvector column (search_vector) on
+  lawyer_profile with a GIN index, recomputed by Postgres on every write.
+
+Either way the index is maintained incrementally inside the writing
+transaction, including for bulk inserts that bypass the ORM. Results are
+ranked (bm25 / ts_rank_cd) with expertise weighted above experience text
+and city. Every query word must match and matches as a prefix ("harass"
+finds "harassment"); FTS5 indexes plain unicode61 tokens because its
+porter stemmer does not combine with prefix terms. Both backends share
+LawyerSearch.search().
+"""
+import re
+from typing import List, Tuple
+
+from sqlalchemy import text
+
+from .extensions import db
+
+MAX_QUERY_TERMS = 8
+
+
+def query_terms(query: str) -> List[str]:
+    """Lowercase word tokens of a user query (punctuation and operators dropped)."""
+    return re.findall(r"\w+", (query or "").lower())[:MAX_QUERY_TERMS]
+
+
+class SQLiteFTSBackend:
+    """FTS5 external-content index with sync triggers."""
+
+    SETUP = [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS lawyer_search USING fts5(
+            expertise_categories, experience_description, city,
+            content='lawyer_profile', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')""",
+        """CREATE TRIGGER IF NOT EXISTS lawyer_search_ai AFTER INSERT ON lawyer_profile BEGIN
+            INSERT INTO lawyer_search(rowid, expertise_categories, experience_description, city)
+            VALUES (new.id, new.expertise_categories, new.experience_description, new.city);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS lawyer_search_ad AFTER DELETE ON lawyer_profile BEGIN
+            INSERT INTO lawyer_search(lawyer_search, rowid, expertise_categories, experience_description, city)
+            VALUES ('delete', old.id, old.expertise_categories, old.experience_description, old.city);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS lawyer_search_au AFTER UPDATE OF
+            expertise_categories, experience_description, city ON lawyer_profile BEGIN
+            INSERT INTO lawyer_search(lawyer_search, rowid, expertise_categories, experience_description, city)
+            VALUES ('delete', old.id, old.expertise_categories, old.experience_description, old.city);
+            INSERT INTO lawyer_search(rowid, expertise_categories, experience_description, city)
+            VALUES (new.id, new.expertise_categories, new.experience_description, new.city);
+        END""",
+    ]
+
+    def ensure_index(self, conn) -> None:
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'lawyer_search'"
+        )).first()
+        for statement in self.SETUP:
+            conn.execute(text(statement))
+        if not exists:
+            # Index the rows that predate the triggers
+            self.rebuild(conn)
+
+    def rebuild(self, conn) -> None:
+        conn.execute(text("INSERT INTO lawyer_search(lawyer_search) VALUES ('rebuild')"))
+
+    @staticmethod
+    def match_expression(terms: List[str]) -> str:
+        return " ".join(f'"{term}"*' for term in terms)
+
+    def search(self, terms: List[str], limit: int, offset: int) -> List[Tuple[int, float]]:
+        # Column weights for bm25: expertise, experience, city (lower rank = better)
+        rows = db.session.execute(text(
+            "SELECT rowid, bm25(lawyer_search, 4.0, 1.0, 2.0) AS score FROM lawyer_search "
+            "WHERE lawyer_search MATCH :match ORDER BY score, rowid LIMIT :limit OFFSET :offset"
+        ), {"match": self.match_expression(terms), "limit": limit, "offset": offset})
+        return [(row.rowid, -row.score) for row in rows]
+
+
+class PostgresFTSBackend:
+    """Generated tsvector column with a GIN index."""
+
+    SETUP = [
+        """ALTER TABLE lawyer_profile ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(expertise_categories, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(experience_description, '')), 'B') ||
+                setweight(to_tsvector('simple', coalesce(city, '')), 'C')
+            ) STORED""",
+        "CREATE INDEX IF NOT EXISTS ix_lawyer_profile_search_vector "
+        "ON lawyer_profile USING GIN (search_vector)",
+    ]
+
+    def ensure_index(self, conn) -> None:
+        for statement in self.SETUP:
+            conn.execute(text(statement))
+
+    def rebuild(self, conn) -> None:
+        conn.execute(text("REINDEX INDEX ix_lawyer_profile_search_vector"))
+
+    @staticmethod
+    def tsquery(terms: List[str]) -> str:
+        return " & ".join(f"{term}:*" for term in terms)
+
+    def search(self, terms: List[str], limit: int, offset: int) -> List[Tuple[int, float]]:
+        rows = db.session.execute(text(
+            "SELECT id, ts_rank_cd(search_vector, query) AS score "
+            "FROM lawyer_profile, to_tsquery('english', :query) AS query "
+            "WHERE search_vector @@ query ORDER BY score DESC, id LIMIT :limit OFFSET :offset"
+        ), {"query": self.tsquery(terms), "limit": limit, "offset": offset})
+        return [(row.id, row.score) for row in rows]
+
+
+class LawyerSearch:
+    """Picks the backend for the configured database. Configure with init_app()."""
+
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app) -> None:
+        dialect = db.engine.dialect.name
+        if dialect == "sqlite":
+            self.backend = SQLiteFTSBackend()
+        elif dialect == "postgresql":
+            self.backend = PostgresFTSBackend()
+        else:
+            print(f"Warning: Lawyer search is not available on {dialect}")
+
+    def ensure_index(self) -> None:
+        """Create the index if missing (run by prepare_database)."""
+        if self.backend is None:
+            return
+        try:
+            with db.engine.begin() as conn:
+                self.backend.ensure_index(conn)
+        except Exception as e:
+            print(f"Warning: Could not create the lawyer search index: {e}")
+            self.backend = None
+
+    @property
+    def available(self) -> bool:
+        return self.backend is not None
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> List[Tuple[int, float]]:
+        """
+        Ranked (profile_id, relevance) pairs for a keyword query, best first.
+        Every word must match, as a whole word or as a prefix.
+        """
+        terms = query_terms(query)
+        if not terms or self.backend is None:
+            return []
+        return self.backend.search(terms, limit, offset)
+
+    def rebuild(self) -> None:
+        """Rebuild the whole index (normally never needed)."""
+        if self.backend is not None:
+            with db.engine.begin() as conn:
+                self.backend.rebuild(conn)
+
+
+lawyer_search = LawyerSearch()
@@ -0,0 +1,500 @@
+"""
+TF-IDF text relevance between issue descriptions and lawyer experience.
+
+Every lawyer's experience_description is turned into an L2-normalised
+TF-IDF vector (sublinear tf, smoothed idf) over a vocabulary built from the
+whole pool. The vectors are stored term-major, i.e. as an inverted index:
+
+    term_ptr[t]:term_ptr[t + 1]   slice of doc_rows / weights for term t
+    doc_rows, weights             row (lawyer) and weight of each posting
+    profile_ids, text_hashes      LawyerProfile id and description hash of each row
+
+as plain .npy files that every worker opens with mmap, so the pages are
+shared between processes and loading is instant. Scoring an issue is one
+sparse matrix-vector product over the postings of the issue's terms
+(np.bincount), giving the cosine similarity of every lawyer at once;
+no model or download is involved.
+
+Builds are written to TEXT_INDEX_DIR/<build id>/ and published by
+rewriting TEXT_INDEX_DIR/CURRENT, then bumping the lawyer-pool generation
+so cached rankings are recomputed. Web workers never build or query
+anything for the index: when the generation changes they re-read CURRENT
+and memory-map the build it names, if that is a new one.
+
+The full index is built at deploy time (render.yaml runs
+build_text_index.py). After that the match-job runner (run_match_jobs.py)
+publishes edited descriptions every TEXT_INDEX_REFRESH_INTERVAL seconds:
+profiles whose description changed since the full build (text_updated_at,
+which capacity and pricing edits leave alone) are vectorised with the
+build's vocabulary into a patch build, an overlay on top of the full one.
+Once a patch would hold more than TEXT_INDEX_MAX_OVERLAY profiles the
+runner rebuilds in full instead. TEXT_INDEX_DIR must be on storage the
+web and runner processes share.
+
+    python build_text_index.py      # rebuild and publish
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event, inspect
+
+from .extensions import db
+from .models import User, LawyerProfile, LawyerPoolGeneration
+
+ARRAYS = ("term_ptr", "doc_rows", "weights", "profile_ids", "text_hashes", "idf")
+MAX_TERMS = 50000
+# text_updated_at is set before the commit that makes it visible: look back
+# this far past a build's start for edits committed after it
+CHANGE_OVERLAP = timedelta(minutes=5)
+
+TOKEN_RE = re.compile(r"[a-z]{2,}")
+STOP_WORDS = frozenset("""
+    a about after all also an and any are as at be been being but by can could did do does
+    for from had has have having he her here him his how i if in into is it its me more most
+    my no not of on or our out over she so some such than that the their them then there
+    these they this those through to too under up very was we were what when where which
+    while who whom why will with would you your
+""".split())
+
+
+def _stem(word: str) -> str:
+    """Light suffix stripping so that e.g. harassed/harassment/harassing share a term."""
+    if word.endswith("ies") and len(word) > 5:
+        word = word[:-3] + "y"
+    elif word.endswith("s") and not word.endswith("ss") and len(word) > 4:
+        word = word[:-1]
+    for suffix in ("ment", "ing", "ion", "ed"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            word = word[:-len(suffix)]
+            break
+    if word.endswith("e") and len(word) > 4:
+        word = word[:-1]
+    return word
+
+
+def text_hash(text: Optional[str]) -> int:
+    return int.from_bytes(hashlib.blake2b((text or "").encode(), digest_size=8).digest(), "little")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase, stop-word-free, lightly stemmed terms of `text`."""
+    return [_stem(word) for word in TOKEN_RE.findall((text or "").lower()) if word not in STOP_WORDS]
+
+
+class TextIndex:
+    """Term-major sparse TF-IDF matrix of lawyers x vocabulary terms."""
+
+    def __init__(self, terms: List[str], arrays: Dict[str, np.ndarray], meta: Optional[dict] = None):
+        self.terms = terms
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.term_ptr = arrays["term_ptr"]
+        self.doc_rows = arrays["doc_rows"]
+        self.weights = arrays["weights"]
+        self.profile_ids = arrays["profile_ids"]
+        self.text_hashes = arrays["text_hashes"]
+        self.idf = arrays["idf"]
+        self.meta = meta or {}
+        self.directory = None  # Set when memory-mapped from disk
+
+    def __reduce__(self):
+        # Pickled for worker processes: a saved index is re-mapped, not copied
+        if self.directory is not None:
+            return (TextIndex.load, (self.directory,))
+        return (TextIndex, (self.terms, {name: np.asarray(getattr(self, name)) for name in ARRAYS}, self.meta))
+
+    def __len__(self):
+        return len(self.profile_ids)
+
+    @classmethod
+    def build(
+        cls, documents: Iterable[Tuple[int, str]], base: Optional["TextIndex"] = None, meta: Optional[dict] = None
+    ) -> "TextIndex":
+        """
+        Index (profile_id, text) pairs. With `base`, reuse its vocabulary
+        and idf (terms it doesn't know are dropped) instead of fitting new ones.
+        """
+        profile_ids, hashes, counts = [], [], []
+        for profile_id, text in documents:
+            profile_ids.append(profile_id)
+            hashes.append(text_hash(text))
+            counts.append(Counter(tokenize(text)))
+
+        if base is not None:
+            terms, idf = base.terms, base.idf
+        else:
+            document_frequency = Counter(term for doc in counts for term in doc)
+            terms = sorted(
+                term for term, _ in sorted(document_frequency.items(), key=lambda kv: (-kv[1], kv[0]))[:MAX_TERMS]
+            )
+            n = len(counts)
+            idf = np.array(
+                [math.log((1 + n) / (1 + document_frequency[term])) + 1 for term in terms], dtype=np.float64
+            )
+        vocabulary = base.vocabulary if base is not None else {term: i for i, term in enumerate(terms)}
+
+        columns, rows, values = [], [], []
+        for row, doc in enumerate(counts):
+            cols, weights = _weigh(doc, vocabulary, idf)
+            columns.append(cols)
+            rows.append(np.full(len(cols), row, dtype=np.int32))
+            values.append(weights)
+        columns = np.concatenate(columns) if columns else np.zeros(0, dtype=np.int32)
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+        values = np.concatenate(values) if values else np.zeros(0, dtype=np.float32)
+
+        # Sort postings by term (rows stay ascending within a term)
+        order = np.argsort(columns, kind="stable")
+        term_ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(columns, minlength=len(terms)), out=term_ptr[1:])
+        arrays = {
+            "term_ptr": term_ptr,
+            "doc_rows": rows[order],
+            "weights": values[order],
+            "profile_ids": np.array(profile_ids, dtype=np.int64),
+            "text_hashes": np.array(hashes, dtype=np.uint64),
+            "idf": np.asarray(idf, dtype=np.float64),
+        }
+        return cls(list(terms), arrays, meta)
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "terms.json"), "w") as f:
+            json.dump(self.terms, f)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(self.meta, f)
+
+    @classmethod
+    def load(cls, directory: str) -> "TextIndex":
+        """Open a saved index; the postings are memory-mapped, not read."""
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in ARRAYS}
+        with open(os.path.join(directory, "terms.json")) as f:
+            terms = json.load(f)
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        index = cls(terms, arrays, meta)
+        index.directory = directory
+        return index
+
+    def query_vector(self, text: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(term ids, weights) of the normalised TF-IDF vector of `text`."""
+        return _weigh(Counter(tokenize(text)), self.vocabulary, self.idf)
+
+    def similarities(self, text: Optional[str]) -> np.ndarray:
+        """Cosine similarity of `text` to every row: one sparse matrix-vector product."""
+        cols, query_weights = self.query_vector(text)
+        if not len(cols):
+            return np.zeros(len(self), dtype=np.float64)
+        starts, ends = self.term_ptr[cols], self.term_ptr[cols + 1]
+        postings = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+        scale = np.repeat(query_weights.astype(np.float64), ends - starts)
+        return np.bincount(
+            self.doc_rows[postings], weights=self.weights[postings] * scale, minlength=len(self)
+        )
+
+
+def _weigh(counts: Counter, vocabulary: Dict[str, int], idf: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sublinear tf x idf for the known terms of one document, L2-normalised."""
+    known = sorted((vocabulary[term], count) for term, count in counts.items() if term in vocabulary)
+    if not known:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+    cols = np.array([col for col, _ in known], dtype=np.int32)
+    weights = np.array([1 + math.log(count) for _, count in known]) * idf[cols]
+    return cols, (weights / np.linalg.norm(weights)).astype(np.float32)
+
+
+class TextRelevance:
+    """
+    A published index plus the overlay of profiles edited since its build.
+    similarities() arrays have one extra trailing 0 so that row -1 (a lawyer
+    missing from both) scores zero.
+    """
+
+    def __init__(self, base: TextIndex, overlay: Optional[TextIndex] = None):
+        self.base = base
+        self.overlay = overlay
+        # Later rows (the overlay) win for profiles present in both
+        ids = base.profile_ids if overlay is None else np.concatenate([base.profile_ids, overlay.profile_ids])
+        order = np.argsort(ids, kind="stable")
+        keys = ids[order]
+        last = np.append(keys[1:] != keys[:-1], True) if len(keys) else np.zeros(0, dtype=bool)
+        self._sorted_ids = keys[last]
+        self._sorted_rows = order[last]
+        self._rows_cache = None
+        self.similarities = lru_cache(maxsize=16)(self._similarities)
+
+    def __reduce__(self):
+        return (TextRelevance, (self.base, self.overlay))
+
+    def _similarities(self, text: Optional[str]) -> np.ndarray:
+        parts = [self.base.similarities(text)]
+        if self.overlay is not None:
+            parts.append(self.overlay.similarities(text))
+        parts.append(np.zeros(1))
+        scores = np.concatenate(parts)
+        scores.flags.writeable = False
+        return scores
+
+    def rows_for(self, profile_ids: np.ndarray) -> np.ndarray:
+        """Row of each profile id, -1 if not indexed."""
+        if not len(self._sorted_ids):
+            return np.full(len(profile_ids), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self._sorted_ids, profile_ids), len(self._sorted_ids) - 1)
+        found = self._sorted_ids[positions] == profile_ids
+        return np.where(found, self._sorted_rows[positions], -1)
+
+    def rows_for_batch(self, batch) -> np.ndarray:
+        """rows_for() of a LawyerBatch, remembered for the most recent batch."""
+        cached = self._rows_cache
+        if cached is not None and cached[0] is batch:
+            return cached[1]
+        rows = self.rows_for(batch.profile_id)
+        self._rows_cache = (batch, rows)
+        return rows
+
+    def row_of(self, profile_id: Optional[int]) -> int:
+        if profile_id is None:
+            return -1
+        return int(self.rows_for(np.array([profile_id], dtype=np.int64))[0])
+
+
+def empty_index() -> TextIndex:
+    return TextIndex.build([])
+
+
+class TextIndexStore:
+    """The worker's TextRelevance, memory-mapped from the published build."""
+
+    def __init__(self):
+        self.directory = None
+        self.relevance: Optional[TextRelevance] = None
+        self.build_id: Optional[str] = None
+        self.generation: Optional[int] = None
+        self.pinned = False
+        self.max_overlay = 2000
+        self.refresh_interval = 30.0
+        self._published_at = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        self.directory = app.config.get("TEXT_INDEX_DIR")
+        self.max_overlay = app.config.get("TEXT_INDEX_MAX_OVERLAY", 2000)
+        self.refresh_interval = app.config.get("TEXT_INDEX_REFRESH_INTERVAL", 30.0)
+
+    def use(self, relevance: Optional[TextRelevance]) -> None:
+        """Install a fixed TextRelevance (tests, benchmarks, bulk workers); None to go back to the database."""
+        self.relevance = relevance
+        self.pinned = relevance is not None
+        self.build_id = self.generation = None
+
+    def current(self) -> TextRelevance:
+        """The active TextRelevance, loading the index on first use."""
+        if self.relevance is None:
+            if self.directory is None:
+                # No app configured: nothing is indexed
+                self.use(TextRelevance(empty_index()))
+            else:
+                from .match_cache import current_generation
+                self.sync(current_generation())
+        return self.relevance
+
+    def _published(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.directory, "CURRENT")) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def sync(self, generation: int, wait: bool = False) -> None:
+        """
+        Switch to the published build if it changed; only checked when the
+        pool generation moves (publishing bumps it). With nothing published
+        text relevance is 0 until build_text_index.py runs; command-line
+        jobs pass wait=True to build and publish one first.
+        """
+        if self.pinned or (generation == self.generation and self.relevance is not None):
+            return
+        with self._lock:
+            if generation == self.generation and self.relevance is not None:
+                return
+            build_id = self._published()
+            if build_id is None and wait:
+                build_id = self.rebuild(bump_generation=False)
+            if build_id is None:
+                if self.relevance is None:
+                    print("Warning: No text index published; run build_text_index.py")
+                self.relevance = TextRelevance(empty_index())
+            elif build_id != self.build_id:
+                self.relevance = self._load(build_id)
+            self.build_id, self.generation = build_id, generation
+
+    def _load(self, build_id: str) -> TextRelevance:
+        """A published build, or a patch build on top of its full build."""
+        index = TextIndex.load(os.path.join(self.directory, build_id))
+        base_id = index.meta.get("base")
+        if base_id is None:
+            return TextRelevance(index)
+        relevance = self.relevance
+        if relevance is not None and relevance.base.meta.get("build_id") == base_id:
+            base = relevance.base
+        else:
+            base = TextIndex.load(os.path.join(self.directory, base_id))
+        return TextRelevance(base, index)
+
+    def publish_changes(self) -> Optional[str]:
+        """
+        Publish the descriptions edited since the current build, at most
+        every TEXT_INDEX_REFRESH_INTERVAL seconds (run by the match-job
+        runner, never in a request): a patch of the full build, or a new
+        full build with nothing published or a patch over
+        TEXT_INDEX_MAX_OVERLAY profiles. Returns the id published, if any.
+        """
+        now = time.monotonic()
+        if now - self._published_at < self.refresh_interval:
+            return None
+        self._published_at = now
+
+        published = self._published()
+        if published is None:
+            return self.rebuild()
+        current = TextIndex.load(os.path.join(self.directory, published))
+        since = datetime.fromisoformat(current.meta["built_at"]) - CHANGE_OVERLAP
+        edited = db.session.query(LawyerProfile.id).filter(LawyerProfile.text_updated_at >= since).first()
+        if edited is None:
+            return None
+
+        base_id = current.meta.get("base", published)
+        base = current if base_id == published else TextIndex.load(os.path.join(self.directory, base_id))
+        started = datetime.utcnow()
+        changed = self._changed(base)
+        if len(changed) > self.max_overlay:
+            return self.rebuild()
+        # Nothing the published build doesn't have already
+        if current is base:
+            if not changed:
+                return None
+        elif _same_documents(current, changed):
+            return None
+        build_id = f"{base_id}.{started:%Y%m%d%H%M%S}-{uuid.uuid4().hex[:6]}"
+        self._publish(build_id, TextIndex.build(changed, base=base, meta={
+            "build_id": build_id,
+            "base": base_id,
+            "built_at": started.isoformat(),
+            "generation": self._generation(),
+        }))
+        return build_id
+
+    def _changed(self, base: TextIndex) -> List[Tuple[int, str]]:
+        """(profile id, description) of profiles whose description differs from (or is missing in) `base`."""
+        built_at = datetime.fromisoformat(base.meta["built_at"])
+        rows = _documents(LawyerProfile.text_updated_at >= built_at - CHANGE_OVERLAP)
+        if not rows:
+            return []
+        relevance = TextRelevance(base)
+        indexed = relevance.rows_for(np.array([profile_id for profile_id, _ in rows], dtype=np.int64))
+        return [
+            (profile_id, text) for (profile_id, text), row in zip(rows, indexed)
+            if row < 0 or int(base.text_hashes[row]) != text_hash(text)
+        ]
+
+    @staticmethod
+    def _generation() -> Optional[int]:
+        return db.session.query(LawyerPoolGeneration.generation).filter(LawyerPoolGeneration.id == 1).scalar()
+
+    def rebuild(self, bump_generation: bool = True) -> str:
+        """Build the index from the database, publish it and return its build id."""
+        started = datetime.utcnow()
+        build_id = f"{started:%Y%m%d%H%M%S}-{uuid.uuid4().hex[:6]}"
+        index = TextIndex.build(_documents(), meta={
+            "build_id": build_id,
+            "built_at": started.isoformat(),
+            "generation": self._generation(),
+        })
+        index.meta.update(documents=len(index), terms=len(index.terms), postings=len(index.doc_rows))
+        self._publish(build_id, index, bump_generation)
+        return build_id
+
+    def _publish(self, build_id: str, index: TextIndex, bump_generation: bool = True) -> None:
+        index.save(os.path.join(self.directory, build_id))
+
+        # Atomically point CURRENT at the new build
+        pointer = os.path.join(self.directory, f"CURRENT.{uuid.uuid4().hex[:6]}")
+        with open(pointer, "w") as f:
+            f.write(build_id)
+        previous = self._published()
+        os.replace(pointer, os.path.join(self.directory, "CURRENT"))
+        keep = {build_id, index.meta.get("base")}
+        if previous is not None:
+            keep |= {previous, previous.split(".")[0]}
+        self._remove_old_builds(keep)
+
+        if bump_generation:
+            table = LawyerPoolGeneration.__table__
+            db.session.execute(table.update().where(table.c.id == 1).values(generation=table.c.generation + 1))
+            db.session.commit()
+
+    def _remove_old_builds(self, keep) -> None:
+        # Keep the current and previous builds, and anything recent that a
+        # worker may not have switched away from yet
+        cutoff = time.time() - 3600
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name not in keep and os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self) -> Dict[str, object]:
+        relevance = self.relevance
+        if relevance is None:
+            return {"loaded": False}
+        return {
+            "loaded": True,
+            "build_id": self.build_id,
+            "documents": len(relevance.base),
+            "terms": len(relevance.base.terms),
+            "overlay": len(relevance.overlay) if relevance.overlay is not None else 0,
+        }
+
+
+def _same_documents(index: TextIndex, documents: List[Tuple[int, str]]) -> bool:
+    return len(index) == len(documents) and all(
+        profile_id == int(index.profile_ids[row]) and text_hash(text) == int(index.text_hashes[row])
+        for row, (profile_id, text) in enumerate(documents)
+    )
+
+
+def _documents(*criteria) -> List[Tuple[int, str]]:
+    rows = (
+        db.session.query(LawyerProfile.id, LawyerProfile.experience_description)
+        .join(User, LawyerProfile.user_id == User.id)
+        .filter(User.is_lawyer == True, *criteria)
+        .order_by(LawyerProfile.id)
+    )
+    return [(row.id, row.experience_description) for row in rows]
+
+
+text_index = TextIndexStore()
+
+
+@event.listens_for(LawyerProfile, "before_update")
+def _touch_text(mapper, connection, target):
+    if inspect(target).attrs.experience_description.history.has_changes():
+        target.text_updated_at = datetime.utcnow()
+
+
+def text_similarities(description: Optional[str]) -> Tuple[TextRelevance, np.ndarray]:
+    """The active TextRelevance and the cosine similarity of every row to `description`."""
+    relevance = text_index.current()
+    return relevance, relevance.similarities(description or "")
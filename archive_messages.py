@@ -0,0 +1,66 @@
+"""
+Move the messages of inactive chats into compressed archive chunks
+(app/message_archive.py), one short transaction per chunk. Run it from
+cron or a scheduler; it is safe to run while the app is serving chats, and
+concurrent runs skip chunks the other one archived.
+
+    python archive_messages.py                       # chats idle for MESSAGE_ARCHIVE_AFTER_DAYS
+    python archive_messages.py --days 30 --pause 0.05
+    python archive_messages.py --stats               # tier sizes only
+    python archive_messages.py --vacuum              # also return freed space to the OS
+
+Space freed in the message table is reused by new rows. --vacuum hands it
+back to the filesystem: on SQLite it rewrites the whole database file and
+blocks writers while it runs, so schedule it off-peak.
+"""
+import argparse
+import time
+
+from sqlalchemy import text
+
+from app import create_app
+from app.extensions import db
+from app.message_archive import archive_stats, compact
+
+
+def print_stats(stats: dict) -> None:
+    print(f"  Hot:      {stats['hot_messages']:>10,} messages, {stats['hot_content_bytes'] / 1e6:>8.1f} MB of text")
+    ratio = stats["archived_raw_bytes"] / stats["archived_compressed_bytes"] if stats["archived_compressed_bytes"] else 0
+    print(f"  Archived: {stats['archived_messages']:>10,} messages in {stats['chunks']:,} chunks, "
+          f"{stats['archived_compressed_bytes'] / 1e6:.1f} MB ({ratio:.1f}x compressed)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=float, default=None,
+                        help="archive chats idle this many days (default MESSAGE_ARCHIVE_AFTER_DAYS)")
+    parser.add_argument("--max-chats", type=int, default=None, help="stop after archiving this many chats")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between chunks")
+    parser.add_argument("--stats", action="store_true", help="print tier sizes without archiving")
+    parser.add_argument("--vacuum", action="store_true", help="reclaim freed space afterwards")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if not args.stats:
+            days = app.config["MESSAGE_ARCHIVE_AFTER_DAYS"] if args.days is None else args.days
+            print(f"Archiving messages of chats idle for {days:g} days...")
+            started = time.perf_counter()
+            chats, moved = compact(
+                older_than_days=days,
+                chunk_size=app.config["MESSAGE_ARCHIVE_CHUNK_SIZE"],
+                max_chats=args.max_chats,
+                pause=args.pause,
+            )
+            print(f"✓ Archived {moved:,} messages of {chats:,} chats in {time.perf_counter() - started:.1f}s")
+        if args.vacuum:
+            statement = "VACUUM" if db.engine.dialect.name == "sqlite" else "VACUUM message"
+            with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text(statement))
+            print("✓ Vacuumed")
+        with db.engine.connect() as conn:
+            print_stats(archive_stats(conn))
+
+
+if __name__ == "__main__":
+    main()
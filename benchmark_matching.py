@@ -0,0 +1,382 @@
+"""
+Matching benchmark suite on deterministic synthetic data.
+Times every scoring factor (scalar and vectorized), the full match,
+the lawyer_matches route end to end, the full-text lawyer search and the
+global capacity-constrained assignment, for one or more lawyer-pool sizes,
+and writes the results as JSON so runs can be compared between commits.
+
+    python benchmark_matching.py                                # 1k, 10k, 100k lawyers
+    python benchmark_matching.py --sizes 1000000 --scalar-limit 0 --route-limit 0
+    python benchmark_matching.py --output after.json
+    python benchmark_matching.py --compare before.json after.json
+
+The route benchmark runs against a throwaway SQLite database in the
+temporary directory, never against DATABASE_URL.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from urllib.parse import quote_plus
+
+# Must be set before the app (and its Config) is imported
+BENCH_DB = os.path.join(tempfile.gettempdir(), "lawyerconnect_bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{BENCH_DB}"
+os.environ["TEXT_INDEX_DIR"] = os.path.join(tempfile.gettempdir(), "lawyerconnect_bench_text_index")
+# The throwaway database is migrated (and its lawyers categorized) by create_app
+os.environ["MIGRATE_ON_STARTUP"] = "true"
+# Jobs are run in this process below, where precomputation is timed
+os.environ["MATCH_JOBS_ENABLED"] = "true"
+os.environ.pop("USE_SQLITE", None)
+
+import numpy as np
+from sqlalchemy import create_engine, func, select
+
+from app.extensions import db
+from app.models import User, LawyerProfile, Issue, LawyerPoolGeneration
+from app import assignment, matching
+from app.lawyer_categories import backfill_lawyer_categories
+from app.migrations import run_migrations
+from app.scoring_plan import DEFAULT_PLAN
+from app.text_index import TextIndex, TextRelevance, text_index
+from synthetic_data import SyntheticData, lawyer_profile, issue_record
+
+PASSWORD = "bench123"
+
+# (name, scalar scorer, batch scorer); batch case-type scorers take the lowercase category
+FACTORS = [
+    ("case_type", matching.calculate_case_type_match,
+     lambda batch, issue: matching._batch_case_type(batch, issue.category.lower())),
+    ("specialization", matching.calculate_specialization_score,
+     lambda batch, issue: matching._batch_specialization(batch, issue.category.lower())),
+    ("success_rate", lambda lawyer, issue: lawyer.case_success_rate * 100,
+     lambda batch, issue: batch.case_success_rate * 100),
+    ("availability", lambda lawyer, issue: matching.calculate_availability_score(lawyer),
+     lambda batch, issue: matching._batch_availability(batch, DEFAULT_PLAN)),
+    ("pricing", matching.calculate_pricing_compatibility,
+     lambda batch, issue: matching._batch_pricing(batch, issue, DEFAULT_PLAN)),
+    ("client_profile", matching.calculate_client_profile_match,
+     lambda batch, issue: matching._batch_client_profile(batch, issue, DEFAULT_PLAN)),
+    # Batch timing includes the (otherwise cached) sparse product for the description
+    ("text_relevance", matching.calculate_text_relevance,
+     lambda batch, issue: (text_index.current().similarities.cache_clear(),
+                           matching._batch_text_relevance(batch, issue, DEFAULT_PLAN))),
+]
+
+
+def summarize(name, size, samples):
+    """One result row; samples are seconds per run."""
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "name": name,
+        "size": size,
+        "runs": len(ms),
+        "median_ms": round(statistics.median(ms), 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "min_ms": round(ms[0], 3),
+    }
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - started
+
+
+def bench_assignment(data, size, lawyers, k=50):
+    """Auction over `size` issues x `size` lawyers, on the top-k edges of each issue."""
+    capacity = assignment.lawyer_capacities(lawyers)
+    pool = matching.LawyerBatch([lawyer for lawyer, free in zip(lawyers, capacity) if free > 0])
+    started = time.perf_counter()
+    rankings = [
+        matching.rank_lawyer_batch(issue_record(fields, i + 1), pool, k)[0]
+        for i, fields in enumerate(data.issues(size))
+    ]
+    ranking = time.perf_counter() - started
+    scores, edge_lawyers = assignment.edge_arrays(rankings, k)
+    started = time.perf_counter()
+    _, stats = assignment.auction_assign(scores, edge_lawyers, capacity[capacity > 0])
+    solve = time.perf_counter() - started
+    print(f"  assignment: {stats['assigned']}/{size} issues assigned, score {stats['total_score']:,} "
+          f"(bound {stats['dual_bound']:,}) in {stats['rounds']} rounds")
+    return [
+        summarize(f"assignment.rank_top{k}", size, [ranking]),
+        summarize("assignment.auction", size, [solve]),
+    ]
+
+
+def bench_in_memory(data, size, issues, scalar_limit, assign_limit):
+    """Factor and full-match timings on an in-memory pool."""
+    results = []
+    lawyers = [lawyer_profile(fields, i + 1) for i, fields in enumerate(data.lawyers(size))]
+    batch = matching.LawyerBatch(lawyers)
+    run_scalar = size <= scalar_limit
+
+    started = time.perf_counter()
+    index = TextIndex.build((lawyer.id, lawyer.experience_description) for lawyer in lawyers)
+    results.append(summarize("text_index.build", size, [time.perf_counter() - started]))
+    relevance = TextRelevance(index)
+    text_index.use(relevance)
+    results.append(summarize(
+        "text_index.similarities", size, [timed(index.similarities, issue.description) for issue in issues]
+    ))
+
+    for name, scalar, vectorized in FACTORS:
+        results.append(summarize(
+            f"factor.{name}.batch", size, [timed(vectorized, batch, issue) for issue in issues]
+        ))
+        if run_scalar:
+            def scalar_pass(issue):
+                for lawyer in lawyers:
+                    scalar(lawyer, issue)
+            results.append(summarize(
+                f"factor.{name}.scalar", size, [timed(scalar_pass, issue) for issue in issues]
+            ))
+
+    results.append(summarize(
+        "match.batch_pack", size, [timed(matching.LawyerBatch, lawyers)]
+    ))
+    results.append(summarize(
+        "match.rank_top120", size,
+        [timed(matching.rank_lawyer_batch, issue, batch, 120) for issue in issues],
+    ))
+    results.append(summarize(
+        "match.top_k_page", size,
+        [timed(matching.top_k_matches, issue, batch, 12) for issue in issues],
+    ))
+    if run_scalar:
+        results.append(summarize(
+            "match.full.scalar", size,
+            [timed(matching.match_lawyers_to_issue, issue, lawyers) for issue in issues],
+        ))
+        results.append(summarize(
+            "match.full.vectorized", size,
+            [timed(matching.match_lawyers_to_issue, issue, lawyers, True) for issue in issues],
+        ))
+    if size <= assign_limit:
+        results.extend(bench_assignment(data, size, lawyers))
+    return results
+
+
+def grow_database(engine, data, size, password_hash):
+    """Insert synthetic lawyers until the benchmark database holds `size` of them."""
+    with engine.begin() as conn:
+        existing = conn.execute(select(func.count()).select_from(LawyerProfile.__table__)).scalar()
+        next_user_id = (conn.execute(select(func.max(User.__table__.c.id))).scalar() or 0) + 1
+        now = datetime.utcnow()
+        for start in range(existing, size, 5000):
+            chunk = list(data.lawyers(min(5000, size - start), start=start))
+            users, profiles = [], []
+            for offset, fields in enumerate(chunk):
+                user_id = next_user_id + offset
+                users.append({
+                    "id": user_id, "name": fields["name"], "email": fields["email"],
+                    "password_hash": password_hash, "is_lawyer": True,
+                })
+                columns = {k: v for k, v in fields.items() if k not in ("name", "email")}
+                profiles.append(dict(columns, user_id=user_id, updated_at=now))
+            conn.execute(User.__table__.insert(), users)
+            conn.execute(LawyerProfile.__table__.insert(), profiles)
+            next_user_id += len(chunk)
+        # Category rows and masks the ORM events would have written
+        backfill_lawyer_categories(conn)
+        # Same signal the ORM events send, so the feature store refreshes
+        table = LawyerPoolGeneration.__table__
+        conn.execute(table.update().where(table.c.id == 1).values(generation=table.c.generation + 1))
+
+
+def bench_route(app, engine, data, size, issue_fields, password_hash):
+    """lawyer_matches end to end through the test client."""
+    from app.match_cache import match_cache
+
+    grow_database(engine, data, size, password_hash)
+    with app.app_context():
+        # Published after the pool grows, as a deploy or nightly job would
+        text_index.use(None)
+        started = time.perf_counter()
+        text_index.rebuild()
+        rebuild = time.perf_counter() - started
+        client_user = User.query.filter_by(email="client@bench.lawconnect.com").first()
+        issue_ids = []
+        for fields in issue_fields:
+            issue = Issue(user_id=client_user.id, **fields)
+            db.session.add(issue)
+            db.session.flush()
+            issue_ids.append(issue.id)
+        db.session.commit()
+
+    client = app.test_client()
+    client.post("/login", data={"email": "client@bench.lawconnect.com", "password": PASSWORD})
+
+    started = time.perf_counter()
+    response = client.get(f"/issue/{issue_ids[0]}/lawyers")
+    first = time.perf_counter() - started
+    if response.status_code != 200:
+        raise SystemExit(f"lawyer_matches returned {response.status_code}; is the client logged in?")
+    cold, warm, next_page = [], [], []
+    for issue_id in issue_ids:
+        match_cache.clear()
+        cold.append(timed(client.get, f"/issue/{issue_id}/lawyers"))
+        warm.append(timed(client.get, f"/issue/{issue_id}/lawyers"))
+        next_page.append(timed(client.get, f"/issue/{issue_id}/lawyers?page=2"))
+
+    # Background precomputation, then the route serving the stored ranking
+    from app.match_jobs import match_jobs
+    precompute, precomputed = [], []
+    with app.app_context():
+        for issue_id in issue_ids:
+            match_jobs.enqueue(issue_id)
+            precompute.append(timed(match_jobs.run_pending))
+    for issue_id in issue_ids:
+        match_cache.clear()
+        precomputed.append(timed(client.get, f"/issue/{issue_id}/lawyers"))
+
+    # Keyword search: a category word plus a (prefix of a) city name
+    queries = [
+        f"{fields['category'].split()[0]} {(fields['city'] or 'new york')[:4]}" for fields in issue_fields
+    ]
+    index_search, route_search = [], []
+    with app.app_context():
+        from app.search import lawyer_search
+        for query in queries:
+            index_search.append(timed(lawyer_search.search, query, 13))
+    for query in queries:
+        route_search.append(timed(client.get, f"/lawyers/search?q={quote_plus(query)}"))
+    return [
+        summarize("text_index.rebuild", size, [rebuild]),
+        summarize("route.lawyer_matches.first_after_pool_change", size, [first]),
+        summarize("route.lawyer_matches.cache_miss", size, cold),
+        summarize("route.lawyer_matches.cache_hit", size, warm),
+        summarize("route.lawyer_matches.page2", size, next_page),
+        summarize("jobs.precompute", size, precompute),
+        summarize("route.lawyer_matches.precomputed", size, precomputed),
+        summarize("search.full_text", size, index_search),
+        summarize("route.search_lawyers", size, route_search),
+    ]
+
+
+def setup_route_app():
+    """Fresh benchmark database with one client account; returns (engine, password hash)."""
+    if os.path.exists(BENCH_DB):
+        os.remove(BENCH_DB)
+    shutil.rmtree(os.environ["TEXT_INDEX_DIR"], ignore_errors=True)
+    engine = create_engine(os.environ["DATABASE_URL"])
+    run_migrations(engine)
+    client_user = User(name="Bench Client", email="client@bench.lawconnect.com", is_lawyer=False)
+    client_user.set_password(PASSWORD)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{
+            "name": client_user.name, "email": client_user.email,
+            "password_hash": client_user.password_hash, "is_lawyer": False,
+        }])
+        conn.execute(LawyerPoolGeneration.__table__.insert(), [{"id": 1, "generation": 0}])
+    return engine, client_user.password_hash
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(before_path, after_path, threshold):
+    """Print the change per benchmark; returns the number of regressions."""
+    with open(before_path) as f:
+        before = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+    with open(after_path) as f:
+        after = json.load(f)["results"]
+
+    regressions = 0
+    print(f"{'benchmark':<48} {'size':>8} {'before':>10} {'after':>10} {'change':>8}")
+    for result in after:
+        old = before.get((result["name"], result["size"]))
+        if old is None or not old["median_ms"]:
+            continue
+        ratio = result["median_ms"] / old["median_ms"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{result['name']:<48} {result['size']:>8} {old['median_ms']:>10.2f} "
+              f"{result['median_ms']:>10.2f} {ratio - 1:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated lawyer-pool sizes")
+    parser.add_argument("--issues", type=int, default=10, help="issues timed per size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scalar-limit", type=int, default=100000,
+                        help="largest pool timed with the scalar scorers")
+    parser.add_argument("--route-limit", type=int, default=100000,
+                        help="largest pool timed through the lawyer_matches route")
+    parser.add_argument("--assign-limit", type=int, default=10000,
+                        help="largest pool timed with the global assignment (as many issues as lawyers)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="compare two result files instead of running")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown reported as a regression by --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare, args.threshold)
+        print(f"\n{regressions} regression(s) above {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    data = SyntheticData(seed=args.seed)
+    issue_fields = list(data.issues(args.issues))
+    issues = [issue_record(fields, i + 1) for i, fields in enumerate(issue_fields)]
+
+    app = engine = password_hash = None
+    if any(size <= args.route_limit for size in sizes):
+        engine, password_hash = setup_route_app()
+        # Fill the pool before create_app, which seeds empty databases
+        grow_database(engine, data, sizes[0], password_hash)
+        from app import create_app
+        app = create_app()
+
+    results = []
+    for size in sizes:
+        print(f"Benchmarking {size:,} lawyers...")
+        results.extend(bench_in_memory(data, size, issues, args.scalar_limit, args.assign_limit))
+        if app is not None and size <= args.route_limit:
+            results.extend(bench_route(app, engine, data, size, issue_fields, password_hash))
+        for result in results:
+            if result["size"] == size:
+                print(f"  {result['name']:<48} median {result['median_ms']:>10.2f} ms  "
+                      f"p95 {result['p95_ms']:>10.2f} ms")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+            "issues": args.issues,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Wrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
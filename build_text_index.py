@@ -0,0 +1,58 @@
+"""
+Rebuild the TF-IDF index of lawyer experience descriptions used by the
+text-relevance matching factor, and publish it to TEXT_INDEX_DIR.
+Running workers switch to the new build on their next match request.
+render.yaml runs this on every deploy.
+
+    python build_text_index.py            # rebuild and publish
+    python build_text_index.py --show     # describe the published build
+    python build_text_index.py --query "my landlord kept the deposit"
+"""
+import argparse
+import json
+import time
+
+from app import create_app
+from app.match_cache import current_generation
+from app.text_index import text_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--show", action="store_true", help="describe the published build")
+    group.add_argument("--query", metavar="TEXT", help="show the lawyers most similar to TEXT")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.show or args.query:
+            text_index.sync(current_generation(), wait=True)
+            relevance = text_index.current()
+            if args.show:
+                print(json.dumps(dict(relevance.base.meta, **text_index.stats()), indent=2))
+                return
+            similarities = relevance.similarities(args.query)[:-1]
+            shown = []
+            ids = relevance.base.profile_ids
+            if relevance.overlay is not None:
+                ids = list(ids) + list(relevance.overlay.profile_ids)
+            # Rows superseded by the overlay are skipped
+            for row in similarities.argsort()[::-1]:
+                if similarities[row] <= 0 or len(shown) == 10:
+                    break
+                if relevance.row_of(int(ids[row])) == row:
+                    shown.append(row)
+                    print(f"  profile {ids[row]:>8}  similarity {similarities[row]:.3f}")
+            return
+
+        started = time.perf_counter()
+        build_id = text_index.rebuild()
+        text_index.sync(current_generation())
+        stats = text_index.stats()
+        print(f"✓ Published text index {build_id}: {stats['documents']} lawyers, "
+              f"{stats['terms']} terms in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
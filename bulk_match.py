@@ -0,0 +1,52 @@
+"""
+Re-rank open issues against the full lawyer pool using all CPU cores.
+Run this after tuning matching weights or importing a batch of lawyers.
+
+    python bulk_match.py                      # top 50 per open issue -> match_result table
+    python bulk_match.py --jsonl matches.jsonl --workers 8 --k 20
+    python bulk_match.py --all-issues --no-resume
+
+Interrupted runs can simply be restarted; finished issues are skipped.
+"""
+import argparse
+
+from app import create_app
+from app.extensions import db
+from app.models import Issue
+from app.bulk_matching import bulk_match
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--k", type=int, default=50, help="matches kept per issue")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="issues per task")
+    parser.add_argument("--jsonl", default=None, help="write to this JSONL file instead of the database")
+    parser.add_argument("--all-issues", action="store_true", help="include issues that already have a chat")
+    parser.add_argument("--no-resume", action="store_true", help="re-rank issues that already have results")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        issue_ids = None
+        if args.all_issues:
+            issue_ids = [row.id for row in db.session.query(Issue.id).order_by(Issue.id)]
+
+        print("Bulk matching issues against the lawyer pool...")
+        summary = bulk_match(
+            issue_ids=issue_ids,
+            k=args.k,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            jsonl_path=args.jsonl,
+            resume=not args.no_resume,
+        )
+        print(f"\n✓ Ranked {summary['issues_ranked']} issues against {summary['lawyers']} lawyers "
+              f"in {summary['seconds']}s using {summary['workers']} workers")
+        if summary["issues_skipped"]:
+            print(f"  (Skipped {summary['issues_skipped']} issues already ranked)")
+        print(f"  {summary['pairs_per_second']:,} issue-lawyer pairs/second")
+
+
+if __name__ == "__main__":
+    main()
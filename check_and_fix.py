@@ -15,7 +15,7 @@ if os.path.exists(db_path):
     print(f"✓ Database file exists: {db_path}")
 else:
     print(f"✗ Database file not found: {db_path}")
-    print("  The database will be created on first run.")
+    print("  It is created by the migrations below (python migrate.py).")
 
 # Check 2: Run migration
 print("\n" + "=" * 60)
@@ -23,17 +23,18 @@ print("Running database migrations...")
 print("=" * 60)
 
 try:
-    import migrate_db_simple
-    print("\n✓ Basic migration completed")
-except Exception as e:
-    print(f"\n✗ Basic migration failed: {e}")
-
-try:
-    import migrate_db_advanced
-    print("✓ Advanced migration completed")
+    from app import create_app, prepare_database
+    from app.migrations import MIGRATIONS, applied_versions
+    app = create_app({"MIGRATE_ON_STARTUP": False})  # Migrated explicitly below
+    with app.app_context():
+        prepare_database()
+        applied = applied_versions()
+        for step in MIGRATIONS:
+            state = "✓" if step.version in applied else "✗"
+            print(f"{state} Migration {step.version:04d} {step.name}")
 except Exception as e:
-    print(f"✗ Advanced migration failed: {e}")
-    print("  (This is OK if you haven't updated to the new matching algorithm yet)")
+    print(f"\n✗ Migration failed: {e}")
+    print("  Run: python migrate.py --status")
 
 # Check 3: Test app creation
 print("\n" + "=" * 60)
@@ -42,7 +43,7 @@ print("=" * 60)
 
 try:
     from app import create_app
-    app = create_app()
+    app = create_app({"MIGRATE_ON_STARTUP": False})  # Migrated above
     print("✓ App created successfully")
     
     # Test database connection
@@ -0,0 +1,115 @@
+"""
+EXPLAIN check for the hot-path queries: each must be answered from its
+index (ix_chat_user_activity etc., see migrations.py) without a full table
+scan or a separate sort. Works on SQLite and PostgreSQL; run it after
+adding a migration or changing one of these queries.
+"""
+import json
+import sys
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app import create_app
+from app.extensions import db
+from app.models import Chat, Issue, LawyerProfile, Message
+from app.pagination import keyset_query
+
+# (description, query, index expected to serve it), as issued by routes.py, feature_store.py and text_index.py
+HOT_QUERIES = [
+    ("user dashboard issues",
+     lambda: keyset_query(Issue.query.filter_by(user_id=1), Issue, 20),
+     "ix_issue_user_created_id"),
+    ("user dashboard chats",
+     lambda: keyset_query(Chat.query.filter_by(user_id=1), Chat, 20, None, Chat.last_activity_at),
+     "ix_chat_user_activity"),
+    ("lawyer dashboard chats",
+     lambda: keyset_query(Chat.query.filter_by(lawyer_id=1), Chat, 20, None, Chat.last_activity_at),
+     "ix_chat_lawyer_activity"),
+    ("lawyer dashboard chats, older page",
+     lambda: keyset_query(Chat.query.filter_by(lawyer_id=1), Chat, 20, (datetime(2030, 1, 1), 1000),
+                          Chat.last_activity_at),
+     "ix_chat_lawyer_activity"),
+    ("chat messages, latest page",
+     lambda: keyset_query(Message.query.filter_by(chat_id=1), Message, 50),
+     "ix_message_chat_created_id"),
+    ("chat messages, older page",
+     lambda: keyset_query(Message.query.filter_by(chat_id=1), Message, 50, (datetime(2030, 1, 1), 1000)),
+     "ix_message_chat_created_id"),
+    ("chat messages after a client's last seen id",
+     lambda: Message.query.filter(Message.chat_id == 1, Message.id > 1000).order_by(Message.id).limit(200),
+     "ix_message_chat_id"),
+    ("lawyer profile of a user",
+     lambda: LawyerProfile.query.filter_by(user_id=1),
+     "ix_lawyer_profile_user_id"),
+    ("feature store refresh: profiles written since the worker's generation",
+     lambda: LawyerProfile.query.filter(LawyerProfile.pool_generation > 1000),
+     "ix_lawyer_profile_pool_generation"),
+    ("text index patch: descriptions changed since the build (match-job runner)",
+     lambda: LawyerProfile.query.filter(LawyerProfile.text_updated_at >= datetime(2030, 1, 1)),
+     "ix_lawyer_profile_text_updated_at"),
+]
+
+
+def explain_sqlite(sql: str) -> str:
+    rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def check_sqlite(plan: str, index: str):
+    if f"INDEX {index}" not in plan:
+        return f"does not use {index}"
+    if "TEMP B-TREE" in plan:
+        return "sorts in a temporary b-tree"
+    return None
+
+
+def explain_postgres(sql: str) -> dict:
+    # Tiny development tables are cheaper to scan; the check is whether the index can serve the query
+    db.session.execute(text("SET LOCAL enable_seqscan = off"))
+    rows = db.session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    return (json.loads(rows) if isinstance(rows, str) else rows)[0]["Plan"]
+
+
+def check_postgres(plan: dict, index: str):
+    nodes = [plan]
+    seen = []
+    while nodes:
+        node = nodes.pop()
+        seen.append(node)
+        nodes.extend(node.get("Plans", []))
+    if not any(node.get("Index Name") == index for node in seen):
+        return f"does not use {index}"
+    if any(node["Node Type"] in ("Seq Scan", "Sort") for node in seen):
+        return "scans or sorts the table"
+    return None
+
+
+def main():
+    app = create_app()
+    failures = 0
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        for description, build, index in HOT_QUERIES:
+            sql = str(build().statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+            if dialect == "sqlite":
+                plan = explain_sqlite(sql)
+                error = check_sqlite(plan, index)
+            else:
+                plan = explain_postgres(sql)
+                error = check_postgres(plan, index)
+            db.session.rollback()
+            if error:
+                failures += 1
+                print(f"✗ {description}: {error}\n    {sql}\n    {plan}")
+            else:
+                print(f"✓ {description}: {index}")
+
+    if failures:
+        print(f"\n✗ {failures} hot-path queries are not served by their index")
+        sys.exit(1)
+    print("\n✓ All hot-path queries use their indexes")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,8 @@ Diagnostic script to check lawyers in the database.
 Run this on Render to see what lawyers exist and their expertise.
 """
 from app import create_app
-from app.models import LawyerProfile, User, ISSUE_CATEGORIES
+from app.models import LawyerProfile, User
+from app.lawyer_categories import category_coverage
 from app.extensions import db
 
 app = create_app()
@@ -29,10 +30,7 @@ with app.app_context():
         print(f"\n{'='*60}")
         print("LAWYER COVERAGE BY CATEGORY:")
         print(f"{'='*60}\n")
-        for category in ISSUE_CATEGORIES:
-            count = LawyerProfile.query.filter(
-                LawyerProfile.expertise_categories.like(f"%{category}%")
-            ).count()
+        for category, count in category_coverage().items():
             print(f"  {category:30s}: {count:3d} lawyers")
         
         print(f"\n{'='*60}")
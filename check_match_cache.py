@@ -0,0 +1,135 @@
+"""
+Parity check between carried-forward and recomputed match-cache entries.
+Ranks a set of issues against a small lawyer pool, then edits lawyers one
+commit at a time (capacity, availability, pricing) so that the candidate
+count of many issues crosses min_candidates and selection would switch
+relaxation level. After every commit each ranking carried forward to the
+new generation (match_cache.carry_forward) must equal a fresh rank_issue.
+
+Runs against a throwaway SQLite database in the temporary directory,
+never against DATABASE_URL.
+"""
+import os
+import random
+import sys
+import tempfile
+
+# Must be set before the app (and its Config) is imported
+CHECK_DB = os.path.join(tempfile.gettempdir(), "lawyerconnect_match_cache.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{CHECK_DB}"
+os.environ["TEXT_INDEX_DIR"] = os.path.join(tempfile.gettempdir(), "lawyerconnect_match_cache_text_index")
+os.environ["MATCH_CACHE_BACKEND"] = "memory"
+# The throwaway database is migrated (and its lawyers categorized) by create_app
+os.environ["MIGRATE_ON_STARTUP"] = "true"
+os.environ.pop("USE_SQLITE", None)
+
+from sqlalchemy import create_engine
+
+from app import create_app
+from app.candidates import MATCHES_PER_PAGE
+from app.extensions import db
+from app.migrations import run_migrations
+from app.match_cache import current_generation, get_ranking, match_cache, rank_issue
+from app.models import Issue, LawyerPoolGeneration, LawyerProfile, User
+from app.scoring_plan import current_plan
+from app.text_index import text_index
+from synthetic_data import SyntheticData
+
+# About twice MATCHES_PER_PAGE, so a few edits move issues across it
+LAWYERS = 24
+ISSUES = 40
+EDITS = 60
+
+
+def insert_pool(data):
+    """Create the schema, the lawyer pool and a client with ISSUES issues (before create_app)."""
+    engine = create_engine(os.environ["DATABASE_URL"])
+    run_migrations(engine)
+    with engine.begin() as conn:
+        for fields in data.lawyers(LAWYERS):
+            user_id = conn.execute(User.__table__.insert().values(
+                name=fields["name"], email=fields["email"], password_hash="x", is_lawyer=True,
+            )).inserted_primary_key[0]
+            columns = {key: value for key, value in fields.items() if key not in ("name", "email")}
+            conn.execute(LawyerProfile.__table__.insert().values(user_id=user_id, **columns))
+        client_id = conn.execute(User.__table__.insert().values(
+            name="Client", email="client@check.lawconnect.com", password_hash="x",
+        )).inserted_primary_key[0]
+        for fields in data.issues(ISSUES):
+            conn.execute(Issue.__table__.insert().values(user_id=client_id, **fields))
+        conn.execute(LawyerPoolGeneration.__table__.insert().values(id=1, generation=0))
+
+
+def edit(rng, lawyer):
+    """Change one filter-relevant column of a lawyer."""
+    change = rng.choice(["fill", "free", "availability", "hourly", "fixed", "contingency"])
+    if change == "fill":
+        lawyer.current_cases = lawyer.max_cases
+    elif change == "free":
+        lawyer.max_cases = max(lawyer.max_cases, 1)
+        lawyer.current_cases = 0
+    elif change == "availability":
+        lawyer.is_available = not lawyer.is_available
+    elif change == "hourly":
+        lawyer.hourly_rate = 0.0 if lawyer.hourly_rate else 150.0
+    elif change == "fixed":
+        lawyer.fixed_rate_min = lawyer.fixed_rate_max = 0.0 if lawyer.fixed_rate_max else 3000.0
+    else:
+        lawyer.accepts_contingency = not lawyer.accepts_contingency
+    return change
+
+
+def comparable(entry):
+    return (
+        [(profile_id, round(score, 6)) for profile_id, score in entry["ranking"]],
+        entry["total"],
+        entry["filters"],
+    )
+
+
+def main():
+    if os.path.exists(CHECK_DB):
+        os.remove(CHECK_DB)
+    insert_pool(SyntheticData(seed=7))
+
+    app = create_app()
+    rng = random.Random(7)
+    mismatches = carried = dropped = 0
+    with app.app_context():
+        issues = Issue.query.order_by(Issue.id).all()
+        lawyers = LawyerProfile.query.order_by(LawyerProfile.id).all()
+        plan = current_plan()
+        for step in range(EDITS):
+            for issue in issues:
+                # First or second page, as lawyer_matches asks for them
+                depth = MATCHES_PER_PAGE * (1 + issue.id % 2)
+                get_ranking(issue, depth, min_candidates=depth)
+
+            lawyer = rng.choice(lawyers)
+            change = edit(rng, lawyer)
+            db.session.commit()
+
+            generation = current_generation()
+            text_index.sync(generation, wait=True)
+            for issue in issues:
+                entry = match_cache.get(issue.id, generation, plan.fingerprint, 0)
+                if entry is None:
+                    dropped += 1
+                    continue
+                carried += 1
+                fresh = rank_issue(issue, entry["depth"], entry["min_candidates"], plan)
+                if comparable(entry) != comparable(fresh):
+                    mismatches += 1
+                    print(f"✗ edit {step} ({change} lawyer {lawyer.id}), issue {issue.id}: "
+                          f"carried {entry['filters']} total {entry['total']}, "
+                          f"fresh {fresh['filters']} total {fresh['total']}")
+
+    print(f"{carried} rankings carried forward, {dropped} dropped for recomputation")
+    if mismatches:
+        print(f"✗ {mismatches} carried rankings differ from a fresh rank_issue")
+        sys.exit(1)
+    print("✓ Carried-forward rankings match fresh rankings")
+
+
+if __name__ == "__main__":
+    main()
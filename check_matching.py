@@ -0,0 +1,145 @@
+"""
+Parity check between the scalar and vectorized matching paths.
+Run this after changing any scoring function to make sure both paths
+still return the same (lawyer, score, breakdown) tuples.
+"""
+import random
+import sys
+
+from app import create_app
+from app.models import LawyerProfile, User, Issue, ISSUE_CATEGORIES
+from app.matching import LawyerBatch, match_lawyers_to_issue, rank_lawyer_batch, top_k_matches
+from app.scoring_plan import DEFAULT_PARAMS, DEFAULT_PLAN, compile_plan, use_plan
+from app.text_index import TextIndex, TextRelevance, text_index
+from seed_db import SAMPLE_LAWYERS
+
+# A non-default plan, so both paths are also checked with tuned parameters
+TUNED_PLAN = compile_plan(dict(
+    DEFAULT_PARAMS,
+    weights={"case_type": 0.4, "specialization": 0.1, "success_rate": 0.2,
+             "availability": 0.1, "pricing": 0.05, "client_profile": 0.05, "text_relevance": 0.1},
+    hourly_estimate_hours=[5, 60],
+    capacity_tiers=[[0.3, 100.0], [0.6, 85.0], [0.9, 70.0]],
+    capacity_full_score=40.0,
+    text_full_similarity=0.2,
+))
+
+URGENCIES = ["low", "normal", "high", "urgent"]
+CITIES = ["", "Lahore", "Islamabad", "rawalpindi, punjab", "New York, NY", "Newark", "Atlantis"]
+PRICING = ["hourly", "fixed", "contingency", "other"]
+DESCRIPTIONS = [
+    "",
+    "My employer keeps harassing me and HR ignored my complaints.",
+    "Landlord refuses to return the deposit after I moved out of the property.",
+    "Custody dispute with my ex, need help with a protective order.",
+    "Someone committed fraud using my identity and opened accounts.",
+]
+
+
+def random_lawyer(rng, profile_id=None):
+    """Build an unsaved LawyerProfile covering the edge cases of each factor."""
+    categories = rng.sample(ISSUE_CATEGORIES, rng.randint(1, 3))
+    if rng.random() < 0.1:
+        categories.append(rng.choice(["Harassment Law", "Tax", "fraud"]))
+    max_cases = rng.choice([0, 5, 10, 12])
+    return LawyerProfile(
+        id=profile_id,
+        expertise_categories=",".join(categories),
+        experience_description=rng.choice([""] + [sample["experience"] for sample in SAMPLE_LAWYERS]),
+        rating=rng.choice([0.0, 3.5, 4.2, 4.9, 5.0]),
+        case_success_rate=rng.choice([0.0, 0.7, 0.75, 0.8, 0.85, 0.92]),
+        is_available=rng.random() > 0.1,
+        hourly_rate=rng.choice([0.0, 50.0, 250.0, 400.0, 2000.0]),
+        fixed_rate_min=rng.choice([0.0, 500.0, 2500.0]),
+        fixed_rate_max=rng.choice([0.0, 8000.0, 20000.0]),
+        accepts_contingency=rng.random() < 0.3,
+        max_cases=max_cases,
+        current_cases=rng.randint(0, max_cases + 1),
+        city=rng.choice(CITIES + [None]),
+        user=User(name="", email="", password_hash="", is_lawyer=rng.random() > 0.05),
+    )
+
+
+def compare(issue, lawyers):
+    scalar = match_lawyers_to_issue(issue, lawyers)
+    batch = match_lawyers_to_issue(issue, lawyers, vectorized=True)
+    if len(scalar) != len(batch):
+        return f"length {len(scalar)} != {len(batch)}"
+    for (l1, s1, b1), (l2, s2, b2) in zip(scalar, batch):
+        if l1 is not l2 or s1 != s2 or b1 != b2:
+            return f"lawyer {l1.expertise_categories!r}: {s1} {b1} != {s2} {b2}"
+
+    # The first top-K pages must line up with the full sort
+    expected = [m for m in scalar if m[1] > 0]
+    pool = LawyerBatch([l for l in lawyers if l.user and l.user.is_lawyer])
+    for k in (7, 50):
+        pages = []
+        for offset in range(0, 3 * k, k):
+            page, total = top_k_matches(issue, pool, k, offset)
+            if total != len(expected):
+                return f"top-k total {total} != {len(expected)}"
+            pages.extend(page)
+        if pages != expected[:3 * k]:
+            return f"top-k pages (k={k}) differ from the full ranking"
+
+    # rank_lawyer_batch (feature store, bulk matching) rounds only near the cut-off
+    for limit in (1, 50):
+        ranked, total = rank_lawyer_batch(issue, pool, limit)
+        if total != len(expected):
+            return f"rank_lawyer_batch total {total} != {len(expected)}"
+        if [(pool.profiles[i], score) for i, score in ranked] != [(l, s) for l, s, _ in expected[:limit]]:
+            return f"rank_lawyer_batch (limit={limit}) differs from the full ranking"
+    return None
+
+
+def main():
+    rng = random.Random(42)
+    app = create_app()
+    failures = 0
+
+    with app.app_context():
+        # Every 10th synthetic lawyer is unsaved (no id) and so not in the text index
+        synthetic = [random_lawyer(rng, None if i % 10 == 0 else i) for i in range(2000)]
+        synthetic_text = TextRelevance(TextIndex.build(
+            (lawyer.id, lawyer.experience_description) for lawyer in synthetic if lawyer.id is not None
+        ))
+        pools = {
+            "database": LawyerProfile.query.all(),
+            "synthetic": synthetic,
+        }
+        for pool_name, lawyers, plan, relevance in [
+            ("database", pools["database"], DEFAULT_PLAN, None),
+            ("synthetic", pools["synthetic"], DEFAULT_PLAN, synthetic_text),
+            ("synthetic (tuned plan)", pools["synthetic"], TUNED_PLAN, synthetic_text),
+        ]:
+            use_plan(plan)
+            text_index.use(relevance)
+            checked = 0
+            for category in ISSUE_CATEGORIES + ["Property"]:
+                for urgency in URGENCIES:
+                    for pricing in PRICING:
+                        for budget_min, budget_max in [(0.0, 0.0), (1000.0, 10000.0), (5000.0, 150000.0)]:
+                            issue = Issue(
+                                title="", description=DESCRIPTIONS[checked % len(DESCRIPTIONS)],
+                                category=category,
+                                budget_min=budget_min, budget_max=budget_max,
+                                urgency=urgency, preferred_pricing=pricing,
+                                city=CITIES[checked % len(CITIES)],
+                            )
+                            error = compare(issue, lawyers)
+                            checked += 1
+                            if error:
+                                failures += 1
+                                print(f"✗ {pool_name} {category}/{urgency}/{pricing}: {error}")
+            print(f"✓ {pool_name}: {checked} issues x {len(lawyers)} lawyers checked")
+        use_plan(DEFAULT_PLAN)
+        text_index.use(None)
+
+    if failures:
+        print(f"\n✗ {failures} mismatches between scalar and vectorized matching")
+        sys.exit(1)
+    print("\n✓ Scalar and vectorized matching agree")
+
+
+if __name__ == "__main__":
+    main()
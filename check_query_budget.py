@@ -0,0 +1,214 @@
+"""
+N+1 check: requests the dashboards, a chat and the lawyer_matches pages
+through the test client with strict query budgets (see query_budget.py),
+once with a few chats/messages and once with many. Fails if a route goes
+over its budget or runs more queries for more rows.
+
+Then times the lawyer dashboard for a lawyer with a few chats against
+one with BUSY_LAWYER_CHATS (first and a deep page), which should take
+about as long now that it is keyset-paginated with capped counts.
+
+Runs against a throwaway SQLite database in the temporary directory,
+never against DATABASE_URL.
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Must be set before the app (and its Config) is imported
+CHECK_DB = os.path.join(tempfile.gettempdir(), "lawyerconnect_query_budget.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{CHECK_DB}"
+os.environ["TEXT_INDEX_DIR"] = os.path.join(tempfile.gettempdir(), "lawyerconnect_query_budget_text_index")
+os.environ["QUERY_BUDGET_STRICT"] = "true"
+# Cover the lookup of precomputed matches on lawyer_matches
+os.environ["MATCH_JOBS_ENABLED"] = "true"
+# The throwaway database is migrated (and its lawyers categorized) by create_app
+os.environ["MIGRATE_ON_STARTUP"] = "true"
+os.environ.pop("USE_SQLITE", None)
+
+from sqlalchemy import create_engine
+
+from app import create_app
+from app.extensions import db
+from app.migrations import run_migrations
+from app.models import Chat, Issue, LawyerPoolGeneration, LawyerProfile, Message, User
+from app.pagination import encode_cursor
+from app.query_budget import QueryBudgetExceeded
+from synthetic_data import SyntheticData
+
+LAWYERS = 60
+BUSY_LAWYER_CHATS = 50000
+# Busy-lawyer dashboard time allowed, as a multiple of the few-chats time
+SCALING_TOLERANCE = 3.0
+
+
+def insert_lawyers(data):
+    """Create the schema and the lawyer pool (before create_app, which seeds empty databases)."""
+    engine = create_engine(os.environ["DATABASE_URL"])
+    run_migrations(engine)
+    with engine.begin() as conn:
+        for i, fields in enumerate(data.lawyers(LAWYERS)):
+            user_id = conn.execute(User.__table__.insert().values(
+                name=fields["name"], email=fields["email"], password_hash="x", is_lawyer=True,
+            )).inserted_primary_key[0]
+            columns = {key: value for key, value in fields.items() if key not in ("name", "email")}
+            conn.execute(LawyerProfile.__table__.insert().values(user_id=user_id, **columns))
+        conn.execute(LawyerPoolGeneration.__table__.insert().values(id=1, generation=0))
+
+
+def populate(data, rows, lawyer_offset):
+    """A client with `rows` issues and chats, a lawyer with `rows` chats, `rows` * 2 messages."""
+    lawyers = User.query.filter_by(is_lawyer=True).order_by(User.id).all()
+    lawyer = lawyers[lawyer_offset]
+    client = User(name=f"Client {rows}", email=f"client{rows}@check.lawconnect.com", password_hash="x")
+    db.session.add(client)
+    db.session.flush()
+
+    chats = []
+    for i, fields in enumerate(data.issues(rows)):
+        issue = Issue(user_id=client.id, **fields)
+        other = User(name=f"Other client {rows}.{i}", email=f"other{rows}.{i}@check.lawconnect.com", password_hash="x")
+        db.session.add_all([issue, other])
+        db.session.flush()
+        chats.append(Chat(user_id=client.id, lawyer_id=lawyers[i % LAWYERS].id, issue_id=issue.id))
+        # The lawyer's dashboard lists one chat per other client
+        chats.append(Chat(user_id=other.id, lawyer_id=lawyer.id, issue_id=issue.id))
+    db.session.add_all(chats)
+    db.session.flush()
+    for i in range(rows * 2):
+        sender = client if i % 2 == 0 else lawyers[0]
+        db.session.add(Message(
+            chat_id=chats[0].id, sender_id=sender.id,
+            sender_role="lawyer" if sender.is_lawyer else "user", content=f"Message {i}",
+        ))
+    db.session.commit()
+    return client.id, lawyer.id, chats[0].id, issue.id
+
+
+def requests_for(app, client_id, lawyer_id, chat_id, issue_id):
+    """(name, user id, path) of the requests to count."""
+    return [
+        ("user_dashboard", client_id, "/dashboard/user"),
+        ("lawyer_dashboard", lawyer_id, "/dashboard/lawyer"),
+        ("chat_view", client_id, f"/chat/{chat_id}"),
+        ("chat_messages", client_id, f"/chat/{chat_id}/messages"),
+        ("chat_messages since", client_id, f"/chat/{chat_id}/messages?since=0"),
+        ("lawyer_matches", client_id, f"/issue/{issue_id}/lawyers"),
+        ("lawyer_matches page 2", client_id, f"/issue/{issue_id}/lawyers?page=2"),
+    ]
+
+
+def count_queries(app, user_id, path):
+    """Statements run by one request (raises QueryBudgetExceeded over budget)."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+    response = client.get(path)
+    if response.status_code != 200:
+        raise SystemExit(f"{path} returned {response.status_code}")
+    return int(response.headers["X-Query-Count"])
+
+
+def add_busy_lawyer(data):
+    """A lawyer with BUSY_LAWYER_CHATS chats, inserted with Core; returns the lawyer's user id."""
+    users = User.__table__
+    chats = Chat.__table__
+    with db.engine.begin() as conn:
+        lawyer_id = conn.execute(users.insert().values(
+            name="Busy Lawyer", email="busy@check.lawconnect.com", password_hash="x", is_lawyer=True,
+        )).inserted_primary_key[0]
+        fields = dict(next(data.lawyers(1, start=LAWYERS)), user_id=lawyer_id)
+        conn.execute(LawyerProfile.__table__.insert().values(
+            {key: value for key, value in fields.items() if key not in ("name", "email")}
+        ))
+        client_id = conn.execute(users.insert().values(
+            name="Busy Client", email="busy.client@check.lawconnect.com", password_hash="x",
+        )).inserted_primary_key[0]
+        start = datetime(2024, 1, 1)
+        for offset in range(0, BUSY_LAWYER_CHATS, 5000):
+            conn.execute(chats.insert(), [
+                {"user_id": client_id, "lawyer_id": lawyer_id, "created_at": start + timedelta(minutes=i),
+                 "last_activity_at": start + timedelta(minutes=i), "message_count": 0}
+                for i in range(offset, min(offset + 5000, BUSY_LAWYER_CHATS))
+            ])
+    return lawyer_id
+
+
+def dashboard_ms(app, user_id, path, runs=7):
+    """Median milliseconds of a dashboard request."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = client.get(path)
+        samples.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise SystemExit(f"{path} returned {response.status_code}")
+    return statistics.median(samples)
+
+
+def check_dashboard_scaling(app, data, few_lawyer_id):
+    """Number of failures: busy-lawyer dashboard pages much slower than a few-chats one."""
+    with app.app_context():
+        busy_lawyer_id = add_busy_lawyer(data)
+        deep = Chat.query.filter_by(lawyer_id=busy_lawyer_id).order_by(Chat.id).offset(100).first()
+    few = dashboard_ms(app, few_lawyer_id, "/dashboard/lawyer")
+    failures = 0
+    for name, path in [
+        ("first page", "/dashboard/lawyer"),
+        ("deep page", f"/dashboard/lawyer?chats_before={encode_cursor(deep.last_activity_at, deep.id)}"),
+    ]:
+        busy = dashboard_ms(app, busy_lawyer_id, path)
+        message = f"lawyer_dashboard {name}: {few:.1f} ms with a few chats, {busy:.1f} ms with {BUSY_LAWYER_CHATS:,}"
+        if busy > few * SCALING_TOLERANCE:
+            failures += 1
+            print(f"✗ {message}")
+        else:
+            print(f"✓ {message}")
+    return failures
+
+
+def main():
+    if os.path.exists(CHECK_DB):
+        os.remove(CHECK_DB)
+    data = SyntheticData(seed=7)
+    insert_lawyers(data)
+    app = create_app()
+    app.testing = True  # Let QueryBudgetExceeded propagate out of the test client
+    failures = 0
+    with app.app_context():
+        small_ids = populate(data, 3, 1)
+        small = requests_for(app, *small_ids)
+        large = requests_for(app, *populate(data, 50, 2))
+    for (name, small_user, small_path), (_, large_user, large_path) in zip(small, large):
+        try:
+            few = count_queries(app, small_user, small_path)
+            many = count_queries(app, large_user, large_path)
+        except QueryBudgetExceeded as e:
+            failures += 1
+            print(f"✗ {name}: {e}")
+            continue
+        if many > few:
+            failures += 1
+            print(f"✗ {name}: {few} queries for a few rows but {many} for many (N+1)")
+        else:
+            print(f"✓ {name}: {many} queries")
+
+    if failures:
+        print(f"\n✗ {failures} routes over their query budget")
+        sys.exit(1)
+    print("\n✓ All routes within their query budgets\n")
+
+    if check_dashboard_scaling(app, data, small_ids[1]):
+        print(f"\n✗ Dashboard time grows with the number of chats")
+        sys.exit(1)
+    print("\n✓ Dashboard time does not depend on the number of chats")
+
+
+if __name__ == "__main__":
+    main()
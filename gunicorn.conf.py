@@ -0,0 +1,22 @@
+"""
+Gunicorn settings, read automatically by `gunicorn run:app` (Procfile, render.yaml).
+
+Chat streams (/chat/<id>/stream) and long-polls stay open for minutes, so
+workers are threaded: each open stream holds one thread, which waits on the
+in-process chat broker (app/chat_events.py) and not on the database. One
+worker holds up to GUNICORN_THREADS open chats; load_test_chat.py measures
+how many it can serve with acceptable delivery latency.
+"""
+import os
+
+# The only place the listen address is set; Procfile and render.yaml pass no --bind
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 100))
+# Above threads, so idle keep-alive connections don't take stream slots
+worker_connections = threads * 2
+# gthread workers heartbeat independently of requests, so this bounds a
+# stuck request, not an open stream (streams end after CHAT_STREAM_TIMEOUT)
+timeout = 60
+keepalive = 5
@@ -0,0 +1,153 @@
+"""
+Load a staging dataset: synthetic clients, lawyers, issues, chats and
+messages (synthetic_data.py), and/or accounts from a JSONL file, through
+the batched bulk loader (app/bulk_load.py).
+
+    python load_data.py --lawyers 10000 --clients 1000000 --chats 500000 --reuse-hash
+    python load_data.py --jsonl accounts.jsonl --processes 8
+
+JSONL lines are SAMPLE_LAWYERS-style entries (seed_db.py): name, email and
+password, plus the profile fields for lawyers. Existing emails are skipped,
+so accounts can be loaded again safely; issues, chats and messages are
+added on every run.
+
+--reuse-hash gives every synthetic account one precomputed hash of
+--password instead of hashing each (about 0.1s of CPU per account).
+Afterwards run build_text_index.py to index the new lawyers and
+bulk_match.py to precompute matches for the new issues.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from app.bulk_load import BulkLoader
+from app.extensions import db
+from app.models import ISSUE_CATEGORIES
+from seed_db import account_record
+from synthetic_data import SyntheticData
+
+
+class Timer:
+    def __init__(self, label: str):
+        self.label = label
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None and self.rows:
+            elapsed = time.perf_counter() - self.started
+            rate = self.rows / elapsed if elapsed else 0
+            print(f"✓ {self.label}: {self.rows:,} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+
+
+def read_jsonl(path: str):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield account_record(json.loads(line))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jsonl", default=None, help="load accounts from this JSONL file")
+    parser.add_argument("--lawyers", type=int, default=None, help="synthetic lawyers (default 1000, 0 with --jsonl)")
+    parser.add_argument("--clients", type=int, default=None, help="synthetic clients (default 10000, 0 with --jsonl)")
+    parser.add_argument("--issues-per-client", type=int, default=1)
+    parser.add_argument("--chats", type=int, default=None,
+                        help="chats, one per issue from the first (default half the issues)")
+    parser.add_argument("--messages-per-chat", type=int, default=10)
+    parser.add_argument("--days", type=int, default=180, help="spread issue dates over this many past days")
+    parser.add_argument("--seed", type=int, default=0, help="synthetic data seed")
+    parser.add_argument("--password", default="password123", help="password of the synthetic accounts")
+    parser.add_argument("--reuse-hash", action="store_true", help="hash --password once for all synthetic accounts")
+    parser.add_argument("--processes", type=int, default=None, help="password hashing processes (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows per insert and transaction")
+    args = parser.parse_args()
+
+    generated = 0 if args.jsonl else None
+    lawyers = args.lawyers if args.lawyers is not None else (generated if generated is not None else 1000)
+    clients = args.clients if args.clients is not None else (generated if generated is not None else 10000)
+    issues = clients * args.issues_per_client
+    chats = min(issues, args.chats if args.chats is not None else issues // 2)
+
+    data = SyntheticData(seed=args.seed)
+    password = {"password": args.password}
+    if args.reuse_hash:
+        password = {"password_hash": generate_password_hash(args.password)}
+
+    app = create_app()
+    with app.app_context(), BulkLoader(db.engine, args.batch_size, args.processes) as loader:
+        print(f"Loading into {db.engine.url.render_as_string(hide_password=True)} "
+              f"({'COPY' if loader.use_copy else 'executemany'}, batches of {args.batch_size:,})")
+
+        if args.jsonl:
+            with Timer(f"Accounts from {args.jsonl}") as timer:
+                timer.rows = len(loader.add_users(read_jsonl(args.jsonl)))
+
+        with Timer("Lawyers") as timer:
+            lawyer_ids = [user_id for user_id, _ in loader.add_users(
+                dict(name=fields.pop("name"), email=fields.pop("email"), profile=fields, **password)
+                for fields in data.lawyers(lawyers)
+            )]
+            timer.rows = len(lawyer_ids)
+
+        with Timer("Clients") as timer:
+            client_ids = [user_id for user_id, _ in loader.add_users(
+                dict(data.client(i), **password) for i in range(clients)
+            )]
+            timer.rows = len(client_ids)
+
+        now = datetime.utcnow()
+
+        def issue_created_at(i):
+            return now - timedelta(minutes=random.Random(f"{args.seed}:when:{i}").randrange(args.days * 24 * 60))
+
+        with Timer("Issues") as timer:
+            issue_ids = loader.add_issues(
+                dict(data.issue(i), user_id=client_ids[i % clients], created_at=issue_created_at(i))
+                for i in range(issues)
+            )
+            timer.rows = len(issue_ids)
+
+        if chats and not lawyer_ids:
+            raise SystemExit("Chats need lawyers: pass --lawyers")
+        with Timer("Chats and messages") as timer:
+            timer.rows = 0
+            rng = random.Random(args.seed)
+            for start in range(0, chats, args.batch_size):
+                stop = min(chats, start + args.batch_size)
+                records = []
+                for i in range(start, stop):
+                    created_at = min(now, issue_created_at(i) + timedelta(hours=rng.randint(1, 48)))
+                    records.append(dict(
+                        user_id=client_ids[i % clients], lawyer_id=rng.choice(lawyer_ids),
+                        issue_id=issue_ids[i], created_at=created_at,
+                    ))
+                chat_ids = loader.add_chats(records)
+                timer.rows += len(chat_ids)
+                timer.rows += loader.add_messages(
+                    dict(
+                        message,
+                        chat_id=chat_id,
+                        sender_id=chat["user_id"] if message["sender_role"] == "user" else chat["lawyer_id"],
+                        created_at=min(now, chat["created_at"] + timedelta(minutes=7 * j)),
+                    )
+                    for i, chat_id, chat in zip(range(start, stop), chat_ids, records)
+                    for j, message in enumerate(data.messages(
+                        i, args.messages_per_chat, ISSUE_CATEGORIES[i % len(ISSUE_CATEGORIES)]
+                    ))
+                )
+
+        inserted = ", ".join(f"{count:,} {table}" for table, count in loader.inserted.items())
+        print(f"\nInserted {inserted or 'nothing'}; skipped {loader.skipped:,} existing accounts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Load test for real-time chat delivery: how many concurrently open chats
+(/chat/<id>/stream connections) one web worker can hold, and how quickly a
+posted message reaches its chat's stream at each level.
+
+Starts one worker against a throwaway SQLite database in the temporary
+directory (gunicorn with gunicorn.conf.py when installed, otherwise the
+threaded Flask development server), then for each level opens that many
+streams, one per chat, posts messages through /chat/<id>/messages and
+inserts some directly into the database (as another worker would), and
+reports delivery latency and the worker's memory.
+
+    python load_test_chat.py --levels 50 100 200 400
+"""
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from flask import Flask
+from sqlalchemy import create_engine, func, select
+
+CHECK_DB = os.path.join(tempfile.gettempdir(), "lawyerconnect_chat_load.db")
+SERVER_LOG = os.path.join(tempfile.gettempdir(), "lawyerconnect_chat_load.log")
+SECRET_KEY = "chat-load-test"
+LAWYERS = 20
+
+
+def build_database(chats: int):
+    """Lawyer pool plus `chats` clients with one chat each with the same lawyer; returns [(chat id, client id)], lawyer id."""
+    from app.migrations import run_migrations
+    from app.models import Chat, LawyerPoolGeneration, LawyerProfile, User
+    from synthetic_data import SyntheticData
+
+    if os.path.exists(CHECK_DB):
+        os.remove(CHECK_DB)
+    engine = create_engine(f"sqlite:///{CHECK_DB}")
+    run_migrations(engine)
+    with engine.begin() as conn:
+        # Seeded here: create_app would otherwise seed the empty database itself
+        for fields in SyntheticData(seed=11).lawyers(LAWYERS):
+            user_id = conn.execute(User.__table__.insert().values(
+                name=fields["name"], email=fields["email"], password_hash="x", is_lawyer=True,
+            )).inserted_primary_key[0]
+            columns = {key: value for key, value in fields.items() if key not in ("name", "email")}
+            conn.execute(LawyerProfile.__table__.insert().values(user_id=user_id, **columns))
+        conn.execute(LawyerPoolGeneration.__table__.insert().values(id=1, generation=0))
+        lawyer_id = conn.execute(select(func.min(User.id)).where(User.is_lawyer)).scalar()
+
+        pairs = []
+        for i in range(chats):
+            client_id = conn.execute(User.__table__.insert().values(
+                name=f"Load client {i}", email=f"load{i}@check.lawconnect.com", password_hash="x",
+            )).inserted_primary_key[0]
+            chat_id = conn.execute(Chat.__table__.insert().values(
+                user_id=client_id, lawyer_id=lawyer_id, created_at=datetime.utcnow(),
+            )).inserted_primary_key[0]
+            pairs.append((chat_id, client_id))
+    engine.dispose()
+    return pairs, lawyer_id
+
+
+def session_cookie(user_id: int) -> str:
+    """A logged-in session cookie for the user, signed like the server's (same SECRET_KEY)."""
+    signer = Flask(__name__)
+    signer.secret_key = SECRET_KEY
+    value = signer.session_interface.get_signing_serializer(signer).dumps({"_user_id": str(user_id), "_fresh": True})
+    return f"session={value}"
+
+
+def start_server(port: int, threads: int):
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{CHECK_DB}",
+        TEXT_INDEX_DIR=os.path.join(tempfile.gettempdir(), "lawyerconnect_chat_load_text_index"),
+        SECRET_KEY=SECRET_KEY,
+        # Migrate the throwaway database on startup (normally migrate.py's job)
+        MIGRATE_ON_STARTUP="true",
+        QUERY_BUDGET_ENABLED="false",
+        # Closed test streams free their server thread on the next keepalive
+        CHAT_KEEPALIVE_INTERVAL="2",
+    )
+    env.pop("USE_SQLITE", None)
+    if importlib.util.find_spec("gunicorn"):
+        command = [
+            sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--workers", "1",
+            "--threads", str(threads), "--worker-connections", str(threads * 2), "--bind", f"127.0.0.1:{port}", "run:app",
+        ]
+        kind = f"gunicorn gthread worker, {threads} threads"
+    else:
+        command = [sys.executable, "-m", "flask", "--app", "run:app", "run", "--port", str(port), "--with-threads"]
+        kind = "Flask development server (gunicorn not installed), thread per connection"
+    log = open(SERVER_LOG, "w")
+    server = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+    for _ in range(300):
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/about")
+            connection.getresponse().read()
+            return server, kind
+        except OSError:
+            if server.poll() is not None:
+                raise SystemExit(f"Server exited; see {SERVER_LOG}")
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit(f"Server did not start; see {SERVER_LOG}")
+
+
+def rss_mb(pid: int) -> float:
+    """Resident memory of a process and its children (gunicorn arbiter plus worker), in MB."""
+    pids = [pid]
+    try:
+        pids += [int(p) for p in open(f"/proc/{pid}/task/{pid}/children").read().split()]
+    except OSError:
+        pass
+    total = 0
+    for p in pids:
+        try:
+            for line in open(f"/proc/{p}/status"):
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1])
+        except OSError:
+            pass
+    return total / 1024
+
+
+class Stream(threading.Thread):
+    """One open chat: reads the SSE stream and records when each message arrived."""
+
+    def __init__(self, port: int, chat_id: int, cookie: str):
+        super().__init__(daemon=True)
+        self.port = port
+        self.chat_id = chat_id
+        self.cookie = cookie
+        self.connected = threading.Event()
+        self.arrivals = {}  # Message content -> arrival time
+        self.error = None
+        self.connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+        if self.connection.sock is not None:
+            self.connection.sock.shutdown(socket.SHUT_RDWR)
+
+    def run(self):
+        connection = self.connection
+        try:
+            connection.request("GET", f"/chat/{self.chat_id}/stream", headers={"Cookie": self.cookie})
+            response = connection.getresponse()
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}")
+            self.connected.set()
+            for line in response:
+                if line.startswith(b"data: "):
+                    self.arrivals[json.loads(line[6:])["content"]] = time.perf_counter()
+        except Exception as e:
+            if not self.closed:
+                self.error = e
+            self.connected.set()
+
+
+def post_message(port: int, chat_id: int, cookie: str, content: str):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    connection.request(
+        "POST", f"/chat/{chat_id}/messages", body=json.dumps({"content": content}),
+        headers={"Cookie": cookie, "Content-Type": "application/json"},
+    )
+    response = connection.getresponse()
+    response.read()
+    if response.status != 201:
+        raise RuntimeError(f"POST /chat/{chat_id}/messages returned {response.status}")
+
+
+def insert_message(engine, chat_id: int, lawyer_id: int, content: str):
+    """A message committed by some other worker, which only the broker's poller can see."""
+    from app.models import Message
+    with engine.begin() as conn:
+        conn.execute(Message.__table__.insert().values(
+            chat_id=chat_id, sender_id=lawyer_id, sender_role="lawyer", content=content, created_at=datetime.utcnow(),
+        ))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_level(port, server, engine, pairs, lawyer_cookie, lawyer_id, open_chats, messages):
+    streams = [Stream(port, chat_id, session_cookie(client_id)) for chat_id, client_id in pairs[:open_chats]]
+    for stream in streams:
+        stream.start()
+    for stream in streams:
+        stream.connected.wait(30)
+    failed = [stream for stream in streams if stream.error or not stream.connected.is_set()]
+    time.sleep(1)
+    memory = rss_mb(server.pid)
+
+    sent = {}  # content -> (stream, sent at, "post" or "other worker")
+    rng = random.Random(open_chats)
+    live = [stream for stream in streams if stream not in failed]
+    for i in range(messages if live else 0):
+        stream = rng.choice(live)
+        content = f"load {open_chats}.{i}"
+        started = time.perf_counter()
+        if i % 4 == 3:
+            insert_message(engine, stream.chat_id, lawyer_id, content)
+            sent[content] = (stream, started, "other worker")
+        else:
+            post_message(port, stream.chat_id, lawyer_cookie, content)
+            sent[content] = (stream, started, "post")
+        time.sleep(0.02)
+    time.sleep(3)  # Poll interval plus slack for the last messages
+
+    latencies = {"post": [], "other worker": []}
+    lost = 0
+    for content, (stream, started, path) in sent.items():
+        arrived = stream.arrivals.get(content)
+        if arrived is None:
+            lost += 1
+        else:
+            latencies[path].append((arrived - started) * 1000)
+    for stream in streams:
+        stream.close()
+    return len(live), len(failed), memory, latencies, lost
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent open chats per worker and message delivery latency.")
+    parser.add_argument("--levels", type=int, nargs="+", default=[25, 50, 100, 200],
+                        help="Numbers of concurrently open chats to test")
+    parser.add_argument("--messages", type=int, default=100, help="Messages sent per level")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="gunicorn threads for the worker (default: the largest level plus headroom)")
+    parser.add_argument("--port", type=int, default=5077)
+    args = parser.parse_args()
+
+    most = max(args.levels)
+    print(f"Building {most} chats in {CHECK_DB}...")
+    pairs, lawyer_id = build_database(most)
+    server, kind = start_server(args.port, args.threads or most + 10)
+    engine = create_engine(f"sqlite:///{CHECK_DB}")
+    print(f"Server: {kind}; idle worker memory {rss_mb(server.pid):.0f} MB\n")
+    print(f"{'open chats':>10} {'failed':>7} {'memory MB':>10} {'post p50/p95 ms':>17} "
+          f"{'other-worker p50/p95 ms':>25} {'lost':>5}")
+    held = 0
+    try:
+        for level in sorted(args.levels):
+            live, failed, memory, latencies, lost = run_level(
+                args.port, server, engine, pairs, session_cookie(lawyer_id), lawyer_id, level, args.messages,
+            )
+            cells = []
+            for path in ("post", "other worker"):
+                values = latencies[path]
+                cells.append(f"{statistics.median(values):.0f}/{percentile(values, 0.95):.0f}" if values else "-")
+            print(f"{live:>10} {failed:>7} {memory:>10.0f} {cells[0]:>17} {cells[1]:>25} {lost:>5}")
+            if failed or lost:
+                break
+            held = live
+            # Let the server notice this level's closed streams before the next one opens
+            time.sleep(3)
+    finally:
+        server.terminate()
+        server.wait()
+        engine.dispose()
+
+    print(f"\nOne worker held {held} concurrently open chats with every message delivered.")
+    print("Streams wait on the in-process broker: the database sees one poll per"
+          " CHAT_POLL_INTERVAL per worker, however many chats are open.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Apply or list the versioned schema migrations (app/migrations.py).
+The app doesn't migrate on startup (unless MIGRATE_ON_STARTUP is on), so
+run this once per deploy (the Procfile release command and render.yaml's
+buildCommand do) and after checking out new code locally. It also seeds
+an empty production database. --status shows which versions a database
+is at without changing it.
+
+    python migrate.py                         # apply pending migrations
+    python migrate.py --status
+"""
+import argparse
+
+from app import create_app, prepare_database, seed_empty_database
+from app.migrations import MIGRATIONS, applied_versions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--status", action="store_true", help="list migrations without applying any")
+    args = parser.parse_args()
+
+    # Migrations run below, explicitly; --status must not apply any
+    app = create_app({"MIGRATE_ON_STARTUP": False})
+    with app.app_context():
+        if not args.status:
+            ran = prepare_database()
+            print(f"\n✓ Applied {len(ran)} migrations")
+            seed_empty_database(app)
+        applied = applied_versions()
+        print()
+        for step in MIGRATIONS:
+            applied_at = applied.get(step.version)
+            state = f"applied {applied_at:%Y-%m-%d %H:%M}" if applied_at else "pending"
+            print(f"  {step.version:04d} {step.name:30s} {state}")
+
+
+if __name__ == "__main__":
+    main()
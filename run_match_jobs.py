@@ -0,0 +1,51 @@
+"""
+Run background match jobs queued by issue submissions in a dedicated process
+(the Procfile "worker" entry). Web processes only enqueue jobs and read their
+results; run one or more of these wherever MATCH_JOBS_ENABLED is set.
+
+Between jobs it also publishes edited lawyer descriptions to the text index
+(text_index.publish_changes), which web processes never build.
+
+    python run_match_jobs.py                  # poll the queue forever
+    python run_match_jobs.py --once           # drain the queue and exit
+"""
+import argparse
+import time
+
+from app import create_app
+from app.extensions import db
+from app.match_jobs import match_jobs
+from app.text_index import text_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        print("Running match jobs...")
+        total = 0
+        while True:
+            started = time.perf_counter()
+            ran = match_jobs.run_pending()
+            if ran:
+                total += ran
+                print(f"  Ran {ran} jobs in {time.perf_counter() - started:.2f}s ({total} total)")
+            try:
+                published = text_index.publish_changes()
+                if published:
+                    print(f"  Published text index {published}")
+            except Exception as e:
+                print(f"Warning: Could not publish text index changes: {e}")
+                db.session.rollback()
+            if args.once:
+                break
+            if not ran:
+                time.sleep(match_jobs.poll_interval)
+        print(f"\n✓ Ran {total} match jobs")
+
+
+if __name__ == "__main__":
+    main()
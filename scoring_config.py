@@ -0,0 +1,72 @@
+"""
+Show or change the matching weights and parameters (scoring_config table).
+Running workers pick up a new version within SCORING_PLAN_CHECK_INTERVAL
+seconds; cached rankings of the previous plan are no longer served.
+
+    python scoring_config.py                       # show the active parameters
+    python scoring_config.py --load weights.json   # validate and store new parameters
+    python scoring_config.py --set weights.case_type=0.35 weights.pricing=0.10
+    python scoring_config.py --reset               # back to the built-in defaults
+"""
+import argparse
+import copy
+import json
+import sys
+
+from app import create_app
+from app.scoring_plan import DEFAULT_PARAMS, scoring_plans
+
+
+def apply_setting(params, setting):
+    """Apply one dotted path=value assignment, e.g. weights.case_type=0.35."""
+    path, _, raw = setting.partition("=")
+    keys = path.split(".")
+    target = params
+    for key in keys[:-1]:
+        target = target[key]
+    if keys[-1] not in target:
+        raise KeyError(path)
+    target[keys[-1]] = json.loads(raw)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--load", metavar="FILE", help="JSON file with the full parameter set")
+    group.add_argument("--set", nargs="+", metavar="PATH=VALUE", help="change individual parameters")
+    group.add_argument("--reset", action="store_true", help="restore the default parameters")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        plan = scoring_plans.refresh(force=True)
+        params = json.loads(plan.params)
+
+        if args.load:
+            with open(args.load) as f:
+                params = json.load(f)
+        elif args.set:
+            params = copy.deepcopy(params)
+            try:
+                for setting in args.set:
+                    apply_setting(params, setting)
+            except (KeyError, ValueError) as e:
+                print(f"✗ Invalid setting: {e}")
+                sys.exit(1)
+        elif args.reset:
+            params = copy.deepcopy(DEFAULT_PARAMS)
+        else:
+            print(f"Scoring plan v{plan.version} ({plan.fingerprint}):")
+            print(json.dumps(params, indent=2, sort_keys=True))
+            return
+
+        try:
+            plan = scoring_plans.save(params)
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"✗ Rejected: {e}")
+            sys.exit(1)
+        print(f"✓ Stored scoring plan v{plan.version} ({plan.fingerprint})")
+
+
+if __name__ == "__main__":
+    main()
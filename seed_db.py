@@ -2,8 +2,8 @@
 Database seeding script to populate sample lawyers.
 Run this script once to add sample lawyers to the database.
 """
-from app import create_app
-from app.models import User, LawyerProfile, ISSUE_CATEGORIES
+from app import create_app, prepare_database
+from app.models import LawyerProfile, ISSUE_CATEGORIES
 from app.extensions import db
 
 # Sample lawyers data - richer profiles, ensuring strong coverage in each category
@@ -286,74 +286,80 @@ SAMPLE_LAWYERS = [
 ]
 
 
-def seed_database():
-    """Seed the database with sample lawyers."""
-    app = create_app()
+def profile_fields(lawyer_data):
+    """LawyerProfile column values for a SAMPLE_LAWYERS entry, with default pricing filled in."""
+    # Generate default pricing if not provided (based on rating and experience)
+    default_hourly = lawyer_data.get("hourly_rate")
+    if default_hourly is None:
+        # Base rate on rating: 200-500 per hour
+        default_hourly = 200 + (lawyer_data.get("rating", 4.0) - 3.0) * 100
     
+    default_fixed_min = lawyer_data.get("fixed_rate_min")
+    if default_fixed_min is None:
+        default_fixed_min = default_hourly * 10  # 10 hours minimum
+    
+    default_fixed_max = lawyer_data.get("fixed_rate_max")
+    if default_fixed_max is None:
+        default_fixed_max = default_hourly * 40  # 40 hours maximum
+    
+    return dict(
+        expertise_categories=",".join(lawyer_data["expertise"]),
+        experience_description=lawyer_data["experience"],
+        rating=lawyer_data["rating"],
+        profile_picture=lawyer_data["profile_picture"],
+        education=lawyer_data.get("education", ""),
+        age=lawyer_data.get("age", 0),
+        city=lawyer_data.get("city", ""),
+        case_success_rate=lawyer_data.get("case_success_rate", 0.0),
+        # Availability and pricing
+        is_available=lawyer_data.get("is_available", True),
+        hourly_rate=default_hourly,
+        fixed_rate_min=default_fixed_min,
+        fixed_rate_max=default_fixed_max,
+        accepts_contingency=lawyer_data.get("accepts_contingency", False),
+        contingency_percentage=lawyer_data.get("contingency_percentage", 0.30 if lawyer_data.get("accepts_contingency", False) else 0.0),
+        max_cases=lawyer_data.get("max_cases", 10),
+        current_cases=lawyer_data.get("current_cases", 0),
+    )
+
+
+def account_record(data):
+    """BulkLoader user record for a SAMPLE_LAWYERS-style entry (a client when it lists no expertise)."""
+    record = {"name": data["name"], "email": data["email"], "password": data["password"]}
+    if data.get("expertise"):
+        record["profile"] = profile_fields(data)
+    return record
+
+
+def seed_database(app=None):
+    """Seed the database with sample lawyers (in `app`, or a new app)."""
+    from app.bulk_load import BulkLoader
+
+    # migrate.py and create_app (with MIGRATE_ON_STARTUP) seed empty databases and pass their
+    # app; hashing in-process there, as forking a web worker that runs threads isn't safe
+    processes = 1 if app is not None else None
+    standalone = app is None
+    app = app or create_app()
+
     with app.app_context():
+        if standalone:
+            # Run on its own, the database may not be migrated yet
+            prepare_database()
         print("Seeding database with sample lawyers...")
-        
+
+        with BulkLoader(db.engine, processes=processes) as loader:
+            results = loader.add_users(account_record(lawyer_data) for lawyer_data in SAMPLE_LAWYERS)
+
         added_count = 0
         skipped_count = 0
-        
-        for lawyer_data in SAMPLE_LAWYERS:
-            # Check if user already exists
-            existing_user = User.query.filter_by(email=lawyer_data["email"]).first()
-            if existing_user:
+        for lawyer_data, (_, created) in zip(SAMPLE_LAWYERS, results):
+            if created:
+                print(f"Added lawyer: {lawyer_data['name']}")
+                added_count += 1
+            else:
                 print(f"Skipping {lawyer_data['name']} - already exists")
                 skipped_count += 1
-                continue
-            
-            # Create user
-            user = User(
-                name=lawyer_data["name"],
-                email=lawyer_data["email"],
-                is_lawyer=True
-            )
-            user.set_password(lawyer_data["password"])
-            db.session.add(user)
-            db.session.flush()
-            
-            # Generate default pricing if not provided (based on rating and experience)
-            default_hourly = lawyer_data.get("hourly_rate")
-            if default_hourly is None:
-                # Base rate on rating: 200-500 per hour
-                default_hourly = 200 + (lawyer_data.get("rating", 4.0) - 3.0) * 100
-            
-            default_fixed_min = lawyer_data.get("fixed_rate_min")
-            if default_fixed_min is None:
-                default_fixed_min = default_hourly * 10  # 10 hours minimum
-            
-            default_fixed_max = lawyer_data.get("fixed_rate_max")
-            if default_fixed_max is None:
-                default_fixed_max = default_hourly * 40  # 40 hours maximum
-            
-            # Create lawyer profile
-            profile = LawyerProfile(
-                user_id=user.id,
-                expertise_categories=",".join(lawyer_data["expertise"]),
-                experience_description=lawyer_data["experience"],
-                rating=lawyer_data["rating"],
-                profile_picture=lawyer_data["profile_picture"],
-                education=lawyer_data.get("education", ""),
-                age=lawyer_data.get("age", 0),
-                city=lawyer_data.get("city", ""),
-                case_success_rate=lawyer_data.get("case_success_rate", 0.0),
-                # Availability and pricing
-                is_available=lawyer_data.get("is_available", True),
-                hourly_rate=default_hourly,
-                fixed_rate_min=default_fixed_min,
-                fixed_rate_max=default_fixed_max,
-                accepts_contingency=lawyer_data.get("accepts_contingency", False),
-                contingency_percentage=lawyer_data.get("contingency_percentage", 0.30 if lawyer_data.get("accepts_contingency", False) else 0.0),
-                max_cases=lawyer_data.get("max_cases", 10),
-                current_cases=lawyer_data.get("current_cases", 0),
-            )
-            db.session.add(profile)
-            print(f"Added lawyer: {lawyer_data['name']}")
-            added_count += 1
-        
-        db.session.commit()
+
         print(f"\n✓ Successfully added {added_count} new lawyers!")
         if skipped_count > 0:
             print(f"  (Skipped {skipped_count} lawyers that already exist)")
@@ -365,5 +371,3 @@ def seed_database():
 
 if __name__ == "__main__":
     seed_database()
-
-
@@ -0,0 +1,127 @@
+// Live chat updates: new messages arrive over a Server-Sent Events stream
+// (long-polling where EventSource is unavailable) and the form posts without
+// a page reload. Without JavaScript the page still works as a plain form.
+(function () {
+  "use strict";
+
+  document.addEventListener("DOMContentLoaded", function () {
+    var box = document.getElementById("chat-messages");
+    var form = document.getElementById("chat-form");
+    if (!box || !form || !window.fetch) {
+      return;
+    }
+    var userId = Number(box.dataset.userId);
+    // Newest id received from the server (stream or poll), to resume from
+    var lastId = Number(box.dataset.lastId);
+    var shown = {};
+
+    function atBottom() {
+      return box.scrollHeight - box.scrollTop - box.clientHeight < 40;
+    }
+
+    function append(message) {
+      if (message.id <= Number(box.dataset.lastId) || shown[message.id]) {
+        return;  // Already shown (our own post, or a replay after reconnecting)
+      }
+      shown[message.id] = true;
+      var empty = document.getElementById("chat-empty");
+      if (empty) {
+        empty.remove();
+      }
+      var isMe = message.sender_id === userId;
+      var row = document.createElement("div");
+      row.className = "flex " + (isMe ? "justify-end" : "justify-start");
+      row.dataset.messageId = message.id;
+      var bubble = document.createElement("div");
+      bubble.className = "max-w-xs px-3 py-2 rounded-lg " +
+        (isMe ? "bg-[#800020] text-white" : "bg-slate-100 text-slate-900");
+      var sender = document.createElement("p");
+      sender.className = "text-xs font-semibold mb-1";
+      sender.textContent = (isMe ? "You" : message.sender_name) + " (" + message.sender_role + ")";
+      var content = document.createElement("p");
+      content.textContent = message.content;
+      var time = document.createElement("p");
+      time.className = "text-[10px] mt-1 opacity-70";
+      time.textContent = message.created_at.slice(0, 16).replace("T", " ");
+      bubble.append(sender, content, time);
+      row.append(bubble);
+
+      var follow = atBottom();
+      box.append(row);
+      if (follow || isMe) {
+        box.scrollTop = box.scrollHeight;
+      }
+    }
+
+    function stream() {
+      var source = new EventSource(box.dataset.streamUrl + "?since=" + lastId);
+      source.addEventListener("message", function (e) {
+        var message = JSON.parse(e.data);
+        lastId = Math.max(lastId, message.id);
+        append(message);
+      });
+      // A full page of missed messages: open the next stream from the last one
+      source.addEventListener("more", function () {
+        source.close();
+        stream();
+      });
+      // EventSource reconnects by itself, resuming from the last event id
+    }
+
+    function longPoll() {
+      var url = box.dataset.messagesUrl + "?wait=25&since=";
+      fetch(url + lastId, { credentials: "same-origin" })
+        .then(function (response) {
+          if (!response.ok) {
+            throw new Error(response.status);
+          }
+          return response.json();
+        })
+        .then(function (data) {
+          data.messages.forEach(function (message) {
+            lastId = Math.max(lastId, message.id);
+            append(message);
+          });
+          longPoll();
+        })
+        .catch(function () {
+          setTimeout(longPoll, 5000);
+        });
+    }
+
+    form.addEventListener("submit", function (e) {
+      var textarea = form.elements.content;
+      var content = textarea.value.trim();
+      if (!content) {
+        return;
+      }
+      e.preventDefault();
+      fetch(box.dataset.messagesUrl, {
+        method: "POST",
+        credentials: "same-origin",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ content: content }),
+      })
+        .then(function (response) {
+          if (!response.ok) {
+            throw new Error(response.status);
+          }
+          return response.json();
+        })
+        .then(function (message) {
+          textarea.value = "";
+          append(message);
+        })
+        .catch(function () {
+          form.submit();  // Fall back to the plain form post
+        });
+    });
+
+    box.scrollTop = box.scrollHeight;
+    if (window.EventSource) {
+      stream();
+    } else {
+      longPoll();
+    }
+  });
+})();
@@ -0,0 +1,174 @@
+"""
+Deterministic synthetic lawyers, issues, clients and chat messages for
+benchmarks, load tests and staging data (load_data.py).
+
+Field distributions are taken from SAMPLE_LAWYERS in seed_db.py (number
+of expertise categories, category frequencies, ratings, success rates,
+pricing, capacity, cities) with some spread added so that every branch of
+the scoring functions is exercised. Issues cover every ISSUE_CATEGORIES
+entry, urgency and pricing preference, and most have a client city.
+Experience and issue descriptions mention concrete case details of their
+categories, so the text-relevance factor has something to match.
+
+Record i is generated from its own seeded RNG, so any slice of a pool can
+be regenerated on its own and is identical across runs and machines.
+"""
+import random
+from collections import Counter
+from types import SimpleNamespace
+from typing import Dict, Iterator, List
+
+from app.models import User, LawyerProfile, ISSUE_CATEGORIES
+from app.locations import CITY_INDEX
+from seed_db import SAMPLE_LAWYERS, profile_fields
+
+# Options offered by templates/submit_issue.html
+URGENCIES = ["low", "normal", "high", "urgent"]
+PRICING = ["hourly", "fixed", "contingency"]
+
+CASE_DETAILS = {
+    "Harassment": [
+        "repeated unwanted messages from a coworker", "sexual harassment by a supervisor",
+        "online stalking and threats", "a hostile work environment",
+    ],
+    "Domestic Violence": [
+        "a protective order against an abusive partner", "threats and assault at home",
+        "emergency custody after abuse", "violations of a restraining order",
+    ],
+    "Property Issues": [
+        "a landlord withholding the security deposit", "a boundary dispute with a neighbour",
+        "title problems after buying a house", "an illegal eviction notice",
+    ],
+    "Workplace Discrimination": [
+        "being passed over for promotion because of age", "pregnancy discrimination and termination",
+        "unequal pay compared to colleagues", "retaliation after reporting discrimination",
+    ],
+    "Fraud": [
+        "identity theft and unauthorised bank accounts", "an investment scheme that took the savings",
+        "insurance fraud by a contractor", "credit card fraud and chargebacks",
+    ],
+    "Family Disputes": [
+        "child custody and visitation schedules", "divorce and division of property",
+        "child support that is not being paid", "a dispute over an inheritance",
+    ],
+}
+
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return min(max(value, low), high)
+
+
+class SyntheticData:
+    """Generator of lawyer and issue field dicts for a given seed."""
+
+    def __init__(self, seed: int = 0, samples: List[dict] = SAMPLE_LAWYERS):
+        self.seed = seed
+        self.templates = [profile_fields(sample) for sample in samples]
+        self.expertise_sizes = [len(sample["expertise"]) for sample in samples]
+        counts = Counter(category for sample in samples for category in sample["expertise"])
+        # +1 so categories missing from the samples still show up
+        self.category_weights = [counts.get(category, 0) + 1 for category in ISSUE_CATEGORIES]
+        self.contingency_rate = sum(t["accepts_contingency"] for t in self.templates) / len(self.templates)
+
+    def _rng(self, kind: str, i: int) -> random.Random:
+        return random.Random(f"{self.seed}:{kind}:{i}")
+
+    def _categories(self, rng: random.Random) -> List[str]:
+        size = min(rng.choice(self.expertise_sizes), len(ISSUE_CATEGORIES))
+        chosen = []
+        while len(chosen) < size:
+            category = rng.choices(ISSUE_CATEGORIES, weights=self.category_weights)[0]
+            if category not in chosen:
+                chosen.append(category)
+        return chosen
+
+    def lawyer(self, i: int) -> Dict:
+        """Field dict for lawyer i: User fields (name, email) plus LawyerProfile columns."""
+        rng = self._rng("lawyer", i)
+        template = rng.choice(self.templates)
+        price_factor = rng.lognormvariate(0, 0.35)
+        max_cases = template["max_cases"] + rng.choice([-4, -2, 0, 0, 2, 5])
+
+        categories = self._categories(rng)
+        fields = dict(template)
+        fields.update(
+            name=f"Synthetic Lawyer {i}",
+            email=f"lawyer{i}@synthetic.lawconnect.com",
+            expertise_categories=",".join(categories),
+            experience_description=(
+                f"{template['experience_description']} Recent cases include "
+                f"{rng.choice(CASE_DETAILS[rng.choice(categories)])}."
+            ),
+            rating=round(_clamp(template["rating"] + rng.gauss(0, 0.4), 0.0, 5.0), 1),
+            case_success_rate=round(_clamp(template["case_success_rate"] + rng.gauss(0, 0.08), 0.0, 1.0), 2),
+            # A few lawyers don't offer a pricing model at all
+            hourly_rate=0.0 if rng.random() < 0.05 else round(template["hourly_rate"] * price_factor, -1),
+            fixed_rate_min=0.0 if rng.random() < 0.05 else round(template["fixed_rate_min"] * price_factor, -2),
+            fixed_rate_max=0.0 if rng.random() < 0.05 else round(template["fixed_rate_max"] * price_factor, -2),
+            accepts_contingency=rng.random() < self.contingency_rate,
+            is_available=rng.random() < 0.9,
+            max_cases=max_cases,
+            current_cases=rng.randint(0, max_cases),
+            # Mostly the sample cities, some anywhere in the city table
+            city=template["city"] if rng.random() < 0.7 else rng.choice(CITY_INDEX.names),
+        )
+        fields["contingency_percentage"] = 0.30 if fields["accepts_contingency"] else 0.0
+        return fields
+
+    def lawyers(self, count: int, start: int = 0) -> Iterator[Dict]:
+        for i in range(start, start + count):
+            yield self.lawyer(i)
+
+    def issue(self, i: int) -> Dict:
+        """Field dict for issue i (Issue columns except user_id)."""
+        rng = self._rng("issue", i)
+        category = ISSUE_CATEGORIES[i % len(ISSUE_CATEGORIES)]
+        budget_min = rng.choice([0.0, 500.0, 1000.0, 2000.0, 5000.0])
+        return dict(
+            title=f"Synthetic {category} issue {i}",
+            description=f"I need help with {rng.choice(CASE_DETAILS[category])}.",
+            category=category,
+            budget_min=budget_min,
+            budget_max=budget_min + rng.choice([2000.0, 5000.0, 10000.0, 20000.0, 50000.0]),
+            urgency=rng.choice(URGENCIES),
+            preferred_pricing=rng.choice(PRICING),
+            city="" if rng.random() < 0.3 else rng.choice(CITY_INDEX.names),
+        )
+
+    def issues(self, count: int, start: int = 0) -> Iterator[Dict]:
+        for i in range(start, start + count):
+            yield self.issue(i)
+
+    def client(self, i: int) -> Dict:
+        """User fields (name, email) for client i."""
+        return dict(name=f"Synthetic Client {i}", email=f"client{i}@synthetic.lawconnect.com")
+
+    def messages(self, i: int, count: int, category: str) -> Iterator[Dict]:
+        """Content and sender_role of the first `count` messages of chat i, alternating client and lawyer."""
+        rng = self._rng("chat", i)
+        for j in range(count):
+            if j % 2 == 0:
+                content = rng.choice([
+                    f"Can you help me with {rng.choice(CASE_DETAILS[category])}?",
+                    "I have sent over the documents you asked for.",
+                    "When would be a good time for a call?",
+                ])
+            else:
+                content = rng.choice([
+                    f"Yes, I have handled cases involving {rng.choice(CASE_DETAILS[category])}.",
+                    "Thanks, I will review them and get back to you.",
+                    "I can do a video call tomorrow afternoon.",
+                ])
+            yield dict(sender_role="user" if j % 2 == 0 else "lawyer", content=content)
+
+
+def lawyer_profile(fields: Dict, profile_id: int) -> LawyerProfile:
+    """Unsaved LawyerProfile (with its User) for the scalar scoring path."""
+    columns = {key: value for key, value in fields.items() if key not in ("name", "email")}
+    user = User(name=fields["name"], email=fields["email"], password_hash="", is_lawyer=True)
+    return LawyerProfile(id=profile_id, user=user, **columns)
+
+
+def issue_record(fields: Dict, issue_id: int) -> SimpleNamespace:
+    """Lightweight issue carrying the attributes read by the scorers."""
+    return SimpleNamespace(id=issue_id, **fields)